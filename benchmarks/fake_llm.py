@@ -0,0 +1,130 @@
+"""Deterministic stand-in for the Gemini chat model, with configurable latency and replayed responses."""
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+import asyncio
+import json
+import random
+import re
+import sys
+import threading
+import time
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+DEFAULT_SQL = "SELECT count() AS order_count FROM orders_poc"
+DEFAULT_ANSWER = "There were {n} matching records."
+DEFAULT_CHART = '{"chart_needed": false, "chart_type": "none", "title": "", "x_axis_column": null, "y_axis_columns": []}'
+DEFAULT_SUMMARY = "The user asked about orders, users and products in the PoC data."
+
+_QUESTION_RES = [re.compile(r"Current Question: (.+)"), re.compile(r"Original User Question: (.+)")]
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class ReplayChatModel(BaseChatModel):
+    """
+    Answers every prompt of the agent from a table of recorded responses keyed by question.
+    The chain is recognised from the prompt's closing line, so the real prompt templates are
+    exercised unchanged. Latency is `latency_ms` plus a seeded uniform jitter, so runs are repeatable.
+    """
+
+    responses: Dict[str, Dict[str, str]] = {}
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    seed: int = 0
+    stream_chunk_words: int = 3
+
+    _rng: Any = None
+    _rng_lock: Any = None
+
+    def model_post_init(self, __context: Any) -> None:
+        self._rng = random.Random(self.seed)
+        self._rng_lock = threading.Lock()
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def _delay_seconds(self) -> float:
+        with self._rng_lock:
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def _respond(self, prompt: str) -> str:
+        question = next((m.group(1).strip() for r in _QUESTION_RES if (m := r.search(prompt))), "")
+        recorded = self.responses.get(question, {})
+        if prompt.rstrip().endswith("SQL Query:"):
+            return recorded.get("sql", DEFAULT_SQL)
+        if prompt.rstrip().endswith("Natural Language Answer:"):
+            return recorded.get("answer", DEFAULT_ANSWER.format(n="several"))
+        if prompt.rstrip().endswith("Your Turn:"):
+            return recorded.get("chart", DEFAULT_CHART)
+        if prompt.rstrip().endswith("Updated Summary:"):
+            return DEFAULT_SUMMARY
+        return DEFAULT_ANSWER.format(n="several")
+
+    def _message(self, messages: List[BaseMessage]) -> AIMessage:
+        prompt = "\n".join(str(m.content) for m in messages)
+        text = self._respond(prompt)
+        usage = {"input_tokens": _estimate_tokens(prompt), "output_tokens": _estimate_tokens(text)}
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        return AIMessage(content=text, usage_metadata=usage)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._delay_seconds())
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._delay_seconds())
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages))])
+
+    def _chunks(self, message: AIMessage) -> Iterator[AIMessageChunk]:
+        words = str(message.content).split(" ")
+        step = self.stream_chunk_words
+        for i in range(0, len(words), step):
+            text = " ".join(words[i:i + step]) + (" " if i + step < len(words) else "")
+            yield AIMessageChunk(content=text, usage_metadata=message.usage_metadata if i == 0 else None)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        delay = self._delay_seconds()
+        message = self._message(messages)
+        chunks = list(self._chunks(message))
+        await asyncio.sleep(delay / 2) # time to first token, the rest spread across the chunks
+        for chunk in chunks:
+            await asyncio.sleep(delay / 2 / len(chunks))
+            yield ChatGenerationChunk(message=chunk)
+
+
+def load_responses(path: str) -> Dict[str, Dict[str, str]]:
+    """Reads recorded responses: a list of {question, sql, answer, chart} objects."""
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    return {e["question"]: {k: (json.dumps(v) if k == "chart" and not isinstance(v, str) else v) for k, v in e.items() if k != "question"}
+            for e in entries}
+
+
+def install_fake_llm(fake_llm: BaseChatModel) -> None:
+    """
+    Swaps `llm` and every chain in `src.core.llm_config` for ones built on `fake_llm`.
+    Must run before `src.services.*` is imported, since those modules bind the chains at import time.
+    """
+    if "src.services.agent_service" in sys.modules:
+        raise RuntimeError("install_fake_llm() must be called before src.services.agent_service is imported.")
+    from src.core import llm_config
+    from src.core.llm_dispatcher import DispatchedModel
+
+    llm_config.llm = fake_llm
+    for name in ("sql_generation_chain", "answer_synthesis_chain", "chart_suggestion_chain", "history_summary_chain"):
+        chain = getattr(llm_config, name)
+        if chain is None:
+            raise RuntimeError(f"{name} was not initialized; is the database reachable?")
+        model = chain.middle[0]
+        model = model.with_model(fake_llm) if isinstance(model, DispatchedModel) else fake_llm # keep the dispatcher limits
+        setattr(llm_config, name, chain.first | model | chain.last) # prompt | llm | parser
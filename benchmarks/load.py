@@ -0,0 +1,104 @@
+"""Closed-loop load generator for the /ask endpoint, in-process (ASGI) or against a running server."""
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import asyncio
+import itertools
+import statistics
+import time
+
+import httpx
+
+
+@dataclass
+class RequestSample:
+    question: str
+    latency_ms: float
+    status: int
+    timings_ms: Dict[str, float] = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile; 0.0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), round(q / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+
+def _distribution(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "mean": round(statistics.fmean(values), 1) if values else 0.0,
+        "p50": round(percentile(values, 50), 1),
+        "p95": round(percentile(values, 95), 1),
+        "p99": round(percentile(values, 99), 1),
+        "max": round(max(values, default=0.0), 1),
+    }
+
+
+async def _ask(client: httpx.AsyncClient, path: str, question: str, session_id: str) -> RequestSample:
+    started_at = time.perf_counter()
+    try:
+        response = await client.post(path, json={"question": question, "session_id": session_id})
+    except httpx.HTTPError as e:
+        return RequestSample(question, (time.perf_counter() - started_at) * 1000, 0, error=f"{type(e).__name__}: {e}")
+    latency_ms = (time.perf_counter() - started_at) * 1000
+    body: Dict[str, Any] = response.json() if response.headers.get("content-type", "").startswith("application/json") else {}
+    timings = (body.get("debug_info") or {}).get("timings_ms") or {}
+    error = body.get("error") or (None if response.status_code == 200 else str(body.get("detail", response.text))[:200])
+    return RequestSample(question, latency_ms, response.status_code, timings, error)
+
+
+async def run_load(
+    questions: List[str],
+    requests: int,
+    concurrency: int,
+    warmup: int = 0,
+    app: Any = None,
+    base_url: str = "http://bench",
+    api_prefix: str = "/api/v1",
+    timeout_seconds: float = 120.0,
+) -> Dict[str, Any]:
+    """
+    Sends `requests` questions with `concurrency` workers, each waiting for its answer before asking
+    the next one (a closed loop). With `app`, requests go through httpx's ASGI transport without a socket.
+    Every worker uses its own session, as separate users would. The first `warmup` requests are not measured.
+    """
+    transport = httpx.ASGITransport(app=app) if app is not None else None
+    path = f"{api_prefix}/ask"
+    cycle = itertools.cycle(questions)
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=timeout_seconds) as client:
+        for i in range(warmup):
+            await _ask(client, path, next(cycle), f"bench-warmup-{i}")
+
+        samples: List[RequestSample] = []
+        remaining = iter(range(requests))
+
+        async def worker(worker_id: int) -> None:
+            for _ in remaining: # shared iterator: workers stop once `requests` have been claimed
+                samples.append(await _ask(client, path, next(cycle), f"bench-session-{worker_id}"))
+
+        started_at = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        wall_seconds = time.perf_counter() - started_at
+    return summarize(samples, wall_seconds)
+
+
+def summarize(samples: List[RequestSample], wall_seconds: float) -> Dict[str, Any]:
+    """Latency percentiles, throughput, errors and the per-stage breakdown reported in debug_info.timings_ms."""
+    stages: Dict[str, List[float]] = {}
+    for sample in samples:
+        for stage, ms in sample.timings_ms.items():
+            stages.setdefault(stage, []).append(ms)
+    errors = [s for s in samples if s.error or s.status != 200]
+    return {
+        "requests": len(samples),
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_rps": round(len(samples) / wall_seconds, 2) if wall_seconds else 0.0,
+        "errors": len(errors),
+        "error_examples": sorted({f"{s.status}: {s.error}" for s in errors})[:5],
+        "latency_ms": _distribution([s.latency_ms for s in samples]),
+        "stages_ms": {stage: _distribution(values) for stage, values in sorted(stages.items())},
+    }
@@ -0,0 +1,111 @@
+"""Throwaway local ClickHouse server for benchmarks, started from the single `clickhouse` binary."""
+from typing import Optional
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+import urllib.request
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class LocalClickHouse:
+    """
+    Runs `clickhouse server` with its embedded default configuration in a temporary directory,
+    on free ports, with the passwordless `default` user. Use as a context manager.
+    """
+
+    def __init__(self, binary: Optional[str] = None, data_dir: Optional[str] = None, startup_timeout: float = 60.0):
+        self.binary = binary or os.getenv("CLICKHOUSE_BINARY") or shutil.which("clickhouse") or shutil.which("clickhouse-server")
+        if not self.binary:
+            raise RuntimeError("No ClickHouse binary found. Install it (curl https://clickhouse.com/ | sh) or set CLICKHOUSE_BINARY.")
+        self._own_dir = data_dir is None
+        self.data_dir = data_dir or tempfile.mkdtemp(prefix="chipchip-bench-clickhouse-")
+        self.startup_timeout = startup_timeout
+        self.http_port = _free_port()
+        self.tcp_port = _free_port()
+        self._process: Optional[subprocess.Popen] = None
+
+    def _command(self) -> list:
+        command = [self.binary] if self.binary.endswith("clickhouse-server") else [self.binary, "server"]
+        path = self.data_dir.rstrip("/") + "/"
+        return command + [
+            "--",
+            f"--path={path}",
+            f"--tmp_path={path}tmp/",
+            f"--user_files_path={path}user_files/",
+            f"--format_schema_path={path}format_schemas/",
+            f"--logger.log={path}clickhouse-server.log",
+            f"--logger.errorlog={path}clickhouse-server.err.log",
+            f"--http_port={self.http_port}",
+            f"--tcp_port={self.tcp_port}",
+            f"--mysql_port={_free_port()}",
+            f"--postgresql_port={_free_port()}",
+            f"--interserver_http_port={_free_port()}",
+            "--listen_host=127.0.0.1",
+        ]
+
+    def start(self) -> "LocalClickHouse":
+        self._process = subprocess.Popen(self._command(), cwd=self.data_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"ClickHouse exited with code {self._process.returncode}; see {self.data_dir}/clickhouse-server.err.log")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{self.http_port}/ping", timeout=1) as response:
+                    if response.status == 200:
+                        print(f"Local ClickHouse is up on HTTP port {self.http_port} (data in {self.data_dir}).")
+                        return self
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f"ClickHouse did not answer /ping within {self.startup_timeout}s.")
+
+    def stop(self) -> None:
+        if self._process and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        if self._own_dir:
+            shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def environment(self, database: str = "chipchip_db") -> dict:
+        """Environment variables that point the app and the data generator at this server."""
+        return {
+            "CLICKHOUSE_HOST": "127.0.0.1",
+            "CLICKHOUSE_PORT": str(self.http_port),
+            "CLICKHOUSE_USERNAME": "default",
+            "CLICKHOUSE_PASSWORD": "",
+            "CLICKHOUSE_DATABASE": database,
+        }
+
+    def __enter__(self) -> "LocalClickHouse":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def seed_sample_data(database: str = "chipchip_db") -> None:
+    """
+    Creates the database and fills the PoC tables with data/generate_sample_data_poc.py.
+    The CLICKHOUSE_* environment variables must already point at the target server.
+    """
+    import clickhouse_connect
+    admin = clickhouse_connect.get_client(
+        host=os.environ["CLICKHOUSE_HOST"], port=int(os.environ["CLICKHOUSE_PORT"]),
+        username=os.environ["CLICKHOUSE_USERNAME"], password=os.environ["CLICKHOUSE_PASSWORD"]
+    )
+    admin.command(f"CREATE DATABASE IF NOT EXISTS {database}")
+    admin.close()
+
+    from data import generate_sample_data_poc # reads CLICKHOUSE_* at import
+    generate_sample_data_poc.main()
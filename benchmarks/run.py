@@ -0,0 +1,117 @@
+"""
+Offline end-to-end benchmark: the real FastAPI app and ClickHouse queries, a replaying fake LLM
+and, optionally, an in-memory Redis. Run from the repository root:
+
+    python -m benchmarks.run --requests 200 --concurrency 8 --llm-latency-ms 800
+"""
+from datetime import datetime, timezone
+from typing import Optional
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESPONSES = os.path.join(BENCHMARK_DIR, "recorded_responses.json")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the /ask endpoint.")
+    parser.add_argument("--requests", type=int, default=100, help="Measured requests.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent closed-loop clients.")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests sent first.")
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0, help="Mean latency of each fake LLM call.")
+    parser.add_argument("--llm-jitter-ms", type=float, default=200.0, help="Uniform +/- jitter on the fake LLM latency.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the fake LLM latency jitter.")
+    parser.add_argument("--responses", default=DEFAULT_RESPONSES, help="JSON file of recorded {question, sql, answer, chart} entries.")
+    parser.add_argument("--clickhouse", choices=("local", "existing"), default="local",
+                        help="'local' starts a throwaway server from the clickhouse binary; 'existing' uses the CLICKHOUSE_* settings.")
+    parser.add_argument("--clickhouse-binary", help="Path to the clickhouse binary (default: CLICKHOUSE_BINARY or PATH).")
+    parser.add_argument("--seed-data", action="store_true", help="With --clickhouse existing, (re)load the sample data first. Always done for 'local'.")
+    parser.add_argument("--fake-redis", action="store_true", help="Use an in-memory Redis (fakeredis) instead of REDIS_*.")
+    parser.add_argument("--disable-caches", action="store_true", help="Turn off the SQL, result and verified-example caches to measure the cold path.")
+    parser.add_argument("--url", help="Benchmark a running server at this base URL instead of the in-process app (the fake LLM is then not used).")
+    parser.add_argument("--output", help="Write the report as JSON to this file.")
+    return parser.parse_args(argv)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def install_fake_redis() -> None:
+    """Points the Redis-backed services at one shared in-memory server. Must run before they are imported."""
+    import fakeredis
+    from src.db import redis_client as redis_module
+
+    fake = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    redis_module.redis_client = fake
+    redis_module.session_store = redis_module.SessionStore(fake, ttl_seconds=redis_module.settings.SESSION_TTL_SECONDS)
+
+
+def _configure_environment(args: argparse.Namespace) -> None:
+    os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark") # the fake LLM never calls Google
+    if args.disable_caches:
+        os.environ.update({"SQL_CACHE_ENABLED": "false", "RESULT_CACHE_ENABLED": "false", "FEW_SHOT_REUSE_ENABLED": "false"})
+
+
+async def _run(args: argparse.Namespace, questions: list) -> dict:
+    from benchmarks.load import run_load
+
+    if args.url:
+        return await run_load(questions, args.requests, args.concurrency, args.warmup, base_url=args.url)
+
+    from benchmarks.fake_llm import ReplayChatModel, install_fake_llm, load_responses
+    if args.fake_redis:
+        install_fake_redis()
+    fake_llm = ReplayChatModel(responses=load_responses(args.responses), latency_ms=args.llm_latency_ms,
+                               jitter_ms=args.llm_jitter_ms, seed=args.seed)
+    install_fake_llm(fake_llm)
+
+    from src.core.config import settings
+    from src.main import app
+    async with app.router.lifespan_context(app):
+        return await run_load(questions, args.requests, args.concurrency, args.warmup, app=app, api_prefix=settings.API_PREFIX)
+
+
+def main(argv=None) -> dict:
+    args = parse_args(argv)
+    _configure_environment(args)
+    with open(args.responses, encoding="utf-8") as f:
+        questions = [entry["question"] for entry in json.load(f)]
+
+    server = None
+    if args.clickhouse == "local" and not args.url:
+        from benchmarks.local_clickhouse import LocalClickHouse
+        server = LocalClickHouse(binary=args.clickhouse_binary).start()
+        os.environ.update(server.environment())
+    try:
+        if server or (args.seed_data and not args.url):
+            from benchmarks.local_clickhouse import seed_sample_data
+            seed_sample_data(os.environ.get("CLICKHOUSE_DATABASE", "chipchip_db"))
+        results = asyncio.run(_run(args, questions))
+    finally:
+        if server:
+            server.stop()
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output",)},
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main()["results"]["errors"] == 0 else 1)
@@ -0,0 +1,283 @@
+# File: data/append_sample_data_poc.py
+"""
+Keeps appending users, orders, order items and group-buy activity to the PoC tables at a target
+rate, to test the agent while data is arriving (cache invalidation, merge pressure, query latency
+under writes).
+
+Time is cut into windows of --window-seconds. At the end of each window, the rows for the events
+that "happened" during it are built with the vectorized builders from generate_bulk_data_poc.py and
+inserted with one insert per table, parents before children. Foreign keys stay consistent without
+re-reading the large tables: at startup we read the product catalog, the active deals and the most
+recently registered users (up to --user-pool), and from then on new users and deals are added to these
+in-memory pools. Members of completed groups are linked to completed orders from the same window.
+The rollup materialized views are dropped while appending, so an insert does not re-run their joins
+over the whole orders, products and groups tables; the rollups are rebuilt every --refresh-seconds
+and on exit, when the views are recreated.
+
+Sustained throughput (rows/s per table, inserts per second, lag behind schedule) is printed every
+--report-seconds and summarized on exit (Ctrl+C, or after --duration seconds).
+
+Usage (from the project root, after loading data with one of the generators):
+    python ./data/append_sample_data_poc.py --rate 200 --window-seconds 1
+    python ./data/append_sample_data_poc.py --rate 5000 --window-seconds 5 --duration 600 --output append.json
+"""
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from generate_sample_data_poc import get_db_client, create_poc_tables, drop_rollup_views, refresh_rollups, NUM_USERS, NUM_ORDERS, NUM_GROUP_DEALS, NUM_GROUPS_PER_DEAL
+from generate_bulk_data_poc import (
+    build_users, build_orders, build_group_deals, draw_members, link_orders, entity_ids,
+    name_pools, timestamps, uniform_us, GROUP_STATUSES, ID_SPACES
+)
+
+# Events per order, as in generate_sample_data_poc.py: half of the deals are active, with 1..NUM_GROUPS_PER_DEAL groups each
+USERS_PER_ORDER = NUM_USERS / NUM_ORDERS
+DEALS_PER_ORDER = NUM_GROUP_DEALS / NUM_ORDERS
+GROUPS_PER_ORDER = DEALS_PER_ORDER * 0.5 * (1 + NUM_GROUPS_PER_DEAL) / 2
+
+# Keeps appended ids apart from those of generate_bulk_data_poc.py runs, whose seeds are small
+APPEND_SEED_OFFSET = 1 << 32
+
+# Insert order: rows only reference rows inserted before them
+TABLES = ["users_poc", "group_deals_poc", "orders_poc", "order_items_poc", "groups_poc", "group_members_poc"]
+
+
+def _now_us():
+    return int(time.time() * 1_000_000)
+
+
+class Appender:
+    """Builds each window's rows against in-memory pools of the users, products and deals they reference."""
+
+    def __init__(self, client, rate, seed, user_pool_size):
+        self.client = client
+        self.rate = rate
+        self.seed = seed + APPEND_SEED_OFFSET # namespaces the generated ids, so separate runs do not collide
+        self.user_pool_size = user_pool_size
+        self.rng = np.random.default_rng(seed)
+        self.pools = name_pools(seed)
+        self.next_idx = {kind: 0 for kind in ID_SPACES}
+
+    def load_pools(self):
+        """Reads what new rows may reference: the catalog, the active deals and the latest users."""
+        products = self.client.query_df("SELECT product_id, original_price, category_name FROM products_poc")
+        if products.empty:
+            raise RuntimeError("products_poc is empty; load data with generate_sample_data_poc.py or generate_bulk_data_poc.py first.")
+        self.product_ids = products['product_id'].astype(str).to_numpy(dtype=object)
+        self.prices = products['original_price'].astype(float).to_numpy()
+        self.is_fresh = (products['category_name'] == 'Fresh Produce').to_numpy()
+
+        users = self.client.query_df(
+            "SELECT user_id, is_group_leader FROM users_poc "
+            f"ORDER BY toDate(registration_date) DESC LIMIT {self.user_pool_size}" # reads the newest parts only
+        )
+        self.user_ids = users['user_id'].astype(str).to_numpy(dtype=object)
+        self.user_is_leader = users['is_group_leader'].astype(bool).to_numpy()
+
+        deals = self.client.query_df(
+            "SELECT group_deal_id, max_group_member FROM group_deals_poc "
+            "WHERE status = 'active' AND (effective_to IS NULL OR effective_to > now64())"
+        )
+        self.deal_ids = deals['group_deal_id'].astype(str).to_numpy(dtype=object)
+        self.deal_max_members = deals['max_group_member'].astype(np.int64).to_numpy()
+        print(f"Loaded pools: {len(self.product_ids)} products, {len(self.user_ids)} users, {len(self.deal_ids)} active deals.")
+
+    def _take(self, kind, count):
+        start = self.next_idx[kind]
+        self.next_idx[kind] += count
+        return np.arange(start, start + count, dtype=np.int64)
+
+    def _add_users(self, users):
+        self.user_ids = np.concatenate([self.user_ids, users['user_id'].to_numpy()])[-self.user_pool_size:]
+        self.user_is_leader = np.concatenate([self.user_is_leader, users['is_group_leader'].to_numpy()])[-self.user_pool_size:]
+
+    def build_window(self, start_us, end_us):
+        """Rows for the events between start_us and end_us, as {table: DataFrame}."""
+        expected_orders = self.rate * (end_us - start_us) / 1_000_000
+        rng, frames = self.rng, {}
+
+        num_users = rng.poisson(expected_orders * USERS_PER_ORDER)
+        idx = self._take("user", num_users)
+        users = build_users(int(idx[0]) if num_users else 0, num_users, 0, self.seed, self.pools,
+                            registered_us=np.sort(uniform_us(rng, start_us, end_us, num_users)))
+        frames["users_poc"] = users
+        self._add_users(users)
+
+        num_deals = rng.poisson(expected_orders * DEALS_PER_ORDER)
+        deals, _ = build_group_deals(self._take("group_deal", num_deals), uniform_us(rng, start_us, end_us, num_deals),
+                                     rng, self.seed, self.product_ids, self.prices)
+        frames["group_deals_poc"] = deals
+        active = deals['status'].to_numpy() == 'active'
+        self.deal_ids = np.concatenate([self.deal_ids, deals['group_deal_id'].to_numpy()[active]])
+        self.deal_max_members = np.concatenate([self.deal_max_members, deals['max_group_member'].to_numpy()[active]])
+
+        num_orders = rng.poisson(expected_orders) if len(self.user_ids) else 0
+        order_user = rng.integers(0, max(len(self.user_ids), 1), num_orders) # positions in the user pool
+        order_us = uniform_us(rng, start_us, end_us, num_orders)
+        order_idx = self._take("order", num_orders)
+        frames["orders_poc"], frames["order_items_poc"], completed = build_orders(
+            order_idx, self.user_ids[order_user], order_us, rng, self.seed, self.product_ids, self.prices, self.is_fresh
+        )
+
+        leaders = np.flatnonzero(self.user_is_leader)
+        num_groups = rng.poisson(expected_orders * GROUPS_PER_ORDER) if len(leaders) and len(self.deal_ids) else 0
+        group_deal = rng.integers(0, max(len(self.deal_ids), 1), num_groups)
+        leader_pos = leaders[rng.integers(0, max(len(leaders), 1), num_groups)]
+        status = GROUP_STATUSES[rng.integers(0, len(GROUP_STATUSES), num_groups)]
+        created_us = uniform_us(rng, start_us, end_us, num_groups)
+        group_ids = entity_ids("group", self._take("group", num_groups), self.seed)
+        frames["groups_poc"] = pd.DataFrame({
+            'group_id': group_ids,
+            'group_deal_id': self.deal_ids[group_deal],
+            'group_leader_id': self.user_ids[leader_pos],
+            'status': status,
+            'created_at': timestamps(created_us),
+        })
+
+        member_group, member_user = draw_members(rng, self.deal_max_members[group_deal], leader_pos, max(len(self.user_ids), 1))
+        member_created = created_us[member_group]
+        joined_us = uniform_us(rng, member_created, end_us, len(member_group)) # join before the window closes
+        in_completed = np.flatnonzero(status[member_group] == 'completed')
+        linked = link_orders(rng, member_user[in_completed], member_created[in_completed], order_user[completed], order_us[completed])
+        linked_ids = np.full(len(member_group), None, dtype=object)
+        linked_ids[in_completed[linked >= 0]] = frames["orders_poc"]['order_id'].to_numpy()[completed][linked[linked >= 0]]
+        frames["group_members_poc"] = pd.DataFrame({
+            'group_member_id': entity_ids("group_member", self._take("group_member", len(member_group)), self.seed),
+            'group_id': group_ids[member_group],
+            'user_id': self.user_ids[member_user],
+            'joined_at': timestamps(joined_us),
+            'linked_order_id': linked_ids,
+        })
+        return frames
+
+    def insert_window(self, frames):
+        """Inserts one window, parents first. Returns {table: rows inserted}."""
+        inserted = {}
+        for table in TABLES:
+            df = frames.get(table)
+            if df is not None and len(df):
+                self.client.insert_df(table, df)
+                inserted[table] = len(df)
+        return inserted
+
+
+class ThroughputReport:
+    """Running totals of rows inserted, insert latency and schedule lag, printed per interval and overall."""
+
+    def __init__(self, target_rate):
+        self.target_rate = target_rate
+        self.started_at = time.monotonic()
+        self.totals = {table: 0 for table in TABLES}
+        self.windows = 0
+        self.insert_seconds = []
+        self.max_lag_seconds = 0.0
+        self._reset_interval(self.started_at)
+
+    def _reset_interval(self, now):
+        self._interval_start, self._interval_rows, self._interval_orders, self._interval_windows = now, 0, 0, 0
+
+    def add(self, inserted, insert_seconds, lag_seconds):
+        for table, rows in inserted.items():
+            self.totals[table] += rows
+        self.windows += 1
+        self.insert_seconds.append(insert_seconds)
+        self.max_lag_seconds = max(self.max_lag_seconds, lag_seconds)
+        self._interval_rows += sum(inserted.values())
+        self._interval_orders += inserted.get("orders_poc", 0)
+        self._interval_windows += 1
+
+    def print_interval(self, lag_seconds):
+        now = time.monotonic()
+        elapsed = max(now - self._interval_start, 1e-9)
+        print(f"[{now - self.started_at:7.1f}s] {self._interval_rows / elapsed:>10,.0f} rows/s, "
+              f"{self._interval_orders / elapsed:>8,.0f} orders/s (target {self.target_rate:,.0f}), "
+              f"insert p50 {self._p(0.5, self._interval_windows) * 1000:.0f} ms, lag {lag_seconds:.1f}s")
+        self._reset_interval(now)
+
+    def _p(self, q, last=None):
+        samples = self.insert_seconds[-last:] if last else self.insert_seconds
+        return float(np.quantile(samples, q)) if samples else 0.0
+
+    def summary(self):
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        return {
+            "seconds": round(elapsed, 1),
+            "windows": self.windows,
+            "target_orders_per_second": self.target_rate,
+            "orders_per_second": round(self.totals["orders_poc"] / elapsed, 1),
+            "rows_per_second": round(sum(self.totals.values()) / elapsed, 1),
+            "rows_per_second_by_table": {t: round(n / elapsed, 1) for t, n in self.totals.items()},
+            "rows_by_table": self.totals,
+            "window_insert_ms": {"p50": round(self._p(0.5) * 1000, 1), "p95": round(self._p(0.95) * 1000, 1), "max": round(self._p(1.0) * 1000, 1)},
+            "max_lag_seconds": round(self.max_lag_seconds, 1),
+        }
+
+
+def run(client, rate, window_seconds, duration=None, report_seconds=10.0, seed=None, user_pool_size=1_000_000,
+        refresh_seconds=60.0):
+    appender = Appender(client, rate, seed if seed is not None else random.getrandbits(32), user_pool_size)
+    appender.load_pools()
+    drop_rollup_views(client) # recreated on exit
+    report = ThroughputReport(rate)
+    window_us = int(window_seconds * 1_000_000)
+    next_report = time.monotonic() + report_seconds
+    next_refresh = time.monotonic() + refresh_seconds
+    window_start_us = _now_us()
+    try:
+        while duration is None or time.monotonic() - report.started_at < duration:
+            window_end_us = window_start_us + window_us
+            time.sleep(max(0.0, (window_end_us - _now_us()) / 1_000_000)) # events are stamped in the past only
+            frames = appender.build_window(window_start_us, window_end_us)
+            insert_started = time.monotonic()
+            inserted = appender.insert_window(frames)
+            lag_seconds = (_now_us() - window_end_us) / 1_000_000 # how long ago the inserted window closed
+            report.add(inserted, time.monotonic() - insert_started, lag_seconds)
+            if time.monotonic() >= next_report:
+                report.print_interval(lag_seconds)
+                next_report += report_seconds
+            if time.monotonic() >= next_refresh:
+                refresh_rollups(client)
+                next_refresh = time.monotonic() + refresh_seconds
+            window_start_us = window_end_us
+    except KeyboardInterrupt:
+        print("Stopping.")
+    finally:
+        create_poc_tables(client, 'create_rollups_poc.sql')
+        refresh_rollups(client)
+    summary = report.summary()
+    print(f"--- Appended {sum(summary['rows_by_table'].values()):,} rows in {summary['seconds']}s: "
+          f"{summary['rows_per_second']:,.0f} rows/s, {summary['orders_per_second']:,.0f} orders/s "
+          f"(target {rate:,.0f}), max lag {summary['max_lag_seconds']}s ---")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Continuously append PoC data at a target rate and report sustained insert throughput.")
+    parser.add_argument("--rate", type=float, default=100.0, help="Target orders per second; users, deals and groups scale with it.")
+    parser.add_argument("--window-seconds", type=float, default=1.0, help="Events are batched into one insert per table per window.")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds (default: run until Ctrl+C).")
+    parser.add_argument("--report-seconds", type=float, default=10.0, help="How often to print throughput.")
+    parser.add_argument("--refresh-seconds", type=float, default=60.0, help="How often to rebuild the rollups; they lag the base tables by up to this.")
+    parser.add_argument("--user-pool", type=int, default=1_000_000, help="Most recent users kept in memory as order and group members.")
+    parser.add_argument("--seed", type=int, help="Random seed (default: random, so ids differ between runs).")
+    parser.add_argument("--output", help="Write the throughput summary as JSON to this file.")
+    args = parser.parse_args()
+
+    client = get_db_client()
+    try:
+        summary = run(client, args.rate, args.window_seconds, args.duration, args.report_seconds, args.seed, args.user_pool, args.refresh_seconds)
+    finally:
+        client.close()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Throughput summary written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
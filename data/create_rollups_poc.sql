@@ -0,0 +1,146 @@
+-- File: data/create_rollups_poc.sql
+-- Pre-aggregated rollups for the common marketing questions, fed by materialized views.
+-- Revenue is always taken from order_items_poc (quantity * price_per_unit): orders_poc.total_amount is
+-- back-filled by ALTER ... UPDATE, and mutations do not reach materialized views.
+-- Additive measures are SimpleAggregateFunction(sum, ...) so they read with a plain sum()
+-- distinct counts are AggregateFunction(uniqExact, UUID) and read with uniqExactMerge().
+-- Rows for one key are only merged in the background, so always GROUP BY when querying a rollup.
+-- When two views feed one rollup, each only selects its own measures, the others get their defaults
+-- (0, or an empty aggregate state).
+-- data/generate_sample_data_poc.py creates these after the base tables and rebuilds them from the
+-- views' own SELECTs (see refresh_rollups) after loading data.
+--
+-- Staleness: a view fires only on inserts into the first table of its FROM, and joins that block
+-- against full scans of the other tables, so the loaders do not keep the views attached.
+--   * generate_bulk_data_poc.py and migrate_physical_layout_poc.py drop the views, load, then recreate
+--     them and call refresh_rollups: the rollups are exact when they finish.
+--   * append_sample_data_poc.py drops the views while it runs and calls refresh_rollups every
+--     --refresh-seconds and on exit: the rollups lag the base tables by up to that interval.
+--   * ALTER ... UPDATE (e.g. an order or group changing status) never reaches the rollups: whatever
+--     runs the mutation must call refresh_rollups afterwards, as generate_sample_data_poc.py does.
+-- Rows that other writers insert while the views are attached are aggregated on insert.
+
+USE chipchip_db;
+
+-- Sales by month, category and product
+CREATE TABLE IF NOT EXISTS sales_by_category_month_rollup (
+    month Date,                                              -- toStartOfMonth(orders_poc.order_date)
+    category_name LowCardinality(String),
+    product_id UUID,
+    product_name String,
+    units SimpleAggregateFunction(sum, Int64),               -- sum(quantity)
+    revenue SimpleAggregateFunction(sum, Decimal(38,2)),     -- sum(quantity * price_per_unit)
+    order_items SimpleAggregateFunction(sum, UInt64),        -- order item rows
+    orders AggregateFunction(uniqExact, UUID)                -- distinct orders, read with uniqExactMerge(orders)
+) ENGINE = AggregatingMergeTree()
+ORDER BY (month, category_name, product_id, product_name);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS sales_by_category_month_mv TO sales_by_category_month_rollup AS
+SELECT
+    toDate(toStartOfMonth(o.order_date)) AS month,
+    p.category_name AS category_name,
+    oi.product_id AS product_id,
+    p.product_name AS product_name,
+    sum(toInt64(oi.quantity)) AS units,
+    sum(oi.quantity * oi.price_per_unit) AS revenue,
+    count() AS order_items,
+    uniqExactState(oi.order_id) AS orders
+FROM order_items_poc AS oi
+INNER JOIN orders_poc AS o ON oi.order_id = o.order_id
+INNER JOIN products_poc AS p ON oi.product_id = p.product_id
+GROUP BY month, category_name, product_id, product_name;
+
+-- Orders and revenue by day, acquisition channel, payment method and order status
+CREATE TABLE IF NOT EXISTS orders_by_channel_day_rollup (
+    day Date,                                                -- toDate(orders_poc.order_date)
+    acquisition_channel LowCardinality(String),
+    payment_method LowCardinality(String),
+    order_status LowCardinality(String),
+    orders SimpleAggregateFunction(sum, UInt64),             -- number of orders
+    revenue SimpleAggregateFunction(sum, Decimal(38,2)),     -- sum of the orders' item amounts
+    units SimpleAggregateFunction(sum, Int64),
+    customers AggregateFunction(uniqExact, UUID)             -- distinct ordering users, read with uniqExactMerge(customers)
+) ENGINE = AggregatingMergeTree()
+ORDER BY (day, acquisition_channel, payment_method, order_status);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS orders_by_channel_day_orders_mv TO orders_by_channel_day_rollup AS
+SELECT
+    toDate(order_date) AS day,
+    acquisition_channel,
+    payment_method,
+    status AS order_status,
+    count() AS orders,
+    uniqExactState(user_id) AS customers
+FROM orders_poc
+GROUP BY day, acquisition_channel, payment_method, order_status;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS orders_by_channel_day_items_mv TO orders_by_channel_day_rollup AS
+SELECT
+    toDate(o.order_date) AS day,
+    o.acquisition_channel AS acquisition_channel,
+    o.payment_method AS payment_method,
+    o.status AS order_status,
+    sum(oi.quantity * oi.price_per_unit) AS revenue,
+    sum(toInt64(oi.quantity)) AS units
+FROM order_items_poc AS oi
+INNER JOIN orders_poc AS o ON oi.order_id = o.order_id
+GROUP BY day, acquisition_channel, payment_method, order_status;
+
+-- Group-buy conversion by month the group started, deal, product and group status
+CREATE TABLE IF NOT EXISTS group_deal_conversion_rollup (
+    month Date,                                              -- toStartOfMonth(groups_poc.created_at)
+    group_deal_id UUID,
+    product_id UUID,
+    group_status LowCardinality(String),                     -- 'active', 'completed', 'failed'
+    groups SimpleAggregateFunction(sum, UInt64),             -- groups started
+    members SimpleAggregateFunction(sum, UInt64),            -- members who joined those groups
+    converted_members SimpleAggregateFunction(sum, UInt64)   -- members whose participation resulted in an order
+) ENGINE = AggregatingMergeTree()
+ORDER BY (month, group_deal_id, product_id, group_status);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS group_deal_conversion_groups_mv TO group_deal_conversion_rollup AS
+SELECT
+    toDate(toStartOfMonth(g.created_at)) AS month,
+    g.group_deal_id AS group_deal_id,
+    gd.product_id AS product_id,
+    g.status AS group_status,
+    count() AS groups
+FROM groups_poc AS g
+INNER JOIN group_deals_poc AS gd ON g.group_deal_id = gd.group_deal_id
+GROUP BY month, group_deal_id, product_id, group_status;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS group_deal_conversion_members_mv TO group_deal_conversion_rollup AS
+SELECT
+    toDate(toStartOfMonth(g.created_at)) AS month,
+    g.group_deal_id AS group_deal_id,
+    gd.product_id AS product_id,
+    g.status AS group_status,
+    count() AS members,
+    countIf(gm.linked_order_id IS NOT NULL) AS converted_members
+FROM group_members_poc AS gm
+INNER JOIN groups_poc AS g ON gm.group_id = g.group_id
+INNER JOIN group_deals_poc AS gd ON g.group_deal_id = gd.group_deal_id
+GROUP BY month, group_deal_id, product_id, group_status;
+
+-- Monthly activity of registration cohorts (new-user retention)
+CREATE TABLE IF NOT EXISTS user_retention_rollup (
+    cohort_month Date,                                       -- toStartOfMonth(users_poc.registration_date)
+    activity_month Date,                                     -- toStartOfMonth(orders_poc.order_date)
+    registration_channel LowCardinality(String),
+    customer_segment LowCardinality(String),
+    active_users AggregateFunction(uniqExact, UUID),         -- distinct users who ordered, read with uniqExactMerge(active_users)
+    orders SimpleAggregateFunction(sum, UInt64)
+) ENGINE = AggregatingMergeTree()
+ORDER BY (cohort_month, activity_month, registration_channel, customer_segment);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS user_retention_mv TO user_retention_rollup AS
+SELECT
+    toDate(toStartOfMonth(u.registration_date)) AS cohort_month,
+    toDate(toStartOfMonth(o.order_date)) AS activity_month,
+    u.registration_channel AS registration_channel,
+    u.customer_segment AS customer_segment,
+    uniqExactState(o.user_id) AS active_users,
+    count() AS orders
+FROM orders_poc AS o
+INNER JOIN users_poc AS u ON o.user_id = u.user_id
+GROUP BY cohort_month, activity_month, registration_channel, customer_segment;
@@ -1,6 +1,12 @@
 -- File: data/create_tables_poc.sql
 -- These are PoC-specific tables derived and augmented from the provided schema by Tesfa
 -- to directly support the marketing queries in the task.
+--
+-- Physical layout: fact tables are partitioned by month on their event date and sorted by
+-- (day, foreign key, id), so date-range filters prune whole partitions and granules and joins on the
+-- foreign key read sorted runs. Lookups by the random UUID ids go through bloom_filter skip indexes.
+-- Status and channel columns are LowCardinality (dictionary-encoded).
+-- Existing databases are moved to this layout with data/migrate_physical_layout_poc.py.
 
 CREATE DATABASE IF NOT EXISTS chipchip_db;
 
@@ -12,13 +18,14 @@ CREATE TABLE IF NOT EXISTS users_poc (
     name String,
     email Nullable(String),
     registration_date DateTime64(6), -- From users.created_at
-    user_status String,               -- From users.user_status
+    user_status LowCardinality(String),   -- From users.user_status
     is_group_leader Boolean DEFAULT false, -- PoC specific
-    registration_channel String,          -- PoC specific
-    customer_segment String,              -- PoC specific
-    PRIMARY KEY (user_id)
+    registration_channel LowCardinality(String), -- PoC specific
+    customer_segment LowCardinality(String),     -- PoC specific
+    INDEX idx_user_id user_id TYPE bloom_filter(0.01) GRANULARITY 1
 ) ENGINE = MergeTree()
-ORDER BY (user_id);
+PARTITION BY toYYYYMM(registration_date)
+ORDER BY (toDate(registration_date), user_id);
 
 -- Categories Table
 CREATE TABLE IF NOT EXISTS categories_poc (
@@ -42,25 +49,28 @@ ORDER BY (category_id);
 CREATE TABLE IF NOT EXISTS products_poc (
     product_id UUID DEFAULT generateUUIDv4(),
     product_name String,        -- Denormalized
-    category_name String,       -- Denormalized
-    status String,              -- From products.status
+    category_name LowCardinality(String), -- Denormalized
+    status LowCardinality(String), -- From products.status
     original_price Decimal(8,2), -- Conceptual base price
-    PRIMARY KEY (product_id)
+    INDEX idx_product_id product_id TYPE bloom_filter(0.01) GRANULARITY 1
 ) ENGINE = MergeTree()
-ORDER BY (product_id);
+ORDER BY (category_name, product_id);
 
 -- Orders Table (PoC specific augmentations)
 CREATE TABLE IF NOT EXISTS orders_poc (
     order_id UUID DEFAULT generateUUIDv4(),
     user_id UUID,                       -- FK to users_poc.user_id
-    status String,                      -- From orders.status
+    status LowCardinality(String),      -- From orders.status
     total_amount Decimal(8,2),          -- From orders.total_amount
     order_date DateTime64(6),           -- From orders.created_at
-    payment_method String,              -- From orders.payment_method
-    acquisition_channel String,         -- PoC specific
-    PRIMARY KEY (order_id)
+    payment_method LowCardinality(String), -- From orders.payment_method
+    acquisition_channel LowCardinality(String), -- PoC specific
+    INDEX idx_order_id order_id TYPE bloom_filter(0.01) GRANULARITY 1,
+    INDEX idx_user_id user_id TYPE bloom_filter(0.01) GRANULARITY 1,
+    INDEX idx_acquisition_channel acquisition_channel TYPE set(100) GRANULARITY 4
 ) ENGINE = MergeTree()
-ORDER BY (order_id);
+PARTITION BY toYYYYMM(order_date)
+ORDER BY (toDate(order_date), user_id, order_id);
 
 -- Order Items Table (Essential for PoC)
 CREATE TABLE IF NOT EXISTS order_items_poc (
@@ -69,9 +79,10 @@ CREATE TABLE IF NOT EXISTS order_items_poc (
     product_id UUID,        -- FK to products_poc.product_id
     quantity Int32,
     price_per_unit Decimal(8,2),
-    PRIMARY KEY (order_item_id, order_id)
+    INDEX idx_product_id product_id TYPE bloom_filter(0.01) GRANULARITY 1
 ) ENGINE = MergeTree()
-ORDER BY (order_item_id, order_id);
+-- No date of its own: rows are sorted by the order they belong to
+ORDER BY (order_id, product_id, order_item_id);
 
 -- Group Deals Table (Simplified for PoC)
 CREATE TABLE IF NOT EXISTS group_deals_poc (
@@ -81,21 +92,22 @@ CREATE TABLE IF NOT EXISTS group_deals_poc (
     max_group_member Int32,
     effective_from DateTime64(6),
     effective_to Nullable(DateTime64(6)),
-    status String DEFAULT 'active', -- PoC: 'active', 'expired'
-    PRIMARY KEY (group_deal_id)
+    status LowCardinality(String) DEFAULT 'active', -- PoC: 'active', 'expired'
+    INDEX idx_group_deal_id group_deal_id TYPE bloom_filter(0.01) GRANULARITY 1
 ) ENGINE = MergeTree()
-ORDER BY (group_deal_id);
+ORDER BY (product_id, effective_from, group_deal_id);
 
 -- Groups Table (Represents an initiated group buy instance)
 CREATE TABLE IF NOT EXISTS groups_poc (
     group_id UUID DEFAULT generateUUIDv4(),
     group_deal_id UUID,     -- FK to group_deals_poc.group_deal_id
     group_leader_id UUID,   -- FK to users_poc.user_id where is_group_leader=true
-    status String,          -- PoC: 'active', 'completed', 'failed'
+    status LowCardinality(String), -- PoC: 'active', 'completed', 'failed'
     created_at DateTime64(6),
-    PRIMARY KEY (group_id)
+    INDEX idx_group_id group_id TYPE bloom_filter(0.01) GRANULARITY 1
 ) ENGINE = MergeTree()
-ORDER BY (group_id);
+PARTITION BY toYYYYMM(created_at)
+ORDER BY (toDate(created_at), group_deal_id, group_id);
 
 -- Group Members Table (Users participating in a group)
 CREATE TABLE IF NOT EXISTS group_members_poc (
@@ -104,6 +116,8 @@ CREATE TABLE IF NOT EXISTS group_members_poc (
     user_id UUID,           -- FK to users_poc.user_id
     joined_at DateTime64(6),
     linked_order_id Nullable(UUID), -- FK to orders_poc.order_id if their participation resulted in an order
-    PRIMARY KEY (group_member_id, group_id, user_id)
+    INDEX idx_user_id user_id TYPE bloom_filter(0.01) GRANULARITY 1,
+    INDEX idx_linked_order_id linked_order_id TYPE bloom_filter(0.01) GRANULARITY 1
 ) ENGINE = MergeTree()
-ORDER BY (group_member_id, group_id, user_id);
\ No newline at end of file
+PARTITION BY toYYYYMM(joined_at)
+ORDER BY (group_id, user_id, group_member_id);
\ No newline at end of file
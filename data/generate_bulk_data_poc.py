@@ -0,0 +1,429 @@
+# File: data/generate_bulk_data_poc.py
+"""
+Vectorized, multi-process version of generate_sample_data_poc.py for load testing at realistic volumes.
+
+Every table is built as NumPy/pandas columns and streamed to ClickHouse with insert_df in batches:
+  - ids are derived from (table, row index, seed) by a hash, so any process can compute the id of
+    user #i or order #j without shipping id lists around, and reruns with the same seed are identical
+  - product prices and categories are looked up from in-memory arrays, and order totals are summed
+    from the items before the orders are inserted (no per-order ALTER TABLE ... UPDATE)
+  - users and orders/order items are generated in chunks by a pool of worker processes, each with its
+    own ClickHouse connection, while deals, groups and members are built in the parent from the compact
+    list of completed orders the workers return
+The distributions follow generate_sample_data_poc.py (July sign-ups, May/June/August order spikes,
+larger Fresh Produce quantities in August, 30% of groups started in May, ...), with every NUM_*
+count multiplied by --scale. The rollup views are dropped during the load and rebuilt at the end.
+
+Usage (from the project root):
+    python ./data/generate_bulk_data_poc.py --scale 1000 --workers 8   # 200k users, 1M orders, ~3M items
+"""
+import argparse
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from generate_sample_data_poc import (
+    get_db_client, create_poc_tables, clear_poc_tables, drop_rollup_views, refresh_rollups, fake,
+    NUM_USERS, NUM_CATEGORIES, NUM_PRODUCTS_PER_CATEGORY, NUM_ORDERS, NUM_GROUP_DEALS,
+    NUM_GROUPS_PER_DEAL, MAX_MEMBERS_PER_GROUP, DATE_START, DATE_END
+)
+
+REG_CHANNELS = np.array(['organic', 'referral', 'paid_ad_facebook', 'paid_ad_influencer', 'paid_ad_google'])
+CUST_SEGMENTS = np.array(['Working Professionals', 'Students', 'Home Makers', 'Tech Savvy', 'Budget Shoppers'])
+USER_STATUSES = np.array(['active', 'inactive', 'pending'])
+BASE_CATEGORIES = ['Fresh Produce', 'Dairy & Eggs', 'Bakery', 'Pantry Staples', 'Beverages', 'Snacks', 'Frozen Foods']
+ACQ_CHANNELS = np.array(['organic', 'influencer_campaign_A', 'facebook_ad_B', 'referral', 'direct', 'email_marketing'])
+ORDER_STATUSES = np.array(['completed', 'pending', 'shipped', 'delivered', 'cancelled'])
+PAYMENT_METHODS = np.array(['credit_card', 'paypal', 'telebirr', 'cbe_birr'])
+GROUP_STATUSES = np.array(['active', 'active', 'completed', 'failed'])
+MAX_ITEMS_PER_ORDER = 5
+
+# Separate id spaces per table, so user #7 and order #7 get unrelated ids
+ID_SPACES = {"user": 1, "category": 2, "product": 3, "order": 4, "order_item": 5,
+             "group_deal": 6, "group": 7, "group_member": 8, "leader": 9}
+
+_MASK64 = (1 << 64) - 1
+_HEX = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+
+
+def _to_us(dt):
+    return int(np.datetime64(dt, 'us').astype(np.int64))
+
+
+START_US, END_US = _to_us(DATE_START), _to_us(DATE_END)
+MONTH_RANGES_US = {m: (_to_us(f"2024-{m:02d}-01"), _to_us(f"2024-{m + 1:02d}-01") - 1) for m in (5, 6, 7, 8)}
+DAY_US = 86_400 * 1_000_000
+
+
+def _mix(indices, salt):
+    """splitmix64 finalizer over uint64 (a bijection, so distinct indices never collide)."""
+    with np.errstate(over='ignore'):
+        z = np.asarray(indices, dtype=np.uint64) + np.uint64((salt * 0x9E3779B97F4A7C15) & _MASK64)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+def entity_ids(kind, indices, seed):
+    """Version-4 style UUID strings for rows `indices` of table `kind`, the same in every process."""
+    salt = (seed << 8) + 2 * ID_SPACES[kind]
+    hi = (_mix(indices, salt) & np.uint64(0xFFFFFFFFFFFF0FFF)) | np.uint64(0x4000)
+    lo = (_mix(indices, salt + 1) & np.uint64(0x3FFFFFFFFFFFFFFF)) | np.uint64(0x8000000000000000)
+    raw = np.concatenate([hi.astype('>u8').view(np.uint8).reshape(-1, 8),
+                          lo.astype('>u8').view(np.uint8).reshape(-1, 8)], axis=1)
+    digits = np.empty((len(raw), 32), dtype=np.uint8)
+    digits[:, 0::2] = _HEX[raw >> 4]
+    digits[:, 1::2] = _HEX[raw & 15]
+    chars = np.insert(digits, [8, 12, 16, 20], ord('-'), axis=1)
+    return np.ascontiguousarray(chars).view('S36').ravel().astype('U36').astype(object)
+
+
+def entity_uniform(kind, indices, seed):
+    """A uniform [0, 1) draw per row index, the same in every process."""
+    return (_mix(indices, (seed << 8) + 2 * ID_SPACES[kind] + 1000) >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def leader_mask(user_indices, num_users, seed):
+    """is_group_leader: the first 10% of users, then about one in four (as in generate_users_poc)."""
+    user_indices = np.asarray(user_indices, dtype=np.int64)
+    return (user_indices < num_users * 0.1) | (entity_uniform("leader", user_indices, seed) < 0.25)
+
+
+def timestamps(us):
+    """DateTime64(6) column from microseconds since the epoch."""
+    return pd.Series(np.asarray(us, dtype=np.int64).astype('datetime64[us]'))
+
+
+def uniform_us(rng, start_us, end_us, size):
+    """`size` instants drawn uniformly from [start_us, end_us]; the bounds may be arrays, one per instant."""
+    return rng.integers(start_us, np.maximum(np.asarray(end_us), start_us) + 1, size=size, dtype=np.int64)
+
+
+def _skewed_us(rng, size, skews):
+    """Uniform over DATE_START..DATE_END, except a share of rows moved into given months: [(share, month), ...]."""
+    us = uniform_us(rng, START_US, END_US, size)
+    draw = rng.random(size)
+    lower = 0.0
+    for share, month in skews:
+        hit = (draw >= lower) & (draw < lower + share)
+        us[hit] = uniform_us(rng, *MONTH_RANGES_US[month], int(hit.sum()))
+        lower += share
+    return us
+
+
+def name_pools(seed, size=1000):
+    """First names, last names, email domains and product-name words the builders draw from, the same for a given seed."""
+    fake.seed_instance(seed)
+    return (np.array([fake.first_name() for _ in range(size)], dtype=object),
+            np.array([fake.last_name() for _ in range(size)], dtype=object),
+            np.array([fake.free_email_domain() for _ in range(20)], dtype=object),
+            np.array([fake.word().capitalize() for _ in range(size)], dtype=object))
+
+
+def build_users(start, count, num_users, seed, pools, registered_us=None):
+    """
+    Users [start, start + count). Registration dates follow the generate_users_poc skew unless
+    `registered_us` is given; `num_users` is the planned total, whose first 10% are all group leaders.
+    """
+    rng = np.random.default_rng([seed, ID_SPACES["user"], start])
+    first_names, last_names, domains, _ = pools
+    idx = np.arange(start, start + count, dtype=np.int64)
+    first = first_names[rng.integers(0, len(first_names), count)]
+    last = last_names[rng.integers(0, len(last_names), count)]
+    if registered_us is None:
+        registered_us = uniform_us(rng, START_US, END_US, count)
+        july = idx < num_users * 0.15 # 15% users register in July
+        registered_us[july] = uniform_us(rng, *MONTH_RANGES_US[7], int(july.sum()))
+    emails = (pd.Series(first).str.lower() + "." + pd.Series(last).str.lower() + idx.astype(str).astype(object)
+              + "@" + domains[rng.integers(0, len(domains), count)])
+    return pd.DataFrame({
+        'user_id': entity_ids("user", idx, seed),
+        'name': first + " " + last,
+        'email': emails.to_numpy(dtype=object),
+        'registration_date': timestamps(registered_us),
+        'user_status': USER_STATUSES[rng.integers(0, len(USER_STATUSES), count)],
+        'is_group_leader': leader_mask(idx, num_users, seed),
+        'registration_channel': REG_CHANNELS[rng.integers(0, len(REG_CHANNELS), count)],
+        'customer_segment': CUST_SEGMENTS[rng.integers(0, len(CUST_SEGMENTS), count)],
+    })
+
+
+def build_catalog(num_categories, products_per_category, seed, pools):
+    """Categories and products, plus the per-product arrays orders need: (categories_df, products_df, prices, is_fresh)."""
+    rng = np.random.default_rng([seed, ID_SPACES["category"]])
+    names = list(rng.choice(BASE_CATEGORIES, min(num_categories, len(BASE_CATEGORIES)), replace=False))
+    if 'Fresh Produce' not in names and names: # Ensure 'Fresh Produce' for Q3
+        names[0] = 'Fresh Produce'
+    categories = pd.DataFrame({'category_id': entity_ids("category", np.arange(len(names)), seed), 'category_name': names})
+
+    num_products = len(names) * products_per_category
+    product_category = np.repeat(np.array(names, dtype=object), products_per_category)
+    prices = np.round(rng.uniform(1.0, 100.0, num_products), 2)
+    words = pools[3][rng.integers(0, len(pools[3]), num_products)]
+    products = pd.DataFrame({
+        'product_id': entity_ids("product", np.arange(num_products), seed),
+        'product_name': product_category + " Item " + words,
+        'category_name': product_category,
+        'status': 'active',
+        'original_price': prices,
+    })
+    return categories, products, prices, product_category == 'Fresh Produce'
+
+
+def build_orders(idx, user_ids, order_us, rng, seed, product_ids, prices, is_fresh):
+    """
+    Orders `idx` (placed by `user_ids` at `order_us`) and their items, with totals computed from the items.
+    Returns (orders_df, items_df, completed), `completed` being the boolean mask of completed orders.
+    """
+    count = len(idx)
+    status = ORDER_STATUSES[rng.integers(0, len(ORDER_STATUSES), count)]
+    items_per_order = rng.integers(1, MAX_ITEMS_PER_ORDER + 1, count)
+    item_order = np.repeat(np.arange(count), items_per_order) # position of each item's order in `idx`
+    position = np.arange(len(item_order)) - np.repeat(np.cumsum(items_per_order) - items_per_order, items_per_order)
+    product_idx = rng.integers(0, len(prices), len(item_order))
+    in_august = np.asarray(order_us).astype('datetime64[us]').astype('datetime64[M]').astype(np.int64) % 12 == 7
+    featured = in_august[item_order] & is_fresh[product_idx] # higher quantity for Fresh Produce in August
+    quantity = np.where(featured, rng.integers(1, 6, len(item_order)), rng.integers(1, 4, len(item_order)))
+    price = prices[product_idx]
+    totals = np.round(np.bincount(item_order, weights=quantity * price, minlength=count), 2)
+
+    order_ids = entity_ids("order", idx, seed)
+    orders = pd.DataFrame({
+        'order_id': order_ids,
+        'user_id': user_ids,
+        'status': status,
+        'total_amount': totals,
+        'order_date': timestamps(order_us),
+        'payment_method': PAYMENT_METHODS[rng.integers(0, len(PAYMENT_METHODS), count)],
+        'acquisition_channel': ACQ_CHANNELS[rng.integers(0, len(ACQ_CHANNELS), count)],
+    })
+    items = pd.DataFrame({
+        'order_item_id': entity_ids("order_item", idx[item_order] * MAX_ITEMS_PER_ORDER + position, seed),
+        'order_id': order_ids[item_order],
+        'product_id': product_ids[product_idx],
+        'quantity': quantity.astype(np.int32),
+        'price_per_unit': price,
+    })
+    return orders, items, status == 'completed'
+
+
+def build_group_deals(idx, eff_from_us, rng, seed, product_ids, prices):
+    """Deals `idx` starting at `eff_from_us`. Returns (deals_df, end_us), `end_us` being effective_to or DATE_END."""
+    count = len(idx)
+    product_idx = rng.integers(0, len(prices), count)
+    has_end = rng.random(count) < 0.5
+    eff_to = eff_from_us + rng.integers(7, 31, count) * DAY_US
+    now_us = _to_us(np.datetime64('now'))
+    deals = pd.DataFrame({
+        'group_deal_id': entity_ids("group_deal", idx, seed),
+        'product_id': product_ids[product_idx],
+        'group_price': np.round(prices[product_idx] * rng.uniform(0.7, 0.9, count), 2), # Discounted
+        'max_group_member': rng.integers(5, MAX_MEMBERS_PER_GROUP + 1, count).astype(np.int32),
+        'effective_from': timestamps(eff_from_us),
+        'effective_to': pd.Series(eff_to.astype('datetime64[us]')).where(has_end, None),
+        'status': np.where(~has_end | (eff_to > now_us), 'active', 'expired').astype(object),
+    })
+    return deals, np.where(has_end, eff_to, END_US)
+
+
+def draw_members(rng, max_members, leader_idx, num_users):
+    """
+    Between 1 and `max_members` members per group, drawn from user indices [0, num_users) with the
+    leader and repeats within a group removed. Returns (group position, user index) arrays.
+    """
+    member_group = np.repeat(np.arange(len(max_members)), rng.integers(1, np.asarray(max_members) + 1))
+    member_user = rng.integers(0, num_users, len(member_group))
+    keep = member_user != leader_idx[member_group]
+    member_group, member_user = member_group[keep], member_user[keep]
+    _, first = np.unique(member_group * np.int64(num_users) + member_user, return_index=True)
+    first.sort()
+    return member_group[first], member_user[first]
+
+
+def link_orders(rng, member_user, since_us, completed_user, completed_us):
+    """
+    For each member of a completed group, one of their own completed orders placed at or after
+    `since_us`, else (30% of the time) any completed order placed after it. Returns positions in
+    the completed arrays, -1 for no link.
+    """
+    linked = np.full(len(member_user), -1, dtype=np.int64)
+    if not len(member_user) or not len(completed_us):
+        return linked
+    # Own orders: completed orders sorted by (user, time); the user's orders since the group started form a run.
+    # Times are replaced by their rank so (user, rank) packs into one int64 key.
+    times, rank = np.unique(np.concatenate([completed_us, since_us]), return_inverse=True)
+    bits = len(times).bit_length()
+    order_key = np.asarray(completed_user, dtype=np.int64) << bits | rank[:len(completed_us)]
+    by_key = np.argsort(order_key, kind='stable')
+    sorted_key = order_key[by_key]
+    users = np.asarray(member_user, dtype=np.int64)
+    lo = np.searchsorted(sorted_key, users << bits | rank[len(completed_us):], side='left')
+    hi = np.searchsorted(sorted_key, (users + 1) << bits, side='left')
+    own = hi > lo
+    pick = lo + (rng.random(len(lo)) * (hi - lo)).astype(np.int64)
+    linked[own] = by_key[pick[own]]
+
+    by_date = np.argsort(completed_us, kind='stable')
+    start = np.searchsorted(completed_us[by_date], since_us, side='left')
+    fallback = ~own & (start < len(by_date)) & (rng.random(len(start)) < 0.3)
+    pick = start + (rng.random(len(start)) * (len(by_date) - start)).astype(np.int64)
+    linked[fallback] = by_date[pick[fallback]]
+    return linked
+
+
+def build_groups_and_members(deals, deal_from_us, deal_to_us, num_users, seed, completed):
+    """
+    Groups for the active deals and their members. Members of completed groups are linked to one of
+    their own completed orders placed after the group started, else (30% of the time) to any such order.
+    `completed` holds the (user_index, order_date_us, order_index) arrays of the completed orders.
+    """
+    rng = np.random.default_rng([seed, ID_SPACES["group"]])
+    leaders = np.flatnonzero(leader_mask(np.arange(num_users), num_users, seed))
+    active = np.flatnonzero(deals['status'].to_numpy() == 'active')
+    if not len(leaders) or not len(active):
+        print("Warning: No group leaders or active deals. Cannot generate groups or group members.")
+        return pd.DataFrame(), pd.DataFrame()
+
+    group_deal = np.repeat(active, rng.integers(1, NUM_GROUPS_PER_DEAL + 1, len(active)))
+    num_groups = len(group_deal)
+    leader_idx = leaders[rng.integers(0, len(leaders), num_groups)]
+    status = GROUP_STATUSES[rng.integers(0, len(GROUP_STATUSES), num_groups)]
+    created_us = uniform_us(rng, deal_from_us[group_deal], deal_to_us[group_deal], num_groups)
+    in_may = rng.random(num_groups) < 0.3 # 30% chance group created in May
+    created_us[in_may] = uniform_us(rng, *MONTH_RANGES_US[5], int(in_may.sum()))
+    group_ids = entity_ids("group", np.arange(num_groups), seed)
+    groups = pd.DataFrame({
+        'group_id': group_ids,
+        'group_deal_id': deals['group_deal_id'].to_numpy()[group_deal],
+        'group_leader_id': entity_ids("user", leader_idx, seed),
+        'status': status,
+        'created_at': timestamps(created_us),
+    })
+
+    member_group, member_user = draw_members(rng, deals['max_group_member'].to_numpy()[group_deal], leader_idx, num_users)
+    member_created = created_us[member_group]
+    in_completed = np.flatnonzero(status[member_group] == 'completed')
+    completed_users, completed_us, completed_idx = completed
+    linked = link_orders(rng, member_user[in_completed], member_created[in_completed], completed_users, completed_us)
+    linked_ids = np.full(len(member_group), None, dtype=object)
+    linked_ids[in_completed[linked >= 0]] = entity_ids("order", completed_idx[linked[linked >= 0]], seed)
+    members = pd.DataFrame({
+        'group_member_id': entity_ids("group_member", np.arange(len(member_group)), seed),
+        'group_id': group_ids[member_group],
+        'user_id': entity_ids("user", member_user, seed),
+        'joined_at': timestamps(member_created + rng.integers(0, 3 * DAY_US + 1, len(member_group))),
+        'linked_order_id': linked_ids,
+    })
+    return groups, members
+
+
+def insert_batches(client, table, df, batch_rows):
+    for offset in range(0, len(df), batch_rows):
+        client.insert_df(table, df.iloc[offset:offset + batch_rows])
+    return len(df)
+
+
+# Worker processes: one ClickHouse connection each, set up by the pool initializer
+_worker = {}
+
+
+def _init_worker(config):
+    _worker.update(config)
+    _worker["client"] = get_db_client()
+    _worker["pools"] = name_pools(config["seed"])
+
+
+def _run_task(task):
+    kind, start, count = task
+    client, seed, batch_rows = _worker["client"], _worker["seed"], _worker["batch_rows"]
+    if kind == "users":
+        users = build_users(start, count, _worker["num_users"], seed, _worker["pools"])
+        return {"users_poc": insert_batches(client, 'users_poc', users, batch_rows)}, None
+    rng = np.random.default_rng([seed, ID_SPACES["order"], start])
+    idx = np.arange(start, start + count, dtype=np.int64)
+    user_idx = rng.integers(0, _worker["num_users"], count)
+    order_us = _skewed_us(rng, count, [(0.1, 5), (0.1, 6), (0.1, 8)]) # ~10% each in May, June and August
+    orders, items, completed = build_orders(idx, entity_ids("user", user_idx, seed), order_us, rng, seed,
+                                            _worker["product_ids"], _worker["prices"], _worker["is_fresh"])
+    inserted = {
+        "orders_poc": insert_batches(client, 'orders_poc', orders, batch_rows),
+        "order_items_poc": insert_batches(client, 'order_items_poc', items, batch_rows),
+    }
+    return inserted, (user_idx[completed], order_us[completed], idx[completed])
+
+
+def _chunks(kind, total, size):
+    return [(kind, start, min(size, total - start)) for start in range(0, total, size)]
+
+
+def generate(client, scale=1, workers=None, batch_rows=200_000, seed=42):
+    """Loads the PoC tables at `scale` times the NUM_* counts and returns {table: rows inserted}."""
+    workers = workers or os.cpu_count() or 1
+    num_users, num_orders = NUM_USERS * scale, NUM_ORDERS * scale
+    pools = name_pools(seed)
+    counts = {}
+
+    categories, products, prices, is_fresh = build_catalog(NUM_CATEGORIES, NUM_PRODUCTS_PER_CATEGORY * scale, seed, pools)
+    counts["categories_poc"] = insert_batches(client, 'categories_poc', categories, batch_rows)
+    counts["products_poc"] = insert_batches(client, 'products_poc', products, batch_rows)
+
+    # Users first, so orders never reference a user that is not there yet
+    product_ids = products['product_id'].to_numpy()
+    config = {"seed": seed, "batch_rows": batch_rows, "num_users": num_users,
+              "product_ids": product_ids, "prices": prices, "is_fresh": is_fresh}
+    completed_parts = []
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(config,)) as pool:
+        for tasks in (_chunks("users", num_users, batch_rows), _chunks("orders", num_orders, batch_rows)):
+            for inserted, completed in pool.imap_unordered(_run_task, tasks):
+                for table, rows in inserted.items():
+                    counts[table] = counts.get(table, 0) + rows
+                if completed is not None:
+                    completed_parts.append(completed)
+            print(f"Inserted {', '.join(f'{t}: {n}' for t, n in counts.items() if t != 'categories_poc' and t != 'products_poc')}")
+    completed = tuple(np.concatenate(part) for part in zip(*completed_parts)) if completed_parts else (np.array([], dtype=np.int64),) * 3
+
+    num_deals = NUM_GROUP_DEALS * scale
+    rng = np.random.default_rng([seed, ID_SPACES["group_deal"]])
+    deal_from_us = uniform_us(rng, START_US, END_US - 10 * DAY_US, num_deals)
+    deals, deal_to_us = build_group_deals(np.arange(num_deals), deal_from_us, rng, seed, product_ids, prices)
+    counts["group_deals_poc"] = insert_batches(client, 'group_deals_poc', deals, batch_rows)
+    groups, members = build_groups_and_members(deals, deal_from_us, deal_to_us, num_users, seed, completed)
+    counts["groups_poc"] = insert_batches(client, 'groups_poc', groups, batch_rows)
+    counts["group_members_poc"] = insert_batches(client, 'group_members_poc', members, batch_rows)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate PoC sample data at scale with vectorized builders and worker processes.")
+    parser.add_argument("--scale", type=int, default=100, help="Multiplier for the NUM_* row counts in generate_sample_data_poc.py.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes generating users and orders.")
+    parser.add_argument("--batch-rows", type=int, default=200_000, help="Rows per generated chunk and per insert.")
+    parser.add_argument("--seed", type=int, default=42, help="Same seed, same data (ids included).")
+    args = parser.parse_args()
+
+    client = get_db_client()
+    try:
+        create_poc_tables(client)
+        clear_poc_tables(client)
+        drop_rollup_views(client) # a view per insert block would re-run its joins for every batch
+        started_at = time.perf_counter()
+        print(f"\n--- Starting Bulk Data Generation (scale {args.scale}, {args.workers} workers) ---")
+        counts = generate(client, args.scale, args.workers, args.batch_rows, args.seed)
+        elapsed = time.perf_counter() - started_at
+        create_poc_tables(client, 'create_rollups_poc.sql')
+        refresh_rollups(client)
+        total = sum(counts.values())
+        for table, rows in counts.items():
+            print(f"  {table:<20}{rows:>14,}")
+        print(f"--- Bulk Data Generation Complete: {total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s), "
+              f"rollups rebuilt in {time.perf_counter() - started_at - elapsed:.1f}s ---")
+    finally:
+        client.close()
+        print("Database connection closed.")
+
+
+if __name__ == "__main__":
+    main()
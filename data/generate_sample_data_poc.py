@@ -5,6 +5,7 @@ import random
 import uuid
 from datetime import datetime, timedelta
 import os
+import re
 from dotenv import load_dotenv
 
 env_path_options = [
@@ -71,12 +72,12 @@ def clear_poc_tables(client):
             print(f"Error truncating table {table}: {e}")
     print("PoC tables cleared (or attempted).")
 
-def create_poc_tables(client):
+def create_poc_tables(client, filename='create_tables_poc.sql'):
     """
-    Ensure PoC schema exists by executing DDL from create_tables_poc.sql
+    Ensure PoC schema exists by executing DDL from create_tables_poc.sql (or another DDL file next to it)
     """
     import os
-    sql_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'create_tables_poc.sql')
+    sql_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
     with open(sql_path, 'r') as f:
         ddl = f.read()
     for stmt in ddl.split(';'):
@@ -88,7 +89,49 @@ def create_poc_tables(client):
         except Exception:
             # ignore existing or invalid statements
             pass
-    print("Ensured PoC tables exist.")
+    print(f"Ensured PoC tables from {filename} exist.")
+
+def rollup_views(filename='create_rollups_poc.sql'):
+    """
+    (view, target rollup table, SELECT) for each materialized view in create_rollups_poc.sql, so rollups
+    can be rebuilt without the views attached and other views in the database are left alone.
+    """
+    sql_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+    with open(sql_path, 'r') as f:
+        ddl = f.read()
+    return re.findall(
+        r"CREATE\s+MATERIALIZED\s+VIEW\s+(?:IF\s+NOT\s+EXISTS\s+)?`?(\w+)`?\s+TO\s+`?(\w+)`?\s+AS\s+(SELECT\b.*?);",
+        ddl, re.IGNORECASE | re.DOTALL
+    )
+
+def drop_rollup_views(client):
+    """
+    Drops the materialized views feeding the rollups (create_rollups_poc.sql recreates them).
+    Loaders run without them, so inserts do not re-run the views' joins, and call refresh_rollups afterwards.
+    """
+    for view, _, _ in rollup_views():
+        client.command(f"DROP VIEW IF EXISTS {view}")
+
+def refresh_rollups(client):
+    """
+    Rebuilds every rollup table from the SELECTs of the materialized views that feed it, whether or
+    not the views are attached. Each rollup is built in a scratch copy and swapped in with
+    EXCHANGE TABLES, so queries never see a half-built rollup.
+    """
+    views_by_target = {}
+    for _, target, as_select in rollup_views():
+        views_by_target.setdefault(target, []).append(as_select)
+    for target, selects in views_by_target.items():
+        rebuild = f"{target}__rebuild"
+        client.command(f"DROP TABLE IF EXISTS {rebuild}")
+        client.command(f"CREATE TABLE {rebuild} AS {target}")
+        for as_select in selects:
+            # each view selects only its own measures; the others keep their defaults
+            columns = [row[0] for row in client.query(f"DESCRIBE TABLE ({as_select})").result_rows]
+            client.command(f"INSERT INTO {rebuild} ({', '.join(columns)}) {as_select}")
+        client.command(f"EXCHANGE TABLES {rebuild} AND {target}")
+        client.command(f"DROP TABLE {rebuild}")
+        print(f"Rebuilt rollup {target} from {len(selects)} view(s).")
 
 def insert_data(client, table_name, records):
     """
@@ -381,6 +424,7 @@ def main():
         client = get_db_client()
         # Create tables if missing, then clear
         create_poc_tables(client)
+        create_poc_tables(client, 'create_rollups_poc.sql')
         clear_poc_tables(client)
 
         print("\n--- Starting Data Generation ---")
@@ -410,6 +454,8 @@ def main():
             print("Skipping groups and members generation due to missing prerequisite data.")
 
 
+        refresh_rollups(client)
+
         print("\n--- Data Generation Complete ---")
 
     except Exception as e:
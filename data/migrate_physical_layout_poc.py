@@ -0,0 +1,232 @@
+# File: data/migrate_physical_layout_poc.py
+"""
+Moves existing PoC tables to the physical layout in create_tables_poc.sql (monthly partitions,
+date/foreign-key sort keys, LowCardinality columns, skip indexes) and benchmarks representative
+queries before and after.
+
+For every table whose definition differs from the DDL file:
+  1. CREATE TABLE <table>__migrating with the new DDL
+  2. INSERT INTO <table>__migrating SELECT ... FROM <table>, then compare row counts
+  3. EXCHANGE TABLES <table> AND <table>__migrating (atomic; needs the default Atomic database engine)
+  4. RENAME the old data, now in <table>__migrating, to <table>__backup (or drop it with --drop-backup)
+Tables of the DDL file that do not exist yet are created (empty) in the new layout and reported.
+The rollup views are then recreated on the new tables and the rollups rebuilt.
+Pause ingestion while it runs: rows inserted into a table during its copy are not carried over.
+
+Usage (from the project root):
+    python ./data/migrate_physical_layout_poc.py --runs 5 --output migration_benchmark.json
+    python ./data/migrate_physical_layout_poc.py --dry-run          # show which tables would move
+    python ./data/migrate_physical_layout_poc.py --benchmark-only   # just time the queries
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import time
+
+from generate_sample_data_poc import get_db_client, create_poc_tables, drop_rollup_views, refresh_rollups
+
+DDL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'create_tables_poc.sql')
+MIGRATING_SUFFIX = "__migrating"
+BACKUP_SUFFIX = "__backup"
+
+# Representative questions: date-range filters, joins on foreign keys and id lookups.
+# {user_id} and {order_id} are filled with ids read once, so every run looks up the same rows.
+BENCHMARK_QUERIES = {
+    "orders_in_may": (
+        "SELECT count() FROM orders_poc "
+        "WHERE order_date >= '2024-05-01' AND order_date < '2024-06-01'"
+    ),
+    "revenue_by_channel_august": (
+        "SELECT acquisition_channel, sum(total_amount) AS revenue FROM orders_poc "
+        "WHERE toStartOfMonth(order_date) = '2024-08-01' GROUP BY acquisition_channel ORDER BY revenue DESC"
+    ),
+    "fresh_produce_units_august": (
+        "SELECT p.product_name, sum(oi.quantity) AS units FROM order_items_poc AS oi "
+        "INNER JOIN orders_poc AS o ON oi.order_id = o.order_id "
+        "INNER JOIN products_poc AS p ON oi.product_id = p.product_id "
+        "WHERE o.order_date >= '2024-08-01' AND o.order_date < '2024-09-01' AND p.category_name = 'Fresh Produce' "
+        "GROUP BY p.product_name ORDER BY units DESC LIMIT 10"
+    ),
+    "july_signups_ordering_in_august": (
+        "SELECT count(DISTINCT o.user_id) FROM orders_poc AS o "
+        "INNER JOIN users_poc AS u ON o.user_id = u.user_id "
+        "WHERE u.registration_date >= '2024-07-01' AND u.registration_date < '2024-08-01' "
+        "AND o.order_date >= '2024-08-01' AND o.order_date < '2024-09-01'"
+    ),
+    "completed_groups_members_may": (
+        "SELECT count() FROM group_members_poc AS gm INNER JOIN groups_poc AS g ON gm.group_id = g.group_id "
+        "WHERE g.status = 'completed' AND g.created_at >= '2024-05-01' AND g.created_at < '2024-06-01'"
+    ),
+    "orders_of_one_user": "SELECT count(), sum(total_amount) FROM orders_poc WHERE user_id = '{user_id}'",
+    "order_by_id": "SELECT * FROM orders_poc WHERE order_id = '{order_id}'",
+}
+
+
+def read_table_ddl(path=DDL_PATH):
+    """Returns {table: CREATE TABLE statement} from the DDL file."""
+    with open(path, 'r') as f:
+        ddl = f.read()
+    statements = {}
+    for stmt in ddl.split(';'):
+        stmt = re.sub(r"--[^\n]*", "", stmt).strip() # also drops commented-out tables
+        match = re.match(r"CREATE TABLE IF NOT EXISTS (\w+)", stmt)
+        if match:
+            statements[match.group(1)] = stmt
+    return statements
+
+
+def table_definition(client, table):
+    """The server's normalized CREATE statement for `table`, with its name removed so copies compare equal."""
+    rows = client.query(
+        f"SELECT create_table_query FROM system.tables WHERE database = currentDatabase() AND name = '{table}'"
+    ).result_rows
+    if not rows:
+        return None
+    return re.sub(rf"\.`?{re.escape(table)}`?(?=\s)", ".<table>", rows[0][0], count=1)
+
+
+def count_rows(client, table):
+    return client.query(f"SELECT count() FROM {table}").result_rows[0][0]
+
+
+def missing_tables(client, statements):
+    """Tables of the DDL file that do not exist yet; there is nothing to migrate, they are created in the new layout."""
+    return [table for table in statements if table_definition(client, table) is None]
+
+
+def plan_migration(client, statements):
+    """Creates a <table>__migrating copy of every existing table's new DDL and returns the tables whose layout changes."""
+    to_migrate = []
+    for table, stmt in statements.items():
+        migrating = f"{table}{MIGRATING_SUFFIX}"
+        client.command(f"DROP TABLE IF EXISTS {migrating}")
+        client.command(stmt.replace(f"CREATE TABLE IF NOT EXISTS {table}", f"CREATE TABLE {migrating}", 1))
+        current = table_definition(client, table)
+        if current is not None and current != table_definition(client, migrating):
+            to_migrate.append(table)
+        else:
+            client.command(f"DROP TABLE {migrating}")
+    return to_migrate
+
+
+def migrate_table(client, table, drop_backup=False):
+    migrating, backup = f"{table}{MIGRATING_SUFFIX}", f"{table}{BACKUP_SUFFIX}"
+    columns = client.query(
+        f"SELECT name FROM system.columns WHERE database = currentDatabase() AND table = '{migrating}' ORDER BY position"
+    ).result_columns[0]
+    column_list = ", ".join(columns)
+    started_at = time.perf_counter()
+    client.command(f"INSERT INTO {migrating} ({column_list}) SELECT {column_list} FROM {table}")
+    copied, expected = count_rows(client, migrating), count_rows(client, table)
+    if copied != expected:
+        raise RuntimeError(f"Copy of {table} has {copied} rows, expected {expected}; {table} was left unchanged.")
+    client.command(f"OPTIMIZE TABLE {migrating} FINAL") # one part per partition, as a long-lived table would have
+    client.command(f"EXCHANGE TABLES {table} AND {migrating}")
+    client.command(f"DROP TABLE IF EXISTS {backup}")
+    if drop_backup:
+        client.command(f"DROP TABLE {migrating}")
+    else:
+        client.command(f"RENAME TABLE {migrating} TO {backup}")
+    print(f"Migrated {table}: {copied} rows in {time.perf_counter() - started_at:.1f}s"
+          + ("" if drop_backup else f" (old layout kept as {backup})"))
+
+
+def recreate_rollup_views(client):
+    """Recreates the materialized views on the exchanged tables and rebuilds the rollups they feed."""
+    drop_rollup_views(client)
+    create_poc_tables(client, 'create_rollups_poc.sql')
+    refresh_rollups(client)
+
+
+def benchmark(client, runs):
+    """Median server time, rows and bytes read for each benchmark query, after one warm-up run."""
+    ids = client.query("SELECT user_id, order_id FROM orders_poc ORDER BY order_id LIMIT 1").result_rows
+    if not ids:
+        raise RuntimeError("orders_poc is empty; load data with generate_sample_data_poc.py first.")
+    user_id, order_id = ids[0]
+    results = {}
+    for name, sql in BENCHMARK_QUERIES.items():
+        sql = sql.format(user_id=user_id, order_id=order_id)
+        client.query(sql)
+        timings, read_rows, read_bytes = [], 0, 0
+        for _ in range(runs):
+            started_at = time.perf_counter()
+            summary = client.query(sql).summary or {}
+            wall_ms = (time.perf_counter() - started_at) * 1000
+            timings.append(int(summary["elapsed_ns"]) / 1e6 if summary.get("elapsed_ns") else wall_ms)
+            read_rows, read_bytes = int(summary.get("read_rows", 0)), int(summary.get("read_bytes", 0))
+        results[name] = {"median_ms": round(statistics.median(timings), 2), "read_rows": read_rows, "read_bytes": read_bytes}
+    return results
+
+
+def print_comparison(before, after):
+    header = f"{'query':<34}{'before ms':>11}{'after ms':>10}{'speedup':>9}{'rows before':>13}{'rows after':>12}"
+    print(header)
+    print("-" * len(header))
+    for name in BENCHMARK_QUERIES:
+        b, a = before[name], after[name]
+        speedup = b["median_ms"] / a["median_ms"] if a["median_ms"] else float("inf")
+        print(f"{name:<34}{b['median_ms']:>11.2f}{a['median_ms']:>10.2f}{speedup:>8.1f}x{b['read_rows']:>13}{a['read_rows']:>12}")
+
+
+def run(client, runs=5, dry_run=False, benchmark_only=False, drop_backup=False):
+    report = {"runs": runs}
+    if benchmark_only:
+        report["before"] = benchmark(client, runs)
+        print(json.dumps(report["before"], indent=2))
+        return report
+
+    statements = read_table_ddl()
+    missing = missing_tables(client, statements)
+    report["created_tables"] = missing
+    if dry_run:
+        to_migrate = plan_migration(client, statements)
+        report["migrated_tables"] = to_migrate
+        for table in to_migrate:
+            client.command(f"DROP TABLE IF EXISTS {table}{MIGRATING_SUFFIX}")
+        print(f"Tables that would be created: {', '.join(missing) or 'none'}")
+        print(f"Tables that would be migrated: {', '.join(to_migrate) or 'none'}")
+        return report
+    for table in missing:
+        client.command(statements[table])
+        print(f"Created missing table {table} in the new layout (empty).")
+
+    report["before"] = benchmark(client, runs)
+    to_migrate = plan_migration(client, statements)
+    report["migrated_tables"] = to_migrate
+    for table in to_migrate:
+        migrate_table(client, table, drop_backup)
+    if to_migrate or missing:
+        recreate_rollup_views(client)
+    if not to_migrate:
+        print(f"Nothing to migrate{'' if not missing else f'; created {len(missing)} missing table(s)'}.")
+
+    report["after"] = benchmark(client, runs)
+    print_comparison(report["before"], report["after"])
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate the PoC tables to the partitioned layout and benchmark it.")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per benchmark query (median is reported).")
+    parser.add_argument("--dry-run", action="store_true", help="Only report which tables would be migrated.")
+    parser.add_argument("--benchmark-only", action="store_true", help="Only run the benchmark queries.")
+    parser.add_argument("--drop-backup", action="store_true", help="Drop the old tables instead of keeping <table>__backup.")
+    parser.add_argument("--output", help="Write the before/after numbers as JSON to this file.")
+    args = parser.parse_args()
+
+    client = get_db_client()
+    try:
+        report = run(client, args.runs, args.dry_run, args.benchmark_only, args.drop_backup)
+    finally:
+        client.close()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Benchmark written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+from fastapi import APIRouter, HTTPException
+import asyncio
+
+from src.services.agent_service import agent_service # Singleton instance
+from src.schemas.chat_schemas import VerifiedExample
+
+router = APIRouter()
+
+@router.post("/admin/schema/refresh")
+async def refresh_schema_cache():
+    """
+    Forces the cached schema/table_info prompt block to be rebuilt from ClickHouse.
+    """
+    if not agent_service:
+        raise HTTPException(status_code=503, detail="Service Unavailable: AI Agent components are not initialized.")
+
+    try:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, agent_service.schema_cache.refresh)
+    except Exception as e:
+        print(f"Error refreshing schema cache: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to refresh schema cache: {str(e)}")
+    return {"status": "refreshed", "schema_cache": agent_service.schema_cache.status()}
+
+@router.post("/admin/cache/results/clear")
+async def clear_result_cache():
+    """
+    Drops every cached query result held by this worker.
+    """
+    if not agent_service:
+        raise HTTPException(status_code=503, detail="Service Unavailable: AI Agent components are not initialized.")
+    if not agent_service.result_cache:
+        return {"status": "disabled"}
+
+    agent_service.result_cache.clear()
+    return {"status": "cleared", "result_cache": agent_service.result_cache.status()}
+
+@router.get("/admin/clickhouse/status")
+async def clickhouse_status():
+    """
+    Reports the query worker pool size, running queries and queue depth for this worker.
+    """
+    if not agent_service:
+        raise HTTPException(status_code=503, detail="Service Unavailable: AI Agent components are not initialized.")
+    return agent_service.query_executor.status()
+
+@router.post("/admin/examples")
+async def add_verified_example(example: VerifiedExample):
+    """
+    Marks an answered question and its SQL as correct. The pair is used as a few-shot example
+    for similar questions and reused directly for the same question with different values.
+    """
+    if not agent_service:
+        raise HTTPException(status_code=503, detail="Service Unavailable: AI Agent components are not initialized.")
+    if not agent_service.example_store:
+        raise HTTPException(status_code=404, detail="The example store is disabled.")
+    if "SELECT" not in example.sql.upper():
+        raise HTTPException(status_code=422, detail="Only SELECT queries can be stored as examples.")
+
+    try:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, agent_service.example_store.add, example.question, example.sql)
+    except Exception as e:
+        print(f"Error storing verified example: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to store example: {str(e)}")
+    return {"status": "added", "example_store": agent_service.example_store.status()}
+
+@router.get("/admin/examples/status")
+async def example_store_status():
+    """
+    Reports how many verified examples this worker has indexed.
+    """
+    if not agent_service:
+        raise HTTPException(status_code=503, detail="Service Unavailable: AI Agent components are not initialized.")
+    if not agent_service.example_store:
+        return {"status": "disabled"}
+    return agent_service.example_store.status()
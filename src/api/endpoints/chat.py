@@ -1,13 +1,42 @@
-from fastapi import APIRouter, HTTPException, Body, Depends
-from typing import Annotated
+from fastapi import APIRouter, HTTPException, Body, Depends, Request, BackgroundTasks
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from typing import Annotated, Awaitable, TypeVar
+import asyncio
+import json
 
-from src.schemas.chat_schemas import ChatRequest, ChatResponse, SQLDebugInfo, ChartData
+from src.schemas.chat_schemas import ChatRequest, ChatResponse, SQLDebugInfo, ChartData, BatchChatRequest, BatchChatResponse
+from src.core.llm_dispatcher import llm_dispatcher, LLMOverloaded
 from src.services.agent_service import agent_service # Singleton instance
 
 router = APIRouter()
 
+T = TypeVar("T")
+DISCONNECT_POLL_SECONDS = 0.5
+
+async def run_until_disconnect(request: Request, awaitable: Awaitable[T]) -> T:
+    """
+    Awaits `awaitable`, cancelling it if the client disconnects first so that in-flight
+    ClickHouse queries are killed instead of running to completion for nobody.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise HTTPException(status_code=499, detail="Client closed request.")
+    finally:
+        if not task.done():
+            task.cancel()
+
 @router.post("/ask", response_model=ChatResponse)
 async def ask_question(
+    request: Request,
+    background_tasks: BackgroundTasks,
     request_body: Annotated[ChatRequest, Body(
         examples=[
             {
@@ -26,10 +55,11 @@ async def ask_question(
         raise HTTPException(status_code=503, detail="Service Unavailable: AI Agent components are not initialized.")
 
     try:
-        answer, chart_data, sql_debug, error = await agent_service.process_question(
+        answer, chart_data, sql_debug, error = await run_until_disconnect(request, agent_service.process_question(
             question=request_body.question,
             session_id=request_body.session_id
-        )
+        ))
+        background_tasks.add_task(agent_service.compact_session_memory, request_body.session_id)
 
         if error:
             return ChatResponse(
@@ -48,6 +78,10 @@ async def ask_question(
             debug_info=sql_debug
         )
 
+    except HTTPException:
+        raise
+    except LLMOverloaded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except RuntimeError as e: # catch specific configuration errors from AgentService
         raise HTTPException(status_code=503, detail=f"Service Unavailable: {str(e)}")
     except Exception as e:
@@ -55,3 +89,96 @@ async def ask_question(
         import traceback
         print(f"Unhandled error in /ask endpoint: {e}\n{traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"An internal server error occurred: {str(e)}")
+
+
+@router.post("/ask/stream")
+async def ask_question_stream(
+    request_body: Annotated[ChatRequest, Body(
+        examples=[
+            {
+                "question": "Show me the number of users for each registration channel.",
+                "session_id": "user123_session_abc"
+            }
+        ],
+    )]
+):
+    """
+    Same as /ask, but streams Server-Sent Events as each stage finishes:
+    `sql`, `data` (result preview), `answer_token` (one per streamed chunk), `chart`, then `done`.
+    An `error` event replaces the remaining events if processing fails.
+    """
+
+    if not agent_service: # safety check
+        raise HTTPException(status_code=503, detail="Service Unavailable: AI Agent components are not initialized.")
+    if llm_dispatcher and llm_dispatcher.overloaded(): # shed before the 200 and the stream have started
+        raise HTTPException(status_code=429, detail="The AI service is busy. Please retry shortly.", headers={"Retry-After": "1"})
+
+    async def event_stream():
+        async for event, payload in agent_service.stream_question(
+            question=request_body.question,
+            session_id=request_body.session_id
+        ):
+            yield f"event: {event}\ndata: {json.dumps(jsonable_encoder(payload))}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}, # keep proxies from buffering the stream
+        background=BackgroundTask(agent_service.compact_session_memory, request_body.session_id)
+    )
+
+
+@router.post("/ask/batch", response_model=BatchChatResponse)
+async def ask_questions_batch(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    request_body: Annotated[BatchChatRequest, Body(
+        examples=[
+            {
+                "requests": [
+                    {"question": "How many orders were placed in May 2024?", "session_id": "daily_report"},
+                    {"question": "Show me the number of users for each registration channel.", "session_id": "daily_report"}
+                ]
+            }
+        ],
+    )]
+):
+    """
+    Answers many questions concurrently. SQL generation and synthesis share an LLM concurrency
+    limit and identical generated SQL is executed once, so the batch takes about as long as its
+    slowest question.
+    """
+
+    if not agent_service: # safety check
+        raise HTTPException(status_code=503, detail="Service Unavailable: AI Agent components are not initialized.")
+    if llm_dispatcher and llm_dispatcher.overloaded(): # a batch would only add to the queue
+        raise HTTPException(status_code=429, detail="The AI service is busy. Please retry shortly.", headers={"Retry-After": "1"})
+
+    try:
+        results = await run_until_disconnect(request, agent_service.process_batch(
+            [(item.question, item.session_id) for item in request_body.requests]
+        ))
+        for session_id in dict.fromkeys(item.session_id for item in request_body.requests):
+            background_tasks.add_task(agent_service.compact_session_memory, session_id)
+        return BatchChatResponse(responses=[
+            ChatResponse(
+                session_id=item.session_id,
+                question=item.question,
+                answer=answer,
+                chart_data=chart_data,
+                debug_info=sql_debug,
+                error=error
+            )
+            for item, (answer, chart_data, sql_debug, error) in zip(request_body.requests, results)
+        ])
+
+    except HTTPException:
+        raise
+    except LLMOverloaded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except RuntimeError as e: # catch specific configuration errors from AgentService
+        raise HTTPException(status_code=503, detail=f"Service Unavailable: {str(e)}")
+    except Exception as e:
+        import traceback
+        print(f"Unhandled error in /ask/batch endpoint: {e}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"An internal server error occurred: {str(e)}")
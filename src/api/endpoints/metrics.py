@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from src.services.metrics import metrics
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """
+    Exposes stage latencies, LLM token usage and ClickHouse read volume for Prometheus to scrape.
+    """
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
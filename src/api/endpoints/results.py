@@ -0,0 +1,27 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Annotated
+
+from src.core.config import settings
+from src.schemas.chat_schemas import ResultPage
+from src.services.result_store import result_store
+
+router = APIRouter()
+
+@router.get("/results/{result_id}", response_model=ResultPage)
+async def get_result_page(
+    result_id: str,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(ge=1, le=settings.RESULT_PAGE_MAX_LIMIT)] = 100
+):
+    """
+    Returns one page of a large query result parked by /ask (see `debug_info.result_id`).
+    """
+    try:
+        page = await result_store.get_page(result_id, offset, limit)
+    except Exception as e:
+        print(f"Error reading result page for {result_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"An internal server error occurred: {str(e)}")
+
+    if page is None:
+        raise HTTPException(status_code=404, detail="Result not found or expired.")
+    return ResultPage(**page)
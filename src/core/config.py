@@ -11,6 +11,22 @@ class Settings(BaseSettings):
 
     # LLM Model
     LLM_MODEL_NAME: str = "models/gemini-2.5-flash-preview-04-17" 
+    # Per-chain models, e.g. a stronger model for SQL and a faster one for answers and charts; unset uses LLM_MODEL_NAME
+    SQL_GENERATION_MODEL: str | None = None
+    ANSWER_SYNTHESIS_MODEL: str | None = None
+    CHART_SUGGESTION_MODEL: str | None = None
+    HISTORY_SUMMARY_MODEL: str | None = None
+
+    # LLM Dispatcher Settings (limits are per model and per worker process)
+    LLM_DISPATCHER_ENABLED: bool = True
+    LLM_MAX_CONCURRENCY_PER_MODEL: int = 8  # calls in flight
+    LLM_REQUESTS_PER_MINUTE: float = 300  # token bucket refill rate; 0 disables rate limiting
+    LLM_BURST: int = 10  # calls allowed at once after an idle period
+    LLM_MAX_QUEUE: int = 32  # calls waiting for a slot beyond this are shed and the request gets a 429
+    LLM_QUEUE_TIMEOUT_SECONDS: float = 20.0  # calls that would wait longer are shed as well
+    LLM_MAX_RETRIES: int = 2  # retries of rate limit, overload and timeout errors, with jittered backoff
+    LLM_RETRY_BASE_SECONDS: float = 0.5
+    LLM_RETRY_MAX_SECONDS: float = 8.0
 
     # ClickHouse Settings
     CLICKHOUSE_HOST: str = "localhost"
@@ -18,12 +34,103 @@ class Settings(BaseSettings):
     CLICKHOUSE_USERNAME: str = "default"
     CLICKHOUSE_PASSWORD: str = "sample"
     CLICKHOUSE_DATABASE: str = "chipchip_db"
+    CLICKHOUSE_MAX_CONCURRENT_QUERIES: int = 8  # size of the query worker pool per app worker
+    CLICKHOUSE_MAX_EXECUTION_TIME: int = 30  # seconds, enforced by the server
+    CLICKHOUSE_MAX_RESULT_ROWS: int = 100_000
+    CLICKHOUSE_MAX_MEMORY_USAGE: int = 2 * 1024 * 1024 * 1024  # bytes per query
 
     # Redis Settings
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_PASSWORD: str | None = None
     REDIS_DB: int = 0
+    REDIS_MAX_CONNECTIONS: int = 50  # size of the shared redis.asyncio pool per worker
+    SESSION_TTL_SECONDS: int = 1800
+
+    # Conversation Memory Settings
+    MEMORY_RECENT_TURNS: int = 3  # turns replayed verbatim into the SQL prompt
+    MEMORY_SUMMARIZE_AFTER_TURNS: int = 6  # older turns are folded into the summary once a session has more than this
+    MEMORY_TOKEN_BUDGET: int = 1200  # hard cap on the (estimated) size of the history block
+    MEMORY_SUMMARY_MAX_WORDS: int = 120
+
+    # Result Size Settings
+    RESULT_PREVIEW_ROWS: int = 20  # rows echoed back in debug info and streamed previews
+    RESULT_MAX_ROWS: int = 50_000  # generated SQL is wrapped with a LIMIT so results never exceed this
+    RESULT_INLINE_ROWS: int = 500  # larger results are parked in the result store and paged via /results/{id}
+    RESULT_STORE_TTL_SECONDS: int = 3600
+    RESULT_PAGE_MAX_LIMIT: int = 1000
+    RESULT_SUMMARY_TOKEN_BUDGET: int = 1500  # size of the result description in the answer and chart prompts
+    RESULT_SUMMARY_SAMPLE_ROWS: int = 10  # results up to this size are sent whole; larger ones as statistics plus this many rows
+    RESULT_SUMMARY_TOP_K: int = 5  # most frequent values listed per text column
+
+    # Chart Payload Settings
+    CHART_MAX_POINTS: int = 1000  # line charts above this are downsampled
+    CHART_DOWNSAMPLING_METHOD: str = "lttb"  # 'lttb' or 'min_max'
+    CHART_MAX_BAR_CATEGORIES: int = 25  # the smallest categories beyond this are folded into 'Other'
+    CHART_MAX_PIE_SLICES: int = 8
+
+    # Answer Template Settings
+    ANSWER_TEMPLATES_ENABLED: bool = True  # empty, single-value and single-row results are answered without the LLM
+
+    # Batch Settings
+    BATCH_MAX_QUESTIONS: int = 50
+    BATCH_LLM_CONCURRENCY: int = 8  # LLM calls in flight per batch request
+
+    # Schema Cache Settings
+    SCHEMA_CACHE_TTL_SECONDS: int = 3600  # hard refresh of the rendered table_info
+    SCHEMA_CHANGE_CHECK_INTERVAL_SECONDS: int = 30  # how often system.tables is polled for DDL changes
+
+    # Observability Settings
+    METRICS_ENABLED: bool = True  # expose Prometheus metrics on /metrics
+    TRACING_ENABLED: bool = False  # emit OpenTelemetry spans per stage (needs opentelemetry-api)
+    TRACING_OTLP_ENDPOINT: str | None = None  # e.g. http://otel-collector:4318/v1/traces (needs opentelemetry-sdk and the OTLP exporter)
+
+    # Schema Pruning Settings
+    SCHEMA_PRUNING_ENABLED: bool = True  # only send the tables relevant to the question to the SQL prompt
+    SCHEMA_PRUNING_MAX_TABLES: int = 4  # best-matching tables kept before join paths are added
+    SCHEMA_PRUNING_MIN_SCORE_RATIO: float = 0.3  # tables scoring below this fraction of the best match are dropped
+
+    # Few-Shot Example Settings
+    FEW_SHOT_ENABLED: bool = True
+    FEW_SHOT_EXAMPLES_PATH: str = "data/sql_examples.jsonl"  # append-only file of admin-verified question/SQL pairs
+    FEW_SHOT_TOP_K: int = 3  # most similar verified examples added to the SQL prompt
+    FEW_SHOT_MIN_SIMILARITY: float = 0.2  # cosine similarity below which examples are not shown
+    FEW_SHOT_REUSE_ENABLED: bool = True  # exact or parameter-only matches reuse the verified SQL without the LLM
+
+    # Single-Flight Settings
+    SINGLE_FLIGHT_ENABLED: bool = True  # concurrent identical questions (same normalized text and chat history) share one pipeline run
+    SINGLE_FLIGHT_CROSS_WORKER: bool = True  # also coalesce across workers through a Redis lock
+    SINGLE_FLIGHT_LOCK_TTL_SECONDS: int = 120  # should exceed the slowest answer; a crashed leader's lock expires after this
+    SINGLE_FLIGHT_WAIT_SECONDS: float = 120.0  # how long a worker waits on another worker before answering itself
+    SINGLE_FLIGHT_POLL_SECONDS: float = 0.1  # how often waiting workers check for the shared result
+    SINGLE_FLIGHT_RESULT_TTL_SECONDS: int = 10  # the shared result only has to outlive the waiters' next poll
+
+    # Rollup Settings
+    ROLLUPS_ENABLED: bool = True  # offer the pre-aggregated rollups (data/create_rollups_poc.sql) to the SQL generator
+    ROLLUP_MAX_HINTS: int = 2  # rollups described in one SQL prompt
+    ROLLUP_TABLE_NAMES: list[str] = [
+        "sales_by_category_month_rollup", "orders_by_channel_day_rollup",
+        "group_deal_conversion_rollup", "user_retention_rollup"
+    ]
+
+    # Query Guard Settings
+    QUERY_GUARD_ENABLED: bool = True  # estimate generated SQL with EXPLAIN ESTIMATE/PLAN before running it
+    QUERY_GUARD_MAX_ROWS: int = 200_000_000  # rows selected after partition/primary key/skip index pruning
+    QUERY_GUARD_MAX_MARKS: int = 25_000  # granules (8192 rows each by default)
+    QUERY_GUARD_MAX_BYTES: int = 20 * 1024 * 1024 * 1024  # uncompressed bytes of the columns read
+    QUERY_GUARD_MAX_CROSS_JOIN_ROWS: int = 10_000_000  # rows a CROSS JOIN may produce
+    QUERY_GUARD_REWRITE_ATTEMPTS: int = 1  # times the LLM is asked for a cheaper query before it is rejected
+    QUERY_GUARD_STATS_REFRESH_SECONDS: int = 300  # how often per-column sizes are re-read from system.columns
+
+    # Question -> SQL Cache Settings
+    SQL_CACHE_ENABLED: bool = True
+    SQL_CACHE_TTL_SECONDS: int = 86400
+    SQL_CACHE_MAX_ENTRIES: int = 5000  # least recently used entries are evicted past this size
+
+    # Query Result Cache Settings
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # memory bound for cached result frames per worker
+    RESULT_CACHE_FRESHNESS_CHECK_SECONDS: float = 5.0  # how long a system.parts version check is trusted
 
     # PoC Table Names (as a list of strings)
     POC_TABLE_NAMES: list[str] = [
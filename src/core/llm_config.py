@@ -4,20 +4,30 @@ from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import Runnable
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import threading
+import time
 
 from src.core.config import settings
+from src.core.llm_dispatcher import llm_dispatcher, DispatchedModel
 
 # --- LLM and DB Initialization ---
 llm: Optional[Runnable] = None
 db: Optional[SQLDatabase] = None
 
-try:
-    llm = ChatGoogleGenerativeAI(
-        model=settings.LLM_MODEL_NAME,
+
+def _chat_model(model_name: str) -> ChatGoogleGenerativeAI:
+    return ChatGoogleGenerativeAI(
+        model=model_name,
         google_api_key=settings.GOOGLE_API_KEY,
-        temperature=0.0
+        temperature=0.0,
+        max_retries=1 if llm_dispatcher else 6 # a single attempt: the dispatcher retries without blocking the event loop
     )
+
+
+try:
+    llm = _chat_model(settings.LLM_MODEL_NAME)
     db_uri = (
         f"clickhouse://{settings.CLICKHOUSE_USERNAME}:{settings.CLICKHOUSE_PASSWORD}"
         f"@{settings.CLICKHOUSE_HOST}:{settings.CLICKHOUSE_PORT}/{settings.CLICKHOUSE_DATABASE}"
@@ -32,6 +42,134 @@ except Exception as e:
     print(f"CRITICAL ERROR initializing LLM or DB connection: {e}")
 
 
+_chat_models: Dict[str, Runnable] = {}
+
+
+def chain_llm(chain: str) -> Runnable:
+    """The model for `chain` (its <CHAIN>_MODEL setting, else `llm`), routed through the LLM dispatcher when enabled."""
+    model_name = getattr(settings, f"{chain.upper()}_MODEL") or settings.LLM_MODEL_NAME
+    if model_name not in _chat_models:
+        _chat_models[model_name] = llm if model_name == settings.LLM_MODEL_NAME else _chat_model(model_name)
+    model = _chat_models[model_name]
+    return DispatchedModel(model, model_name, llm_dispatcher) if llm_dispatcher else model
+
+
+# --- Schema Cache ---
+class SchemaCache:
+    """
+    Caches the rendered `table_info` and `dialect` used by the SQL generation prompt, as one
+    precomputed snippet per table plus the column names/comments used for table selection.
+    Everything is rebuilt when the TTL expires or when `system.tables` reports a newer
+    metadata_modification_time for one of the PoC tables.
+    """
+
+    FINGERPRINT_QUERY = (
+        "SELECT name, toString(metadata_modification_time) FROM system.tables "
+        "WHERE database = currentDatabase() AND name IN ({table_names}) ORDER BY name"
+    )
+    COLUMNS_QUERY = (
+        "SELECT table, name, comment FROM system.columns "
+        "WHERE database = currentDatabase() AND table IN ({table_names}) ORDER BY table, position"
+    )
+
+    def __init__(self, database: SQLDatabase, ttl_seconds: int, check_interval_seconds: int):
+        self._db = database
+        self._ttl_seconds = ttl_seconds
+        self._check_interval_seconds = check_interval_seconds
+        self._lock = threading.Lock()
+        self._table_info: Optional[str] = None
+        self._table_snippets: Dict[str, str] = {}
+        self._table_columns: Dict[str, List[Tuple[str, str]]] = {}
+        self._dialect: Optional[str] = None
+        self._schema_hash = ""
+        self._fingerprint: Optional[tuple] = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+
+    @staticmethod
+    def _table_name_list() -> str:
+        return ", ".join(f"'{name}'" for name in settings.POC_TABLE_NAMES)
+
+    def _fetch_fingerprint(self) -> Optional[tuple]:
+        try:
+            result = self._db.run(self.FINGERPRINT_QUERY.format(table_names=self._table_name_list()), fetch="cursor")
+            return tuple(tuple(row) for row in result.fetchall())
+        except Exception as e:
+            print(f"Warning: Could not read schema fingerprint from system.tables: {e}")
+            return None
+
+    def _fetch_columns(self) -> Dict[str, List[Tuple[str, str]]]:
+        columns: Dict[str, List[Tuple[str, str]]] = {}
+        try:
+            result = self._db.run(self.COLUMNS_QUERY.format(table_names=self._table_name_list()), fetch="cursor")
+            for table, name, comment in result.fetchall():
+                columns.setdefault(table, []).append((name, comment or ""))
+        except Exception as e:
+            print(f"Warning: Could not read column metadata from system.columns: {e}")
+        return columns
+
+    def _load(self) -> None:
+        fingerprint = self._fetch_fingerprint()
+        self._table_snippets = {name: self._db.get_table_info([name]) for name in sorted(self._db.get_usable_table_names())}
+        self._table_info = "\n\n".join(self._table_snippets.values())
+        self._table_columns = self._fetch_columns()
+        self._dialect = self._db.dialect
+        self._schema_hash = hashlib.sha256(self._table_info.encode("utf-8")).hexdigest()[:16]
+        self._fingerprint = fingerprint
+        self._loaded_at = self._checked_at = time.monotonic()
+        print("Schema cache refreshed.")
+
+    def refresh(self) -> None:
+        """Forces a rebuild of the cached schema block."""
+        with self._lock:
+            self._load()
+
+    def get(self, table_names: Optional[List[str]] = None) -> Tuple[str, str]:
+        """
+        Returns (table_info, dialect), refreshing them first if they are stale. Blocking.
+        With `table_names`, table_info only contains the snippets for those tables.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._table_info is None or now - self._loaded_at >= self._ttl_seconds:
+                self._load()
+            elif now - self._checked_at >= self._check_interval_seconds:
+                self._checked_at = now
+                fingerprint = self._fetch_fingerprint()
+                if fingerprint is not None and fingerprint != self._fingerprint:
+                    self._load()
+            if table_names is None:
+                return self._table_info, self._dialect
+            return "\n\n".join(self._table_snippets[t] for t in table_names if t in self._table_snippets), self._dialect
+
+    @property
+    def table_columns(self) -> Dict[str, List[Tuple[str, str]]]:
+        """(column, comment) pairs per table, as of the last refresh. Tables missing here have no metadata."""
+        return {table: self._table_columns.get(table, []) for table in self._table_snippets}
+
+    @property
+    def schema_hash(self) -> str:
+        """Short hash of the rendered schema block; changes whenever the prompt schema changes."""
+        return self._schema_hash
+
+    def status(self) -> dict:
+        return {
+            "loaded": self._table_info is not None,
+            "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._table_info is not None else None,
+            "schema_hash": self._schema_hash,
+            "tables": [row[0] for row in self._fingerprint] if self._fingerprint else [],
+        }
+
+
+schema_cache: Optional[SchemaCache] = None
+if db:
+    schema_cache = SchemaCache(
+        db,
+        ttl_seconds=settings.SCHEMA_CACHE_TTL_SECONDS,
+        check_interval_seconds=settings.SCHEMA_CHANGE_CHECK_INTERVAL_SECONDS
+    )
+
+
 # --- 1. Prompt & Chain for SQL Generation ---
 SQL_GENERATION_TEMPLATE = """Given an input question (which may include chat history) and a database schema, your task is to generate a syntactically correct {dialect} query to answer the user's 'Current Question'.
 
@@ -41,7 +179,7 @@ Instructions:
 - **IMPORTANT**: The SQL query you generate MUST be plain text without any markdown fences.
 - Use the `Current Date` for relative date expressions like "last weekend".
 
-Current Date for reference: {current_date}
+{rollups}{examples}Current Date for reference: {current_date}
 
 Input for LLM:
 {input}
@@ -53,10 +191,10 @@ sql_generation_chain: Optional[Runnable] = None
 if db and llm:
     sql_generation_prompt = PromptTemplate(
         template=SQL_GENERATION_TEMPLATE,
-        input_variables=["input", "table_info", "dialect"],
+        input_variables=["input", "table_info", "dialect", "rollups", "examples"],
         partial_variables={"current_date": datetime.now().strftime('%Y-%m-%d')}
     )
-    sql_generation_chain = sql_generation_prompt | llm | StrOutputParser()
+    sql_generation_chain = sql_generation_prompt | chain_llm("sql_generation") | StrOutputParser()
 
 
 # --- 2. Prompt & Chain for Final Answer Synthesis ---
@@ -68,6 +206,7 @@ Data Returned by SQL Query: {sql_result_data}
 
 Instructions:
 - If the "Data Returned" is empty or says 'no data', clearly state that no matching information was found.
+- Large results are described by per-column statistics over all rows plus a sample of rows. Take totals, ranges and most frequent values from the statistics; do not add up the sample.
 - Do not repeat the SQL query or raw data.
 - Answer the "Original User Question" directly and naturally based on the data. For lists of names, you can say: "The following X were found: Name A, Name B, and Name C."
 
@@ -76,7 +215,7 @@ Natural Language Answer:"""
 answer_synthesis_chain: Optional[Runnable] = None
 if llm:
     answer_synthesis_prompt = PromptTemplate.from_template(ANSWER_SYNTHESIS_TEMPLATE)
-    answer_synthesis_chain = answer_synthesis_prompt | llm | StrOutputParser()
+    answer_synthesis_chain = answer_synthesis_prompt | chain_llm("answer_synthesis") | StrOutputParser()
 
 
 # --- 3. Prompt & Chain for Chart Suggestion ---
@@ -86,6 +225,7 @@ Original User Question: {question}
 Data Returned by Query: {sql_result_data}
 
 Instructions:
+- Large results are described by per-column statistics plus a sample of rows; use the column names and kinds (number, time, text) to pick the axes.
 - The `chart_type` must be one of: 'bar', 'line', 'pie', 'table', or 'none'.
 - **Respond ONLY with a single JSON object.** Do not add any text or markdown fences.
 
@@ -97,4 +237,24 @@ Your Turn:"""
 chart_suggestion_chain: Optional[Runnable] = None
 if llm:
     chart_suggestion_prompt = PromptTemplate.from_template(CHART_SUGGESTION_TEMPLATE)
-    chart_suggestion_chain = chart_suggestion_prompt | llm | StrOutputParser()
\ No newline at end of file
+    chart_suggestion_chain = chart_suggestion_prompt | chain_llm("chart_suggestion") | StrOutputParser()
+
+# --- 4. Prompt & Chain for Conversation Summarization ---
+HISTORY_SUMMARY_TEMPLATE = """You maintain a running summary of a conversation between a marketing user and a data assistant. Fold the new turns into the existing summary.
+
+Existing Summary: {summary}
+
+New Turns:
+{new_turns}
+
+Instructions:
+- Keep the entities, metrics, filters, time ranges and groupings the user asked about, and the key figures in the answers.
+- Drop greetings, repetition and wording details.
+- Respond with the updated summary only, in at most {max_words} words.
+
+Updated Summary:"""
+
+history_summary_chain: Optional[Runnable] = None
+if llm:
+    history_summary_prompt = PromptTemplate.from_template(HISTORY_SUMMARY_TEMPLATE)
+    history_summary_chain = history_summary_prompt | chain_llm("history_summary") | StrOutputParser()
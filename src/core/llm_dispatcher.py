@@ -0,0 +1,212 @@
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple, Type
+import asyncio
+import math
+import random
+import time
+
+from google.api_core.exceptions import DeadlineExceeded, GatewayTimeout, InternalServerError, ResourceExhausted, ServiceUnavailable, TooManyRequests
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from src.core.config import settings
+from src.services.metrics import LLM_QUEUE_SECONDS, LLM_RETRIES, LLM_SHED
+
+# Rate limits, overload and timeouts; anything else (bad request, safety block) fails the same way on every attempt
+RETRYABLE_ERRORS: Tuple[Type[BaseException], ...] = (
+    ResourceExhausted, TooManyRequests, ServiceUnavailable, InternalServerError, DeadlineExceeded, GatewayTimeout,
+    ConnectionError, asyncio.TimeoutError
+)
+
+
+class LLMOverloaded(Exception):
+    """Raised instead of queueing an LLM call when its model's wait queue is full; the API answers 429."""
+
+    def __init__(self, model: str, retry_after: int):
+        super().__init__(f"The AI service is busy ({model}). Please retry in {retry_after} seconds.")
+        self.model = model
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Requests per second with bursts of up to `burst`. A zero rate means unlimited."""
+
+    def __init__(self, rate_per_second: float, burst: int):
+        self.rate = rate_per_second
+        self.capacity = max(burst, 1)
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+
+    def reserve(self) -> float:
+        """Takes a token and returns the seconds to wait before using it. The balance may go negative, so waiters keep their order."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def refund(self) -> None:
+        self._tokens = min(self.capacity, self._tokens + 1)
+
+
+class _ModelPool:
+    def __init__(self, max_concurrency: int, bucket: TokenBucket):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.bucket = bucket
+        self.waiting = 0
+
+
+class LLMDispatcher:
+    """
+    Gate for every LLM call of this worker, per model: at most `max_concurrency` calls in flight, a
+    token bucket of `requests_per_minute`, and at most `max_queue` calls waiting for either. Calls
+    beyond the queue, or that would wait longer than `queue_timeout_seconds`, are shed with
+    LLMOverloaded. Retryable provider errors are retried with full-jitter exponential backoff,
+    releasing the slot while backing off.
+    """
+
+    def __init__(self, max_concurrency: int, requests_per_minute: float, burst: int, max_queue: int,
+                 queue_timeout_seconds: float, max_retries: int, retry_base_seconds: float, retry_max_seconds: float,
+                 retryable_errors: Tuple[Type[BaseException], ...] = RETRYABLE_ERRORS):
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.burst = burst
+        self.max_queue = max_queue
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.retryable_errors = retryable_errors
+        self._pools: Dict[str, _ModelPool] = {}
+
+    def _pool(self, model: str) -> _ModelPool:
+        if model not in self._pools:
+            self._pools[model] = _ModelPool(self.max_concurrency, TokenBucket(self.requests_per_minute / 60, self.burst))
+        return self._pools[model]
+
+    def _retry_after(self, pool: _ModelPool) -> int:
+        """Rough seconds until the queue ahead has drained at the configured rate."""
+        rate = pool.bucket.rate or self.max_concurrency / max(self.queue_timeout_seconds, 1)
+        return max(1, math.ceil(pool.waiting / rate))
+
+    def overloaded(self) -> bool:
+        """Whether any model's wait queue is full, so a new request would be shed."""
+        return any(pool.waiting >= self.max_queue for pool in self._pools.values())
+
+    def _shed(self, model: str, pool: _ModelPool, reason: str) -> LLMOverloaded:
+        LLM_SHED.inc(model=model, reason=reason)
+        return LLMOverloaded(model, self._retry_after(pool))
+
+    @asynccontextmanager
+    async def _slot(self, model: str) -> AsyncIterator[None]:
+        pool = self._pool(model)
+        if pool.semaphore.locked() and pool.waiting >= self.max_queue:
+            raise self._shed(model, pool, "queue_full")
+        pool.waiting += 1
+        waited_from = time.perf_counter()
+        acquired = False
+        try:
+            try:
+                if pool.semaphore.locked():
+                    await asyncio.wait_for(pool.semaphore.acquire(), self.queue_timeout_seconds)
+                else:
+                    await pool.semaphore.acquire() # a free slot is taken without yielding
+            except asyncio.TimeoutError:
+                raise self._shed(model, pool, "queue_timeout") from None
+            acquired = True
+            delay = pool.bucket.reserve()
+            if delay > self.queue_timeout_seconds - (time.perf_counter() - waited_from):
+                pool.bucket.refund()
+                raise self._shed(model, pool, "rate_limited")
+            if delay:
+                await asyncio.sleep(delay)
+        except BaseException: # shed or cancelled while waiting
+            if acquired:
+                pool.semaphore.release()
+            raise
+        finally:
+            pool.waiting -= 1
+        LLM_QUEUE_SECONDS.observe(time.perf_counter() - waited_from, model=model)
+        try:
+            yield
+        finally:
+            pool.semaphore.release()
+
+    def _backoff_seconds(self, attempt: int, error: BaseException) -> float:
+        suggested = getattr(error, "retry_after", None) # quota errors may say when to come back
+        if isinstance(suggested, (int, float)) and 0 < suggested <= self.retry_max_seconds:
+            return suggested + random.uniform(0, self.retry_base_seconds)
+        return random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * 2 ** attempt))
+
+    async def call(self, model: str, make_call: Callable[[], Awaitable[Any]]) -> Any:
+        """Runs `make_call()` under `model`'s limits, retrying retryable errors."""
+        attempt = 0
+        while True:
+            async with self._slot(model):
+                try:
+                    return await make_call()
+                except self.retryable_errors as e:
+                    if attempt >= self.max_retries:
+                        raise
+                    error = e
+            LLM_RETRIES.inc(model=model)
+            await asyncio.sleep(self._backoff_seconds(attempt, error))
+            attempt += 1
+
+    async def stream(self, model: str, make_stream: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """Yields from `make_stream()` under `model`'s limits. Only retried while nothing has been yielded yet."""
+        attempt = 0
+        while True:
+            started = False
+            try:
+                async with self._slot(model):
+                    async for chunk in make_stream():
+                        started = True
+                        yield chunk
+                return
+            except self.retryable_errors as e:
+                if started or attempt >= self.max_retries:
+                    raise
+                error = e
+            LLM_RETRIES.inc(model=model)
+            await asyncio.sleep(self._backoff_seconds(attempt, error))
+            attempt += 1
+
+
+class DispatchedModel(Runnable):
+    """A chat model whose async calls go through an LLMDispatcher; used as the middle step of `prompt | model | parser` chains."""
+
+    def __init__(self, model: Runnable, model_name: str, dispatcher: LLMDispatcher):
+        self.model = model
+        self.model_name = model_name
+        self.dispatcher = dispatcher
+
+    def with_model(self, model: Runnable) -> "DispatchedModel":
+        """The same routing around another model, e.g. a fake one for benchmarks."""
+        return DispatchedModel(model, self.model_name, self.dispatcher)
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return self.model.invoke(input, config, **kwargs) # the app only makes async calls; sync ones are not limited
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return await self.dispatcher.call(self.model_name, lambda: self.model.ainvoke(input, config, **kwargs))
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        async for chunk in self.dispatcher.stream(self.model_name, lambda: self.model.astream(input, config, **kwargs)):
+            yield chunk
+
+
+# Singleton instance
+llm_dispatcher: Optional[LLMDispatcher] = None
+if settings.LLM_DISPATCHER_ENABLED:
+    llm_dispatcher = LLMDispatcher(
+        max_concurrency=settings.LLM_MAX_CONCURRENCY_PER_MODEL,
+        requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+        burst=settings.LLM_BURST,
+        max_queue=settings.LLM_MAX_QUEUE,
+        queue_timeout_seconds=settings.LLM_QUEUE_TIMEOUT_SECONDS,
+        max_retries=settings.LLM_MAX_RETRIES,
+        retry_base_seconds=settings.LLM_RETRY_BASE_SECONDS,
+        retry_max_seconds=settings.LLM_RETRY_MAX_SECONDS
+    )
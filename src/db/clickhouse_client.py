@@ -0,0 +1,144 @@
+import clickhouse_connect
+from clickhouse_connect.driver import httputil
+from clickhouse_connect.driver.client import Client
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+import pandas as pd
+import asyncio
+import threading
+import time
+import uuid
+
+from src.core.config import settings
+
+
+@dataclass
+class QueryStats:
+    query_id: str
+    queue_wait_ms: float = 0.0
+    execution_ms: float = 0.0
+    read_rows: int = 0
+    read_bytes: int = 0
+
+
+class ClickHouseExecutor:
+    """
+    Executes generated SQL through clickhouse_connect and returns typed, named columns
+    as a DataFrame, instead of the repr string produced by `SQLDatabase.run`.
+
+    Queries run on a dedicated, explicitly sized thread pool (matched by the HTTP connection
+    pool), carry server-side execution limits, and are killed on the server when the awaiting
+    request is cancelled.
+    """
+
+    def __init__(self, client: Client, max_workers: int, query_settings: Dict[str, object]):
+        self._client = client
+        self._max_workers = max_workers
+        self._query_settings = query_settings
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="clickhouse-query")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+
+    def query_df(self, sql: str, query_id: Optional[str] = None, stats: Optional[QueryStats] = None) -> pd.DataFrame:
+        """
+        Runs `sql` with the configured limits and returns the result as a DataFrame. Blocking.
+        When `stats` is given, the rows and bytes read are copied from the query summary.
+        """
+        query_settings = dict(self._query_settings)
+        if query_id:
+            query_settings["query_id"] = query_id
+        result = self._client.query(sql, settings=query_settings, use_numpy=True) # `query_df` drops the X-ClickHouse-Summary
+        if stats is not None:
+            stats.read_rows = int(result.summary.get("read_rows", 0))
+            stats.read_bytes = int(result.summary.get("read_bytes", 0))
+        df = pd.DataFrame(dict(enumerate(result.result_columns))) # positional keys keep duplicate column names apart
+        df.columns = list(result.column_names)
+        return df
+
+    def _run_pooled(self, sql: str, stats: QueryStats, submitted_at: float) -> pd.DataFrame:
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        started_at = time.perf_counter()
+        stats.queue_wait_ms = round((started_at - submitted_at) * 1000, 1)
+        try:
+            return self.query_df(sql, query_id=stats.query_id, stats=stats)
+        finally:
+            stats.execution_ms = round((time.perf_counter() - started_at) * 1000, 1)
+            with self._lock:
+                self._running -= 1
+
+    async def execute(self, sql: str) -> Tuple[pd.DataFrame, QueryStats]:
+        """Runs `sql` on the bounded query pool. Cancelling the awaiting task kills the server-side query."""
+        stats = QueryStats(query_id=str(uuid.uuid4()))
+        with self._lock:
+            self._queued += 1
+        future = self._pool.submit(self._run_pooled, sql, stats, time.perf_counter())
+        try:
+            return await asyncio.wrap_future(future), stats
+        except asyncio.CancelledError:
+            if future.cancel(): # still queued, never reached ClickHouse
+                with self._lock:
+                    self._queued -= 1
+            else:
+                asyncio.get_running_loop().run_in_executor(None, self.kill_query, stats.query_id)
+            raise
+
+    def kill_query(self, query_id: str) -> None:
+        try:
+            self._client.command("KILL QUERY WHERE query_id = %(query_id)s ASYNC", parameters={"query_id": query_id})
+            print(f"Killed ClickHouse query {query_id} after the request was cancelled.")
+        except Exception as e:
+            print(f"Warning: Could not kill ClickHouse query {query_id}: {e}")
+
+    def status(self) -> dict:
+        return {"max_workers": self._max_workers, "running": self._running, "queued": self._queued}
+
+    def table_versions(self, tables: Iterable[str]) -> Dict[str, str]:
+        """
+        Returns a version token per table derived from its active data parts.
+        Any insert, merge or mutation replaces parts, so the token changes whenever the data may have.
+        """
+        result = self._client.query(
+            "SELECT table, toString(sum(cityHash64(name))) FROM system.parts "
+            "WHERE database = currentDatabase() AND active AND has({tables:Array(String)}, table) "
+            "GROUP BY table",
+            parameters={"tables": sorted(tables)}
+        )
+        return {table: version for table, version in result.result_rows}
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._client.close()
+
+
+def create_client(pool_size: int = 8) -> Client:
+    return clickhouse_connect.get_client(
+        host=settings.CLICKHOUSE_HOST,
+        port=settings.CLICKHOUSE_PORT,
+        username=settings.CLICKHOUSE_USERNAME,
+        password=settings.CLICKHOUSE_PASSWORD,
+        database=settings.CLICKHOUSE_DATABASE,
+        autogenerate_session_id=False, # sessions serialize queries; the executor is shared across requests
+        send_receive_timeout=settings.CLICKHOUSE_MAX_EXECUTION_TIME + 30,
+        pool_mgr=httputil.get_pool_manager(maxsize=pool_size + 2) # query workers plus metadata/KILL calls
+    )
+
+
+# Singleton instance
+clickhouse_executor: Optional[ClickHouseExecutor] = None
+try:
+    clickhouse_executor = ClickHouseExecutor(
+        create_client(pool_size=settings.CLICKHOUSE_MAX_CONCURRENT_QUERIES),
+        max_workers=settings.CLICKHOUSE_MAX_CONCURRENT_QUERIES,
+        query_settings={
+            "max_execution_time": settings.CLICKHOUSE_MAX_EXECUTION_TIME,
+            "max_result_rows": settings.CLICKHOUSE_MAX_RESULT_ROWS,
+            "max_memory_usage": settings.CLICKHOUSE_MAX_MEMORY_USAGE,
+        }
+    )
+    print("ClickHouse query executor initialized successfully.")
+except Exception as e:
+    print(f"CRITICAL ERROR initializing ClickHouse query executor: {e}")
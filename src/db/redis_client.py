@@ -0,0 +1,128 @@
+import redis.asyncio as redis
+from typing import List, Optional, Tuple
+import json
+import uuid
+
+from src.core.config import settings
+
+
+def build_redis_url() -> str:
+    if settings.REDIS_PASSWORD:
+        return f"redis://:{settings.REDIS_PASSWORD}@{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}"
+    return f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}"
+
+
+# One connection pool shared by every request in this worker.
+redis_pool = redis.ConnectionPool.from_url(
+    build_redis_url(),
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    decode_responses=True
+)
+redis_client = redis.Redis(connection_pool=redis_pool)
+
+# Compare-and-delete in one step, so a lock that expired and was taken over by another worker is never deleted.
+RELEASE_LOCK_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+
+async def release_lock(client: redis.Redis, lock_key: str, token: str) -> None:
+    """Deletes `lock_key` only if `token` still owns it."""
+    try:
+        await client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+    except redis.ResponseError: # no scripting (e.g. fakeredis without Lua); not atomic, but never deletes a fresh lock
+        if await client.get(lock_key) == token:
+            await client.delete(lock_key)
+
+
+class SessionStore:
+    """
+    Non-blocking chat history store on top of the shared `redis.asyncio` pool.
+    Uses the same key layout and message format as LangChain's `RedisChatMessageHistory`
+    (newest message first under `message_store:<session_id>`), so existing sessions keep working.
+    Alongside the messages it keeps a rolling summary of older turns and the last executed SQL.
+    """
+
+    KEY_PREFIX = "message_store:"
+    SUMMARY_PREFIX = "session_summary:"
+    LAST_SQL_PREFIX = "session_last_sql:"
+    LOCK_PREFIX = "session_compaction_lock:"
+
+    def __init__(self, client: redis.Redis, ttl_seconds: int):
+        self._client = client
+        self._ttl_seconds = ttl_seconds
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.KEY_PREFIX}{session_id}"
+
+    @staticmethod
+    def _parse_messages(session_id: str, raw_messages: List[str]) -> List[Tuple[str, str]]:
+        turns = []
+        for raw in reversed(raw_messages):
+            try:
+                message = json.loads(raw)
+                turns.append((message["type"], message["data"]["content"]))
+            except (ValueError, KeyError, TypeError):
+                print(f"Warning: Skipping malformed chat message for session {session_id}")
+        return turns
+
+    async def load_context(self, session_id: str, max_messages: int) -> Tuple[List[Tuple[str, str]], str, str, int]:
+        """
+        Returns (recent messages oldest-first, summary, last SQL, total message count) in one round trip.
+        Only the newest `max_messages` messages are read.
+        """
+        key = self._key(session_id)
+        async with self._client.pipeline(transaction=False) as pipe:
+            pipe.lrange(key, 0, max_messages - 1)
+            pipe.get(f"{self.SUMMARY_PREFIX}{session_id}")
+            pipe.get(f"{self.LAST_SQL_PREFIX}{session_id}")
+            pipe.llen(key)
+            raw_messages, summary, last_sql, message_count = await pipe.execute()
+        return self._parse_messages(session_id, raw_messages), summary or "", last_sql or "", message_count
+
+    async def message_count(self, session_id: str) -> int:
+        return await self._client.llen(self._key(session_id))
+
+    async def load_summary(self, session_id: str) -> str:
+        return await self._client.get(f"{self.SUMMARY_PREFIX}{session_id}") or ""
+
+    async def load_oldest(self, session_id: str, count: int) -> List[Tuple[str, str]]:
+        """Returns the `count` oldest messages, oldest-first."""
+        raw_messages = await self._client.lrange(self._key(session_id), -count, -1)
+        return self._parse_messages(session_id, raw_messages)
+
+    async def replace_oldest_with_summary(self, session_id: str, count: int, summary: str) -> None:
+        """Drops the `count` oldest messages (already folded into `summary`) and stores the new summary."""
+        async with self._client.pipeline(transaction=False) as pipe:
+            pipe.rpop(self._key(session_id), count)
+            pipe.set(f"{self.SUMMARY_PREFIX}{session_id}", summary, ex=self._ttl_seconds)
+            await pipe.execute()
+
+    async def acquire_lock(self, session_id: str, ttl_seconds: int) -> Optional[str]:
+        """Returns the token that owns the session's compaction lock, or None when another worker holds it."""
+        token = uuid.uuid4().hex
+        acquired = await self._client.set(f"{self.LOCK_PREFIX}{session_id}", token, nx=True, ex=ttl_seconds)
+        return token if acquired else None
+
+    async def release_lock(self, session_id: str, token: str) -> None:
+        """Deletes the lock only if `token` still owns it; it may have expired and been taken over."""
+        await release_lock(self._client, f"{self.LOCK_PREFIX}{session_id}", token)
+
+    async def append_turn(self, session_id: str, question: str, answer: str, sql: Optional[str] = None) -> None:
+        """Appends one question/answer turn (and its SQL) and refreshes the TTLs in a single round trip."""
+        key = self._key(session_id)
+        human = json.dumps({"type": "human", "data": {"type": "human", "content": question}})
+        ai = json.dumps({"type": "ai", "data": {"type": "ai", "content": answer}})
+        async with self._client.pipeline(transaction=False) as pipe:
+            pipe.lpush(key, human, ai)
+            pipe.expire(key, self._ttl_seconds)
+            if sql:
+                pipe.set(f"{self.LAST_SQL_PREFIX}{session_id}", sql, ex=self._ttl_seconds)
+            pipe.expire(f"{self.SUMMARY_PREFIX}{session_id}", self._ttl_seconds)
+            await pipe.execute()
+
+
+session_store = SessionStore(redis_client, ttl_seconds=settings.SESSION_TTL_SECONDS)
+
+
+async def close_redis() -> None:
+    await redis_client.aclose()
+    await redis_pool.aclose()
@@ -1,11 +1,24 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware # For a frontend
+import time
 
 from src.core.config import settings
 from src.api.endpoints import chat as chat_router
+from src.api.endpoints import admin as admin_router
+from src.api.endpoints import results as results_router
+from src.api.endpoints import metrics as metrics_router
+from src.services.metrics import REQUEST_SECONDS
+from src.db.redis_client import close_redis
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await close_redis()
 
 app = FastAPI(
     title=settings.APP_NAME,
+    lifespan=lifespan,
     openapi_url=f"{settings.API_PREFIX}/openapi.json",
     docs_url=f"{settings.API_PREFIX}/docs",
     redoc_url=f"{settings.API_PREFIX}/redoc"
@@ -20,7 +33,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    started_at = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    REQUEST_SECONDS.observe(time.perf_counter() - started_at, route=getattr(route, "path", "unmatched"),
+                            method=request.method, status=str(response.status_code))
+    return response
+
 app.include_router(chat_router.router, prefix=settings.API_PREFIX, tags=["Chat Agent"])
+app.include_router(results_router.router, prefix=settings.API_PREFIX, tags=["Results"])
+app.include_router(admin_router.router, prefix=settings.API_PREFIX, tags=["Admin"])
+if settings.METRICS_ENABLED:
+    app.include_router(metrics_router.router) # served at /metrics, where Prometheus scrapes by default
 
 @app.get("/", tags=["Root"])
 async def read_root():
@@ -1,6 +1,8 @@
 from pydantic import BaseModel, Field
 from typing import Any, List, Dict, Optional
 
+from src.core.config import settings
+
 class ChatRequest(BaseModel):
     question: str = Field(..., description="The natural language question from the user.")
     session_id: str = Field(..., description="A unique identifier for the user's session to maintain conversation history.")
@@ -8,11 +10,31 @@ class ChatRequest(BaseModel):
 class SQLDebugInfo(BaseModel):
     generated_sql: Optional[str] = None
     sql_result_preview: Optional[List[Dict[str, Any]] | str] = None
+    selected_tables: Optional[List[str]] = Field(None, description="Tables whose schema was sent to the SQL prompt after pruning.")
+    example_match: Optional[str] = Field(None, description="'exact' or 'parameterized' when the SQL was reused from a verified example instead of the LLM.")
+    few_shot_examples: Optional[int] = Field(None, description="Number of verified examples added to the SQL prompt.")
+    rollups_offered: Optional[List[str]] = Field(None, description="Pre-aggregated rollup tables described to the SQL prompt for this question.")
+    rollup_used: Optional[bool] = Field(None, description="Whether the generated SQL reads from a rollup table instead of the base tables.")
+    query_estimate: Optional[Dict[str, Any]] = Field(None, description="EXPLAIN-based estimate of the rows, marks and bytes the executed SQL reads, per table and in total.")
+    query_guard: Optional[str] = Field(None, description="Outcome of the query cost check: 'ok', 'limited' (over budget but the row limit stops the scan early), 'rewritten' or 'rejected'.")
+    sql_cache_hit: Optional[bool] = Field(None, description="Whether the SQL was served from the question cache instead of the LLM.")
+    result_cache_hit: Optional[bool] = Field(None, description="Whether the query result was served from the result cache instead of ClickHouse.")
+    query_stats: Optional[Dict[str, Any]] = Field(None, description="ClickHouse query id, queue wait and execution time when the query was executed.")
+    result_id: Optional[str] = Field(None, description="Id of the parked full result when it exceeds the inline row limit; page through it via /results/{result_id}.")
+    result_row_count: Optional[int] = Field(None, description="Number of rows returned by the query (after the row limit).")
+    result_truncated: Optional[bool] = Field(None, description="Whether the query produced more rows than RESULT_MAX_ROWS and was cut off.")
+    coalesced: Optional[str] = Field(None, description="'local' or 'remote' when this answer was shared from an identical question in flight in this worker or another one.")
+    answer_source: Optional[str] = Field(None, description="'template' if the answer was written locally for a trivial result, 'llm' otherwise.")
+    chart_suggestion_source: Optional[str] = Field(None, description="'rules' if the chart was picked by the local classifier, 'llm' otherwise.")
+    timings_ms: Dict[str, float] = Field(default_factory=dict, description="Milliseconds spent in each stage of this request (history, schema, sql_generation, query_execution, ...).")
+    llm_tokens: Dict[str, Dict[str, int]] = Field(default_factory=dict, description="Input/output tokens reported by the LLM, per chain.")
 
 class ChartData(BaseModel):
     type: str = Field(description="The suggested chart type (e.g., 'bar', 'line', 'pie', 'table', 'none').")
     title: str = Field(description="A suggested title for the chart.")
     data: Any = Field(description="Data structured for a charting library, e.g., {'labels': [...], 'datasets': [{'label': '...', 'data': [...]}]}.")
+    original_row_count: Optional[int] = Field(None, description="Number of result rows the chart was built from, before any downsampling.")
+    downsampling: Optional[str] = Field(None, description="Reduction applied to fit the chart: 'lttb' or 'min_max' for lines, 'top_n_other' for bar/pie, 'head' for tables; None if every row is included.")
 
 class ChatResponse(BaseModel):
     session_id: str
@@ -21,3 +43,22 @@ class ChatResponse(BaseModel):
     debug_info: Optional[SQLDebugInfo] = None
     chart_data: Optional[ChartData] = Field(None, description="Contains information for rendering a chart, if applicable.")
     error: Optional[str] = None
+
+class BatchChatRequest(BaseModel):
+    requests: List[ChatRequest] = Field(..., min_length=1, max_length=settings.BATCH_MAX_QUESTIONS, description="Questions to answer; they may share a session or use independent ones.")
+
+class BatchChatResponse(BaseModel):
+    responses: List[ChatResponse] = Field(description="One response per request, in the same order.")
+
+class ResultPage(BaseModel):
+    result_id: str
+    offset: int
+    limit: int
+    row_count: int = Field(description="Total number of rows in the parked result.")
+    truncated: bool = Field(description="Whether the original query produced more rows than were kept.")
+    columns: List[str]
+    rows: List[Dict[str, Any]]
+
+class VerifiedExample(BaseModel):
+    question: str = Field(..., description="A question that was answered correctly.")
+    sql: str = Field(..., description="The SQL that answered it, e.g. `debug_info.generated_sql` from the response.")
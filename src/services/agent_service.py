@@ -1,20 +1,38 @@
-from langchain.memory import ConversationBufferMemory
-from langchain_community.chat_message_histories import RedisChatMessageHistory
-from typing import Tuple, Optional, Any, Dict
+from typing import Tuple, Optional, Any, Dict, List, AsyncIterator
 import pandas as pd
 import json
-import re
 import asyncio
-import ast # Import for safely evaluating string literals
+import time
+from contextlib import nullcontext
+from dataclasses import asdict
 
 from src.core.config import settings
-from src.core.llm_config import llm, db, sql_generation_chain, answer_synthesis_chain, chart_suggestion_chain
+from src.core.llm_config import llm, db, schema_cache, sql_generation_chain, answer_synthesis_chain, chart_suggestion_chain
+from src.core.llm_dispatcher import LLMOverloaded
+from src.db.clickhouse_client import clickhouse_executor, QueryStats
+from src.db.redis_client import session_store
+from src.services.memory_service import conversation_memory
+from src.services.sql_cache import sql_generation_cache
+from src.services.result_cache import query_result_cache, canonicalize_sql, referenced_tables
+from src.services.chart_rules import suggest_chart
+from src.services.answer_templates import render_answer
+from src.services.result_summary import summarize_result
+from src.services.result_store import result_store, apply_row_limit
+from src.services.chart_data import build_chart_payload
+from src.services.serialization import json_safe_records
+from src.services.table_selector import table_selector
+from src.services.example_store import example_store
+from src.services.single_flight import question_single_flight
+from src.services.rollup_router import rollup_router
+from src.services.query_guard import query_guard, QueryBudgetExceeded
+from src.services.metrics import track_stage, record_stage, llm_config, record_query_stats, ROLLUP_QUERIES, QUERY_GUARD_DECISIONS, ANSWERS
 from src.schemas.chat_schemas import SQLDebugInfo, ChartData
 
 class AgentService:
     def __init__(self):
         critical_components = {
-            "LLM": llm, "Database Connection": db, "SQL Generation Chain": sql_generation_chain,
+            "LLM": llm, "Database Connection": db, "Schema Cache": schema_cache, "ClickHouse Executor": clickhouse_executor,
+            "SQL Generation Chain": sql_generation_chain,
             "Answer Synthesis Chain": answer_synthesis_chain, "Chart Suggestion Chain": chart_suggestion_chain
         }
         missing = [name for name, comp in critical_components.items() if not comp]
@@ -25,86 +43,422 @@ class AgentService:
         self.answer_synthesis_chain = answer_synthesis_chain
         self.chart_suggestion_chain = chart_suggestion_chain
         self.db = db
+        self.schema_cache = schema_cache
+        self.query_executor = clickhouse_executor
+        self.session_store = session_store
+        self.memory = conversation_memory
+        self.sql_cache = sql_generation_cache
+        self.result_cache = query_result_cache
+        self.result_store = result_store
+        self.table_selector = table_selector
+        self.example_store = example_store
+        self.single_flight = question_single_flight
+        self.rollup_router = rollup_router
+        self.query_guard = query_guard
 
-    def _get_session_memory(self, session_id: str) -> ConversationBufferMemory:
-        redis_url = f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}"
-        if settings.REDIS_PASSWORD:
-             redis_url = f"redis://:{settings.REDIS_PASSWORD}@{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}"
-        
-        message_history = RedisChatMessageHistory(url=redis_url, session_id=session_id, ttl=1800)
-        return ConversationBufferMemory(chat_memory=message_history, return_messages=False, memory_key="chat_history")
-
-    async def process_question(self, question: str, session_id: str) -> Tuple[str, Optional[ChartData], Optional[SQLDebugInfo], Optional[str]]:
-        memory_manager = self._get_session_memory(session_id)
-        chat_history_str = memory_manager.load_memory_variables({}).get("chat_history", "")
+    async def _build_sql_input(self, question: str, session_id: str, sql_debug_info: SQLDebugInfo) -> Tuple[str, str]:
+        """Returns (chat_history, input_for_sql_chain) for the session."""
+        with track_stage(sql_debug_info.timings_ms, "history_load"):
+            chat_history_str = await self.memory.load_history(session_id)
+        return chat_history_str, self._format_sql_input(question, chat_history_str)
 
+    @staticmethod
+    def _format_sql_input(question: str, chat_history_str: str) -> str:
         input_for_sql_chain = f"Current Question: {question}"
         if chat_history_str.strip():
             input_for_sql_chain = f"Chat History:\n{chat_history_str}\n\n---\n\n{input_for_sql_chain}"
+        return input_for_sql_chain
+
+    def _load_schema(self, question: str, chat_history_str: str) -> Tuple[str, str, Optional[List[str]]]:
+        """Returns (table_info, dialect, selected_tables), pruned to the relevant tables when enabled. Blocking."""
+        table_info, dialect = self.schema_cache.get()
+        if not self.table_selector:
+            return table_info, dialect, None
+        selected_tables = self.table_selector.select(question, chat_history_str)
+        return self.schema_cache.get(selected_tables)[0], dialect, selected_tables
+
+    async def _generate_sql(self, question: str, chat_history_str: str, input_for_sql_chain: str, sql_debug_info: SQLDebugInfo,
+                            llm_semaphore: Optional[asyncio.Semaphore] = None) -> Tuple[str, Optional[str]]:
+        """Returns (generated_sql, sql_cache_key). The key is only set when the SQL still has to be cached."""
+        loop = asyncio.get_running_loop()
+        with track_stage(sql_debug_info.timings_ms, "schema"):
+            table_info, dialect, sql_debug_info.selected_tables = await loop.run_in_executor(None, self._load_schema, question, chat_history_str)
+        sql_cache_key = None
+        generated_sql = None
+        sql_generation_input = None
+        if self.example_store:
+            match = self.example_store.match(question, chat_history_str)
+            if match:
+                generated_sql, sql_debug_info.example_match = match
+        if generated_sql is None and self.sql_cache:
+            with track_stage(sql_debug_info.timings_ms, "sql_cache_lookup"):
+                sql_cache_key = self.sql_cache.make_key(question, self.schema_cache.schema_hash, chat_history_str)
+                generated_sql = await self.sql_cache.get(sql_cache_key)
+            sql_debug_info.sql_cache_hit = generated_sql is not None
+
+        if generated_sql is None:
+            examples = self.example_store.search(question) if self.example_store else []
+            sql_debug_info.few_shot_examples = len(examples)
+            rollups = await loop.run_in_executor(None, self.rollup_router.route, question) if self.rollup_router else []
+            sql_debug_info.rollups_offered = [r.table for r in rollups] or None
+            sql_generation_input = {"input": input_for_sql_chain, "table_info": table_info, "dialect": dialect,
+                                    "rollups": self.rollup_router.render(rollups) if self.rollup_router else "",
+                                    "examples": self.example_store.render(examples) if self.example_store else ""}
+            with track_stage(sql_debug_info.timings_ms, "sql_generation"):
+                async with llm_semaphore or nullcontext():
+                    generated_sql = await self.sql_generation_chain.ainvoke(sql_generation_input, config=llm_config("sql_generation", sql_debug_info.llm_tokens))
+            generated_sql = generated_sql.replace("```sql", "").replace("```", "").strip()
+        else:
+            sql_cache_key = None
+        sql_debug_info.generated_sql = generated_sql
+
+        self._check_sql(generated_sql)
+        if self.query_guard: # only freshly generated SQL can be sent back for a cheaper version
+            generated_sql = await self._guard_sql(generated_sql, sql_generation_input, sql_debug_info, llm_semaphore)
+        rollups_used = referenced_tables(generated_sql) & set(settings.ROLLUP_TABLE_NAMES)
+        sql_debug_info.rollup_used = bool(rollups_used)
+        for rollup in rollups_used:
+            ROLLUP_QUERIES.inc(rollup=rollup)
+        return generated_sql, sql_cache_key
+
+    @staticmethod
+    def _check_sql(generated_sql: str) -> None:
+        if "Error" in generated_sql or "SELECT" not in generated_sql.upper():
+            raise ValueError(f"LLM failed to generate a valid SQL query. Output: {generated_sql}")
+
+    async def _guard_sql(self, generated_sql: str, sql_generation_input: Optional[Dict[str, str]], sql_debug_info: SQLDebugInfo,
+                         llm_semaphore: Optional[asyncio.Semaphore] = None) -> str:
+        """
+        Checks the estimated cost of the SQL (as it will run, with the row limit) against the query budgets
+        and returns the SQL to execute. Over-budget queries that the row limit stops early run as they are.
+        Others are sent back to the LLM with the estimate, when `sql_generation_input` is given, and
+        rejected with QueryBudgetExceeded if no attempt fits.
+        """
+        loop = asyncio.get_running_loop()
+        rewrites_left = settings.QUERY_GUARD_REWRITE_ATTEMPTS if sql_generation_input else 0
+        decision = "ok"
+        while True:
+            limited_sql = apply_row_limit(generated_sql, settings.RESULT_MAX_ROWS + 1)
+            with track_stage(sql_debug_info.timings_ms, "query_guard"):
+                estimate = await loop.run_in_executor(None, self.query_guard.estimate, limited_sql)
+            if estimate is None: # not explainable; execution reports the error
+                decision = None if decision == "ok" else decision
+                break
+            sql_debug_info.query_estimate = asdict(estimate)
+            violations = self.query_guard.violations(estimate)
+            if not violations:
+                break
+            if estimate.streaming:
+                decision = "limited"
+                break
+            if not rewrites_left:
+                QUERY_GUARD_DECISIONS.inc(decision="rejected")
+                sql_debug_info.query_guard = "rejected"
+                raise QueryBudgetExceeded(
+                    f"The query was not run because it is too expensive ({'; '.join(violations)}). "
+                    "Try narrowing the question, e.g. to a date range, a category or a top N."
+                )
+            rewrites_left -= 1
+            decision = "rewritten"
+            feedback = (
+                f"{sql_generation_input['input']}\n\n"
+                f"This query was estimated to be too expensive to run:\n{generated_sql}\n"
+                f"Estimate: {self.query_guard.render_feedback(estimate, violations)}\n"
+                "Write a cheaper query that still answers the question: filter on dates and keys where possible, "
+                "join on key columns instead of cross joining, and aggregate instead of returning raw rows."
+            )
+            with track_stage(sql_debug_info.timings_ms, "sql_rewrite"):
+                async with llm_semaphore or nullcontext():
+                    generated_sql = await self.sql_generation_chain.ainvoke({**sql_generation_input, "input": feedback},
+                                                                           config=llm_config("sql_rewrite", sql_debug_info.llm_tokens))
+            generated_sql = generated_sql.replace("```sql", "").replace("```", "").strip()
+            sql_debug_info.generated_sql = generated_sql
+            self._check_sql(generated_sql)
+        if decision:
+            QUERY_GUARD_DECISIONS.inc(decision=decision)
+            sql_debug_info.query_guard = decision
+        return generated_sql
+
+    async def _run_query(self, generated_sql: str) -> Tuple[pd.DataFrame, Optional[bool], Optional[QueryStats]]:
+        """Returns (result, result_cache_hit, query_stats). At most RESULT_MAX_ROWS + 1 rows are fetched."""
+        limited_sql = apply_row_limit(generated_sql, settings.RESULT_MAX_ROWS + 1) # one extra row detects truncation
+        if self.result_cache:
+            sql_result_df, result_cache_hit, query_stats = await self.result_cache.get_or_execute(limited_sql)
+        else:
+            (sql_result_df, query_stats), result_cache_hit = await self.query_executor.execute(limited_sql), None
+        if query_stats:
+            record_query_stats(query_stats.read_rows, query_stats.read_bytes)
+        return sql_result_df, result_cache_hit, query_stats
+
+    async def _execute_sql(self, generated_sql: str, sql_cache_key: Optional[str], sql_debug_info: SQLDebugInfo,
+                           query_task: Optional[asyncio.Task] = None) -> pd.DataFrame:
+        """Executes the SQL, or awaits `query_task` when another request already runs the identical query."""
+        with track_stage(sql_debug_info.timings_ms, "query_execution"):
+            sql_result_df, sql_debug_info.result_cache_hit, query_stats = await (query_task or self._run_query(generated_sql))
+        if query_stats:
+            sql_debug_info.query_stats = asdict(query_stats)
+
+        sql_debug_info.result_truncated = len(sql_result_df) > settings.RESULT_MAX_ROWS
+        if sql_debug_info.result_truncated:
+            sql_result_df = sql_result_df.head(settings.RESULT_MAX_ROWS)
+        sql_debug_info.result_row_count = len(sql_result_df)
+        if len(sql_result_df) > settings.RESULT_INLINE_ROWS: # park the full result; responses only carry the first rows
+            with track_stage(sql_debug_info.timings_ms, "result_parking"):
+                sql_debug_info.result_id = await self.result_store.park(sql_result_df, sql_debug_info.result_truncated)
+        if sql_cache_key:
+            await self.sql_cache.set(sql_cache_key, generated_sql) # only cache SQL that executed successfully
+        sql_debug_info.sql_result_preview = self._preview_records(sql_result_df)
+        return sql_result_df
+
+    @staticmethod
+    def _result_for_llms(sql_result_df: pd.DataFrame, truncated: Optional[bool] = False) -> str:
+        return summarize_result(sql_result_df, settings.RESULT_SUMMARY_TOKEN_BUDGET, settings.RESULT_SUMMARY_SAMPLE_ROWS,
+                                settings.RESULT_SUMMARY_TOP_K, bool(truncated))
+
+    @staticmethod
+    def _templated_answer(question: str, sql_result_df: pd.DataFrame, sql_debug_info: SQLDebugInfo) -> Optional[str]:
+        """The locally written answer for trivial results, or None when the answer LLM is needed."""
+        templated = render_answer(question, sql_result_df) if settings.ANSWER_TEMPLATES_ENABLED else None
+        sql_debug_info.answer_source = "template" if templated is not None else "llm"
+        ANSWERS.inc(source=sql_debug_info.answer_source)
+        return templated
+
+    def _start_chart_suggestion(self, question: str, sql_result_df: pd.DataFrame, sql_result_for_llms: str, sql_debug_info: SQLDebugInfo) -> Tuple[Optional[dict], Optional[Any]]:
+        """
+        Returns (suggestion, None) when the rule-based classifier handles the shape, otherwise
+        (None, coroutine) for the LLM suggestion so the caller can run it alongside the answer.
+        """
+        chart_suggestion = suggest_chart(question, sql_result_df)
+        sql_debug_info.chart_suggestion_source = "rules" if chart_suggestion is not None else "llm"
+        if chart_suggestion is not None:
+            return chart_suggestion, None
+        return None, self.chart_suggestion_chain.ainvoke({"question": question, "sql_result_data": sql_result_for_llms},
+                                                         config=llm_config("chart_suggestion", sql_debug_info.llm_tokens))
+
+    def _build_chart(self, chart_suggestion: Optional[dict], chart_json_str: Optional[str], sql_result_df: pd.DataFrame) -> Optional[ChartData]:
+        try:
+            if chart_suggestion is None:
+                chart_suggestion = json.loads(chart_json_str)
+            if chart_suggestion.get("chart_needed") and not sql_result_df.empty:
+                return self._format_data_for_chart(chart_suggestion, sql_result_df)
+        except json.JSONDecodeError:
+            print(f"Warning: Could not decode chart suggestion JSON: {chart_json_str}")
+        return None
+
+    async def _synthesize(self, question: str, generated_sql: str, sql_result_df: pd.DataFrame, sql_debug_info: SQLDebugInfo,
+                          llm_semaphore: Optional[asyncio.Semaphore] = None) -> Tuple[str, Optional[ChartData]]:
+        """Produces the final answer and chart, running the chart LLM call alongside the answer when it is needed."""
+        async def bounded(stage, coroutine):
+            with track_stage(sql_debug_info.timings_ms, stage):
+                async with llm_semaphore or nullcontext():
+                    return await coroutine
+
+        sql_result_for_llms = self._result_for_llms(sql_result_df, sql_debug_info.result_truncated)
+        chart_suggestion, chart_task = self._start_chart_suggestion(question, sql_result_df, sql_result_for_llms, sql_debug_info)
+        templated = self._templated_answer(question, sql_result_df, sql_debug_info)
+        if templated is not None: # trivial result; the rules always pick its chart, so no LLM call is left
+            chart_json_str = await bounded("chart_suggestion", chart_task) if chart_task is not None else None
+            return templated, self._build_chart(chart_suggestion, chart_json_str, sql_result_df)
+        answer_task = bounded("answer_synthesis", self.answer_synthesis_chain.ainvoke(
+            {"question": question, "sql_query": generated_sql, "sql_result_data": sql_result_for_llms},
+            config=llm_config("answer_synthesis", sql_debug_info.llm_tokens)
+        ))
+
+        chart_json_str = None
+        if chart_task is not None: # ambiguous shape, ask the LLM in parallel with the answer
+            final_answer, chart_json_str = await asyncio.gather(answer_task, bounded("chart_suggestion", chart_task))
+        else:
+            final_answer = await answer_task
+        return final_answer, self._build_chart(chart_suggestion, chart_json_str, sql_result_df)
+
+    async def _answer(self, question: str, chat_history_str: str, input_for_sql_chain: str,
+                      sql_debug_info: SQLDebugInfo) -> Tuple[str, Optional[ChartData], SQLDebugInfo]:
+        """Generates and runs the SQL, then writes the answer and chart. Touches no session state, so it can be shared."""
+        # === Step 1: Generate SQL Query ===
+        generated_sql, sql_cache_key = await self._generate_sql(question, chat_history_str, input_for_sql_chain, sql_debug_info)
+
+        # === Step 2: Execute SQL Query ===
+        sql_result_df = await self._execute_sql(generated_sql, sql_cache_key, sql_debug_info)
+
+        # === Step 3: Synthesize Answer and Suggest Chart Concurrently ===
+        final_answer, chart_data_object = await self._synthesize(question, generated_sql, sql_result_df, sql_debug_info)
+        return final_answer, chart_data_object, sql_debug_info
+
+    @staticmethod
+    def _encode_answer(answer: Tuple[str, Optional[ChartData], SQLDebugInfo]) -> str:
+        final_answer, chart_data_object, sql_debug_info = answer
+        return json.dumps({
+            "answer": final_answer,
+            "chart_data": chart_data_object.model_dump() if chart_data_object else None,
+            "debug_info": sql_debug_info.model_dump()
+        }, default=str)
+
+    @staticmethod
+    def _decode_answer(encoded: str) -> Tuple[str, Optional[ChartData], SQLDebugInfo]:
+        payload = json.loads(encoded)
+        chart_data = payload["chart_data"]
+        return payload["answer"], ChartData(**chart_data) if chart_data else None, SQLDebugInfo(**payload["debug_info"])
+
+    async def compact_session_memory(self, session_id: str) -> None:
+        """Folds older turns into the session summary. Meant to run after the response has been sent."""
+        await self.memory.compact(session_id)
 
+    async def process_question(self, question: str, session_id: str) -> Tuple[str, Optional[ChartData], Optional[SQLDebugInfo], Optional[str]]:
         sql_debug_info = SQLDebugInfo()
         final_answer = "I encountered an issue processing your request."
         chart_data_object: Optional[ChartData] = None
         error_message: Optional[str] = None
 
+        started_at = time.perf_counter()
         try:
-            # === Step 1: Generate SQL Query ===
-            sql_generation_input = {"input": input_for_sql_chain, "table_info": self.db.get_table_info(), "dialect": self.db.dialect}
-            generated_sql = await self.sql_generation_chain.ainvoke(sql_generation_input)
-            generated_sql = generated_sql.replace("```sql", "").replace("```", "").strip()
-            sql_debug_info.generated_sql = generated_sql
-
-            if "Error" in generated_sql or "SELECT" not in generated_sql.upper():
-                raise ValueError(f"LLM failed to generate a valid SQL query. Output: {generated_sql}")
-
-            # === Step 2: Execute SQL Query ===
-            loop = asyncio.get_running_loop()
-            raw_sql_result_str = await loop.run_in_executor(None, self.db.run, generated_sql)
-            
-            # === FIX: Parse the string result from db.run() into a Python list ===
-            parsed_sql_result_data = []
-            if isinstance(raw_sql_result_str, str) and raw_sql_result_str.strip().startswith("["):
-                try:
-                    parsed_sql_result_data = ast.literal_eval(raw_sql_result_str)
-                except (ValueError, SyntaxError):
-                    print(f"Warning: Could not parse string SQL result: {raw_sql_result_str}")
-            elif isinstance(raw_sql_result_str, list):
-                 parsed_sql_result_data = raw_sql_result_str # Already a list
-
-            # === Step 3: Synthesize Answer and Suggest Chart Concurrently ===
-            sql_result_df = pd.DataFrame(parsed_sql_result_data) # Create DataFrame from the parsed list
-            if not sql_result_df.empty and all(isinstance(c, int) for c in sql_result_df.columns):
-                try:
-                    cols = [c.strip().split()[-1].replace('`', '') for c in re.search(r"SELECT\s+(.*?)\s+FROM", generated_sql, re.IGNORECASE | re.DOTALL).group(1).split(',')]
-                    if len(cols) == len(sql_result_df.columns): sql_result_df.columns = cols
-                except Exception: print("Warning: Could not parse column names from SQL query.")
-
-            sql_result_for_llms = "Query returned no data." if sql_result_df.empty else sql_result_df.to_string(index=False, max_rows=10)
-
-            answer_task = self.answer_synthesis_chain.ainvoke({"question": question, "sql_query": generated_sql, "sql_result_data": sql_result_for_llms})
-            chart_task = self.chart_suggestion_chain.ainvoke({"question": question, "sql_result_data": sql_result_for_llms})
-            
-            results = await asyncio.gather(answer_task, chart_task)
-            final_answer, chart_json_str = results[0], results[1]
+            chat_history_str, input_for_sql_chain = await self._build_sql_input(question, session_id, sql_debug_info)
 
-            try:
-                chart_suggestion = json.loads(chart_json_str)
-                if chart_suggestion.get("chart_needed") and not sql_result_df.empty:
-                    chart_data_object = self._format_data_for_chart(chart_suggestion, sql_result_df)
-            except json.JSONDecodeError:
-                print(f"Warning: Could not decode chart suggestion JSON: {chart_json_str}")
+            if self.single_flight: # identical concurrent questions with the same context share one run
+                key = self.single_flight.make_key(question, self.schema_cache.schema_hash, chat_history_str)
+                waited_from = time.perf_counter()
+                (final_answer, chart_data_object, shared_debug_info), coalesced = await self.single_flight.do(
+                    key, lambda: self._answer(question, chat_history_str, input_for_sql_chain, sql_debug_info),
+                    self._encode_answer, self._decode_answer
+                )
+                if coalesced:
+                    record_stage(sql_debug_info.timings_ms, "coalesced_wait", time.perf_counter() - waited_from)
+                    sql_debug_info = shared_debug_info.model_copy(deep=True, update={
+                        "timings_ms": sql_debug_info.timings_ms, "llm_tokens": {}, "coalesced": coalesced
+                    })
+            else:
+                final_answer, chart_data_object, _ = await self._answer(question, chat_history_str, input_for_sql_chain, sql_debug_info)
+            generated_sql = sql_debug_info.generated_sql
 
-            memory_manager.save_context({"input": question}, {"output": final_answer})
+            with track_stage(sql_debug_info.timings_ms, "history_append"):
+                await self.session_store.append_turn(session_id, question, final_answer, sql=generated_sql)
 
+        except LLMOverloaded:
+            raise # load shedding; the endpoint answers 429 so clients back off
         except Exception as e:
             import traceback
             final_answer, error_message = "Sorry, I encountered a critical error.", str(e)
             print(f"Error processing question: {e}\n{traceback.format_exc()}")
             if not sql_debug_info.generated_sql or "Error" in sql_debug_info.generated_sql:
                  sql_debug_info.generated_sql = f"Error during processing: {error_message}"
+        record_stage(sql_debug_info.timings_ms, "total", time.perf_counter() - started_at)
         
         return final_answer, chart_data_object, sql_debug_info, error_message
 
+    async def process_batch(self, items: List[Tuple[str, str]]) -> List[Tuple[str, Optional[ChartData], Optional[SQLDebugInfo], Optional[str]]]:
+        """
+        Answers many (question, session_id) pairs concurrently and returns results in input order.
+        Every question sees its session's history as it was at the start of the batch, LLM calls share
+        a BATCH_LLM_CONCURRENCY limit, and identical generated SQL is executed only once.
+        """
+        llm_semaphore = asyncio.Semaphore(settings.BATCH_LLM_CONCURRENCY)
+        session_ids = list(dict.fromkeys(session_id for _, session_id in items))
+        histories = dict(zip(session_ids, await asyncio.gather(*(self.memory.load_history(sid) for sid in session_ids))))
+        query_tasks: Dict[str, asyncio.Task] = {}
+
+        async def answer_one(question: str, session_id: str):
+            sql_debug_info = SQLDebugInfo()
+            started_at = time.perf_counter()
+            try:
+                chat_history_str = histories[session_id]
+                input_for_sql_chain = self._format_sql_input(question, chat_history_str)
+                generated_sql, sql_cache_key = await self._generate_sql(question, chat_history_str, input_for_sql_chain, sql_debug_info, llm_semaphore)
+
+                query_key = canonicalize_sql(generated_sql)
+                if query_key not in query_tasks:
+                    query_tasks[query_key] = asyncio.create_task(self._run_query(generated_sql))
+                sql_result_df = await self._execute_sql(generated_sql, sql_cache_key, sql_debug_info, query_tasks[query_key])
+
+                final_answer, chart_data_object = await self._synthesize(question, generated_sql, sql_result_df, sql_debug_info, llm_semaphore)
+                record_stage(sql_debug_info.timings_ms, "total", time.perf_counter() - started_at)
+                return final_answer, chart_data_object, sql_debug_info, None
+            except LLMOverloaded:
+                raise # shed the whole batch; the endpoint answers 429 rather than a page of per-item errors
+            except Exception as e:
+                print(f"Error processing batch question '{question}': {e}")
+                if not sql_debug_info.generated_sql or "Error" in sql_debug_info.generated_sql:
+                    sql_debug_info.generated_sql = f"Error during processing: {str(e)}"
+                return "Sorry, I encountered a critical error.", None, sql_debug_info, str(e)
+
+        answer_tasks = [asyncio.create_task(answer_one(question, session_id)) for question, session_id in items]
+        try:
+            results = await asyncio.gather(*answer_tasks)
+        finally:
+            for task in [*answer_tasks, *query_tasks.values()]:
+                task.cancel() # no-op for finished tasks; stops the rest of the batch if it is shed or abandoned
+
+        # Record turns in input order so each session's history stays in the order the questions were asked.
+        for (question, session_id), (final_answer, _, sql_debug_info, error_message) in zip(items, results):
+            if error_message is None:
+                await self.session_store.append_turn(session_id, question, final_answer, sql=sql_debug_info.generated_sql)
+        return results
+
+    @staticmethod
+    async def _timed(stage: str, coroutine, sql_debug_info: SQLDebugInfo):
+        with track_stage(sql_debug_info.timings_ms, stage):
+            return await coroutine
+
+    async def stream_question(self, question: str, session_id: str) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Runs the same pipeline as `process_question` but yields (event, payload) pairs as each stage
+        finishes: 'sql', 'data', a series of 'answer_token', 'chart' and finally 'done' (or 'error').
+        """
+        sql_debug_info = SQLDebugInfo()
+        chart_task: Optional[asyncio.Task] = None
+        started_at = time.perf_counter()
+        try:
+            chat_history_str, input_for_sql_chain = await self._build_sql_input(question, session_id, sql_debug_info)
+
+            generated_sql, sql_cache_key = await self._generate_sql(question, chat_history_str, input_for_sql_chain, sql_debug_info)
+            yield "sql", {"generated_sql": generated_sql, "sql_cache_hit": sql_debug_info.sql_cache_hit}
+
+            sql_result_df = await self._execute_sql(generated_sql, sql_cache_key, sql_debug_info)
+            yield "data", {
+                "columns": [str(c) for c in sql_result_df.columns],
+                "row_count": len(sql_result_df),
+                "preview": sql_debug_info.sql_result_preview
+            }
+
+            sql_result_for_llms = self._result_for_llms(sql_result_df, sql_debug_info.result_truncated)
+            chart_suggestion, chart_coroutine = self._start_chart_suggestion(question, sql_result_df, sql_result_for_llms, sql_debug_info)
+            if chart_coroutine is not None:
+                chart_task = asyncio.create_task(self._timed("chart_suggestion", chart_coroutine, sql_debug_info)) # runs while the answer streams
+
+            final_answer = self._templated_answer(question, sql_result_df, sql_debug_info)
+            if final_answer is not None:
+                yield "answer_token", {"token": final_answer}
+            else:
+                answer_chunks = []
+                answer_started_at = time.perf_counter() # timed by hand: a span must not stay open across yields
+                async for chunk in self.answer_synthesis_chain.astream({"question": question, "sql_query": generated_sql, "sql_result_data": sql_result_for_llms},
+                                                                       config=llm_config("answer_synthesis", sql_debug_info.llm_tokens)):
+                    answer_chunks.append(chunk)
+                    yield "answer_token", {"token": chunk}
+                record_stage(sql_debug_info.timings_ms, "answer_synthesis", time.perf_counter() - answer_started_at)
+                final_answer = "".join(answer_chunks)
+
+            chart_json_str = await chart_task if chart_task is not None else None
+            chart_data_object = self._build_chart(chart_suggestion, chart_json_str, sql_result_df)
+            yield "chart", chart_data_object.model_dump() if chart_data_object else None
+
+            with track_stage(sql_debug_info.timings_ms, "history_append"):
+                await self.session_store.append_turn(session_id, question, final_answer, sql=generated_sql)
+            record_stage(sql_debug_info.timings_ms, "total", time.perf_counter() - started_at)
+            yield "done", {"session_id": session_id, "question": question, "answer": final_answer, "debug_info": sql_debug_info.model_dump()}
+
+        except Exception as e:
+            import traceback
+            print(f"Error streaming question: {e}\n{traceback.format_exc()}")
+            if not sql_debug_info.generated_sql or "Error" in sql_debug_info.generated_sql:
+                sql_debug_info.generated_sql = f"Error during processing: {str(e)}"
+            yield "error", {"error": str(e), "debug_info": sql_debug_info.model_dump()}
+        finally:
+            if chart_task is not None and not chart_task.done():
+                chart_task.cancel() # client went away mid-stream
+
+    @staticmethod
+    def _preview_records(df: pd.DataFrame, max_rows: int = settings.RESULT_PREVIEW_ROWS) -> List[Dict[str, Any]]:
+        return json_safe_records(df.head(max_rows))
+
     def _format_data_for_chart(self, suggestion: dict, df: pd.DataFrame) -> Optional[ChartData]:
         try:
             chart_type = suggestion.get("chart_type", "none")
@@ -115,22 +469,12 @@ class AgentService:
             if chart_type == 'none': return None
 
             # If suggested columns don't exist in the dataframe, default to a table.
-            if not x_col or not y_cols or x_col not in df.columns or not all(yc in df.columns for yc in y_cols):
+            if chart_type != 'table' and (not x_col or not y_cols or x_col not in df.columns or not all(yc in df.columns for yc in y_cols)):
                 print(f"Warning: Chart suggestion columns not found. Defaulting to table.")
                 chart_type = "table"
 
-            if chart_type == 'table':
-                chart_data_payload = df.to_dict(orient='records')
-                return ChartData(type='table', title=title, data=chart_data_payload)
-
-            chart_data_payload = {"labels": df[x_col].tolist(), "datasets": []}
-            for y_col in y_cols:
-                chart_data_payload['datasets'].append({
-                    "label": str(y_col).replace("_", " ").title(), # Ensure label is a string
-                    "data": df[y_col].tolist()
-                })
-            
-            return ChartData(type=chart_type, title=title, data=chart_data_payload)
+            chart_data_payload, downsampling = build_chart_payload(chart_type, x_col, y_cols, df)
+            return ChartData(type=chart_type, title=title, data=chart_data_payload, original_row_count=len(df), downsampling=downsampling)
         except Exception as e:
             print(f"Error formatting data for chart: {e}")
             return None
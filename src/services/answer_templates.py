@@ -0,0 +1,102 @@
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Optional
+import numbers
+import re
+
+import numpy as np
+import pandas as pd
+
+# Column names ClickHouse gives unaliased expressions, e.g. `count()` or `sum(total_amount)`, or that say nothing on their own.
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_GENERIC_NAMES = {"count", "cnt", "total", "sum", "value", "result", "res", "num", "n", "x"}
+# "How many orders were placed in August?" -> "42 orders were placed in August."
+_HOW_MANY_RE = re.compile(r"^how many (?P<noun>[\w\s'-]+?) (?P<verb>were|are|was|is|have been|has been) (?P<rest>.+?)[?.!\s]*$", re.IGNORECASE)
+# "How many orders did we get in May?" -> "The number of orders is 42."
+_HOW_MANY_NOUN_RE = re.compile(
+    r"^how many (?P<noun>(?:(?!(?:did|do|does|were|are|was|is|have|has|had|will|in|on|for|from|during|by|per|with|that|since|placed|made|bought|ordered|purchased|registered|signed|joined|created|completed|got)\b)[\w'-]+ ?){1,3})",
+    re.IGNORECASE
+)
+# "What was the total revenue in August?" -> "The total revenue in August was 1,234.50."
+_WHAT_IS_RE = re.compile(r"^(?:what|how much) (?P<verb>is|was|are|were) (?:the |our )?(?P<subject>.+?)[?.!\s]*$", re.IGNORECASE)
+# "How many orders were placed in May, and how many in June?" asks for more than the one value; the templates would echo it as one.
+_MULTI_PART_RE = re.compile(r",|\b(?:and|or|vs|versus|compared)\b|\?.*\?", re.IGNORECASE)
+
+MAX_SINGLE_ROW_COLUMNS = 6
+
+NO_DATA_ANSWER = "No matching data was found for your question."
+
+
+def _is_missing(value: Any) -> bool:
+    try:
+        return value is None or bool(pd.isna(value))
+    except (TypeError, ValueError):
+        return False
+
+
+def format_value(value: Any) -> str:
+    """Formats a single result cell for a sentence: thousands separators, two decimals, ISO dates."""
+    if _is_missing(value):
+        return "no value"
+    if isinstance(value, (bool, np.bool_)):
+        return "yes" if value else "no"
+    if isinstance(value, numbers.Integral):
+        return f"{int(value):,}"
+    if isinstance(value, (numbers.Real, Decimal)):
+        value = float(value)
+        return f"{int(value):,}" if value.is_integer() else f"{value:,.2f}"
+    if isinstance(value, datetime): # includes pd.Timestamp
+        return value.strftime("%Y-%m-%d %H:%M") if (value.hour, value.minute, value.second) != (0, 0, 0) else value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def _label(column: str) -> str:
+    return column.replace("_", " ").strip()
+
+
+def _is_descriptive(column: str) -> bool:
+    return bool(_IDENTIFIER_RE.match(column)) and column.lower() not in _GENERIC_NAMES
+
+
+def _scalar_answer(question: str, column: str, value: Any) -> Optional[str]:
+    question = question.strip()
+    if isinstance(value, (bool, np.bool_)) or _MULTI_PART_RE.search(question):
+        return None # "The result is yes" answers neither a yes/no question nor one with several parts
+    text = format_value(value)
+    match = _HOW_MANY_RE.match(question)
+    if match and text != "1": # "1 orders were" reads badly; the generic form below is fine
+        return f"{text} {match.group('noun')} {match.group('verb')} {match.group('rest')}."
+    match = _WHAT_IS_RE.match(question)
+    if match:
+        return f"The {match.group('subject')} {match.group('verb')} {text}."
+    match = _HOW_MANY_NOUN_RE.match(question)
+    if match:
+        return f"The number of {match.group('noun').strip()} is {text}."
+    if _is_descriptive(column):
+        return f"The {_label(column)} is {text}."
+    return f"The result is {text}."
+
+
+def render_answer(question: str, df: pd.DataFrame) -> Optional[str]:
+    """
+    Deterministically writes the answer for trivial result shapes (no rows, a single value, a single
+    row) from the question wording and column names, so they skip `answer_synthesis_chain`. Returns
+    None when the result needs the LLM.
+    """
+    if df.empty:
+        return NO_DATA_ANSWER
+    if len(df) != 1 or len(df.columns) > MAX_SINGLE_ROW_COLUMNS:
+        return None
+
+    columns = [str(c) for c in df.columns]
+    values = list(df.iloc[0])
+    if len(columns) == 1:
+        if _is_missing(values[0]): # e.g. avg() over no rows
+            return NO_DATA_ANSWER
+        return _scalar_answer(question, columns[0], values[0])
+    if not all(_is_descriptive(c) for c in columns):
+        return None # unaliased expressions give the reader nothing to go on
+    fields = ", ".join(f"{_label(c)} {format_value(v)}" for c, v in zip(columns, values))
+    return f"I found one matching row: {fields}."
@@ -0,0 +1,125 @@
+from typing import Any, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from src.core.config import settings
+from src.services.serialization import json_safe_values, json_safe_records
+
+OTHER_LABEL = "Other"
+
+
+def _numeric_array(series: pd.Series) -> np.ndarray:
+    return pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _x_positions(series: pd.Series) -> np.ndarray:
+    """Numeric x coordinates for downsampling: timestamps for DateTime axes, row positions for labels."""
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        positions = series.to_numpy(dtype="datetime64[ns]").astype("int64").astype("float64")
+        return np.where(series.isna().to_numpy(), np.nan, positions) # NaT is a gap, not the year 1677
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return _numeric_array(series)
+    return np.arange(len(series), dtype="float64")
+
+
+def _present(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Positions of the points with both coordinates; missing values are gaps, not zeros."""
+    return np.flatnonzero(~(np.isnan(x) | np.isnan(y)))
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: picks `threshold` points that preserve the visual shape of the series."""
+    present = _present(x, y)
+    if len(present) < len(x):
+        return present[lttb_indices(x[present], y[present], threshold)]
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3: # no buckets between the end points
+        return np.unique([0, n - 1])
+    bucket_size = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        if end < next_end:
+            avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        indices[i + 1] = a
+    return indices
+
+
+def min_max_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Keeps the minimum and maximum of each of `threshold // 2` buckets (at least one), preserving spikes."""
+    present = _present(x, y)
+    if len(present) < len(y):
+        return present[min_max_indices(x[present], y[present], threshold)]
+    n = len(y)
+    if threshold >= n:
+        return np.arange(n)
+    edges = np.linspace(0, n, max(threshold // 2, 1) + 1, dtype=np.int64)
+    picked = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        if start < end:
+            bucket = y[start:end]
+            picked.extend((start + int(np.argmin(bucket)), start + int(np.argmax(bucket))))
+    return np.unique(np.array(picked, dtype=np.int64))
+
+
+def _downsample_series(df: pd.DataFrame, x_col: str, y_cols: List[str]) -> Tuple[pd.DataFrame, Optional[str]]:
+    if len(df) > 1 and (pd.api.types.is_datetime64_any_dtype(df[x_col].dtype) or pd.api.types.is_numeric_dtype(df[x_col].dtype)) \
+            and not df[x_col].is_monotonic_increasing:
+        df = df.sort_values(x_col, kind="stable")
+
+    if len(df) <= settings.CHART_MAX_POINTS:
+        return df, None
+    y = _numeric_array(df[y_cols[0]]) # every series shares the labels, so the first one drives selection
+    if settings.CHART_DOWNSAMPLING_METHOD == "min_max":
+        return df.iloc[min_max_indices(_x_positions(df[x_col]), y, settings.CHART_MAX_POINTS)], "min_max"
+    return df.iloc[lttb_indices(_x_positions(df[x_col]), y, settings.CHART_MAX_POINTS)], "lttb"
+
+
+def _bucket_top_n(df: pd.DataFrame, x_col: str, y_cols: List[str], max_categories: int) -> Tuple[List[Any], List[list], Optional[str]]:
+    """Keeps the largest `max_categories - 1` categories and folds the rest into a single 'Other' entry."""
+    labels = json_safe_values(df[x_col])
+    values = [json_safe_values(df[y]) for y in y_cols]
+    if len(df) <= max_categories:
+        return labels, values, None
+
+    y_arrays = [_numeric_array(df[y]) for y in y_cols]
+    order = np.argsort(-np.nan_to_num(y_arrays[0]), kind="stable")
+    top, rest = order[:max_categories - 1], order[max_categories - 1:]
+    labels = [labels[i] for i in top] + [OTHER_LABEL]
+    values = [[vals[i] for i in top] + [float(np.nansum(arr[rest]))] for vals, arr in zip(values, y_arrays)]
+    return labels, values, "top_n_other"
+
+
+def build_chart_payload(chart_type: str, x_col: Optional[str], y_cols: List[str], df: pd.DataFrame) -> Tuple[Any, Optional[str]]:
+    """
+    Returns (payload, downsampling) for a chart, bounding the number of points or categories sent
+    to the browser. `downsampling` names the reduction applied, or is None if all rows are included.
+    """
+    if chart_type == "table":
+        downsampling = "head" if len(df) > settings.RESULT_INLINE_ROWS else None
+        return json_safe_records(df.head(settings.RESULT_INLINE_ROWS)), downsampling
+
+    if chart_type == "line":
+        df, downsampling = _downsample_series(df, x_col, y_cols)
+        labels, values = json_safe_values(df[x_col]), [json_safe_values(df[y]) for y in y_cols]
+    else:
+        max_categories = settings.CHART_MAX_PIE_SLICES if chart_type == "pie" else settings.CHART_MAX_BAR_CATEGORIES
+        labels, values, downsampling = _bucket_top_n(df, x_col, y_cols, max_categories)
+
+    payload = {"labels": labels, "datasets": []}
+    for y_col, data in zip(y_cols, values):
+        payload["datasets"].append({
+            "label": str(y_col).replace("_", " ").title(), # Ensure label is a string
+            "data": data
+        })
+    return payload, downsampling
@@ -0,0 +1,97 @@
+from decimal import Decimal
+from typing import List, Optional
+import pandas as pd
+import re
+
+from src.core.config import settings
+
+# Column names that mark a time axis even when the column is not a DateTime (e.g. `month` as an integer).
+_TIME_NAME_RE = re.compile(r"(^|_)(date|day|week|month|year|quarter|period|hour|time)(_|$)", re.IGNORECASE)
+_ID_NAME_RE = re.compile(r"(^|_)id$", re.IGNORECASE)
+_PIE_QUESTION_RE = re.compile(r"\b(share|proportion|percentage|percent|distribution|breakdown|split)\b", re.IGNORECASE)
+
+MAX_SERIES = 4
+
+NO_CHART = {"chart_needed": False, "chart_type": "none", "title": "", "x_axis_column": None, "y_axis_columns": []}
+
+
+def is_numeric_column(series: pd.Series) -> bool:
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return False
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return True
+    if series.dtype == object: # Decimal columns come back as object dtype
+        sample = series.dropna().head(20)
+        return not sample.empty and all(isinstance(v, Decimal) for v in sample)
+    return False
+
+
+def has_unhashable_values(series: pd.Series) -> bool:
+    """Whether an object column holds arrays or maps (ClickHouse Array/Map results), which pandas cannot count or group."""
+    if series.dtype != object:
+        return False
+    for value in series:
+        try:
+            hash(value)
+        except TypeError:
+            return True
+    return False
+
+
+def is_time_column(series: pd.Series, name: str) -> bool:
+    return pd.api.types.is_datetime64_any_dtype(series.dtype) or bool(_TIME_NAME_RE.search(name))
+
+
+def _title(x_col: str, y_cols: List[str]) -> str:
+    label = lambda col: col.replace("_", " ").title()
+    return f"{', '.join(label(y) for y in y_cols)} by {label(x_col)}"
+
+
+def _suggestion(chart_type: str, x_col: Optional[str], y_cols: List[str], title: str = "") -> dict:
+    return {
+        "chart_needed": chart_type != "none",
+        "chart_type": chart_type,
+        "title": title or (_title(x_col, y_cols) if x_col else "Query Results"),
+        "x_axis_column": x_col,
+        "y_axis_columns": y_cols
+    }
+
+
+def suggest_chart(question: str, df: pd.DataFrame) -> Optional[dict]:
+    """
+    Deterministically classifies common result shapes and returns a suggestion in the same JSON
+    contract as `chart_suggestion_chain`. Returns None when the shape is ambiguous and the LLM
+    should decide.
+    """
+    if df.empty or len(df) == 1:
+        return dict(NO_CHART) # scalars and single rows read better as plain answers
+
+    columns = [str(c) for c in df.columns]
+    numeric = [c for c in columns if is_numeric_column(df[c]) and not _ID_NAME_RE.search(c)]
+    time_cols = [c for c in columns if is_time_column(df[c], c)]
+    measures = [c for c in numeric if c not in time_cols]
+    dimensions = [c for c in columns if c not in numeric and not _ID_NAME_RE.search(c)]
+
+    if not numeric:
+        return _suggestion("table", None, [], "Query Results") # lists of names, emails, etc.
+
+    non_time_dimensions = [c for c in dimensions if c not in time_cols]
+
+    # Time series: exactly one time axis plus a few measures.
+    if len(time_cols) == 1 and measures and len(measures) <= MAX_SERIES:
+        if non_time_dimensions:
+            return None # one series per category needs a pivot; let the LLM decide
+        return _suggestion("line", time_cols[0], measures)
+
+    # Category by metric: a single label column plus a few measures.
+    if len(non_time_dimensions) == 1 and not time_cols and measures and len(measures) <= MAX_SERIES:
+        x_col = non_time_dimensions[0]
+        if has_unhashable_values(df[x_col]):
+            return None # e.g. a groupArray label; let the LLM decide
+        if len(df) > settings.CHART_MAX_BAR_CATEGORIES or df[x_col].nunique(dropna=False) != len(df):
+            return None
+        if len(measures) == 1 and len(df) <= settings.CHART_MAX_PIE_SLICES and _PIE_QUESTION_RE.search(question):
+            return _suggestion("pie", x_col, measures)
+        return _suggestion("bar", x_col, measures)
+
+    return None
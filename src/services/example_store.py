@@ -0,0 +1,209 @@
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+import json
+import math
+import os
+import re
+import threading
+
+from src.core.config import settings
+from src.services.sql_cache import normalize_question
+from src.services.table_selector import tokenize
+
+# Values that can change between otherwise identical questions: quoted text, ISO dates, numbers
+# and capitalized names ("Addis Ababa", "Vegetables").
+_PARAM_RE = re.compile(
+    r"'(?P<squoted>[^']+)'|\"(?P<dquoted>[^\"]+)\""
+    r"|(?P<date>\b\d{4}-\d{2}-\d{2}\b)"
+    r"|(?P<number>\b\d+(?:\.\d+)?\b)"
+    r"|(?P<name>\b[A-Z][\w'-]*(?:\s+[A-Z][\w'-]*)*)"
+)
+PLACEHOLDER = "<param>"
+# Words whose meaning depends on the day the question is asked; verified SQL holds the dates of its verification day.
+_RELATIVE_TIME_RE = re.compile(
+    r"\b(?:today|tonight|yesterday|tomorrow|now|recent|recently|latest|ago|so far|to date|[mwyq]td"
+    r"|(?:this|last|past|previous|next|current)\s+(?:\d+\s+)?(?:day|week|weekend|month|quarter|year)s?)\b",
+    re.IGNORECASE
+)
+
+
+class Parameter(NamedTuple):
+    kind: str # 'text', 'date' or 'number'
+    value: str
+
+
+class Example(NamedTuple):
+    question: str
+    sql: str
+    template: str
+    parameters: Tuple[Parameter, ...]
+    tokens: Counter
+
+
+def extract_parameters(question: str) -> Tuple[str, Tuple[Parameter, ...]]:
+    """Returns (template, parameters): the normalized question with every value replaced by a placeholder."""
+    parts, parameters, last = [], [], 0
+    for match in _PARAM_RE.finditer(question):
+        if match.lastgroup == "name" and (match.start() == 0 or question[:match.start()].rstrip().endswith((".", "?", "!"))):
+            continue # sentence-initial capitals are not names
+        kind = {"date": "date", "number": "number"}.get(match.lastgroup, "text")
+        parts.append(question[last:match.start()] + PLACEHOLDER)
+        parameters.append(Parameter(kind, match.group(match.lastgroup)))
+        last = match.end()
+    parts.append(question[last:])
+    return normalize_question("".join(parts)), tuple(parameters)
+
+
+def _sql_literal(parameter: Parameter) -> str:
+    return parameter.value if parameter.kind == "number" else parameter.value.replace("\\", "\\\\").replace("'", "\\'")
+
+
+def substitute_parameters(sql: str, old: Tuple[Parameter, ...], new: Tuple[Parameter, ...]) -> Optional[str]:
+    """
+    Rewrites `sql` for new parameter values, or returns None when that cannot be done safely:
+    the parameters differ in number or kind, a value repeats, or an old value does not appear in the
+    SQL exactly once as a standalone token (a "2" could also be the precision in `round(x, 2)`).
+    """
+    if len(old) != len(new) or any(o.kind != n.kind for o, n in zip(old, new)):
+        return None
+    if len({o.value for o in old}) != len(old):
+        return None # ambiguous which occurrence belongs to which parameter
+    replacements = {o.value: _sql_literal(n) for o, n in zip(old, new)}
+    patterns = {value: rf"(?<![\w.]){re.escape(value)}(?![\w.])" for value in replacements}
+    if any(len(re.findall(pattern, sql)) != 1 for pattern in patterns.values()):
+        return None
+    combined = re.compile("|".join(f"(?:{p})" for p in sorted(patterns.values(), key=len, reverse=True)))
+    return combined.sub(lambda m: replacements[m.group(0)], sql) # one pass, so replacements never chain
+
+
+class ExampleStore:
+    """
+    Local index of verified (question, SQL) pairs, persisted as an append-only JSON Lines file.
+
+    Examples are retrieved by TF-IDF cosine similarity over question words for few-shot prompting.
+    A question that matches an example exactly, or only differs in its dates, numbers or names,
+    reuses the example's SQL without calling the LLM. Inserts append to the file and update the
+    inverted index in place, so nothing is rebuilt.
+    """
+
+    def __init__(self, path: str, top_k: int, min_similarity: float, reuse_enabled: bool):
+        self._path = path
+        self._top_k = top_k
+        self._min_similarity = min_similarity
+        self._reuse_enabled = reuse_enabled
+        self._lock = threading.Lock()
+        self._examples: List[Optional[Example]] = []
+        self._by_question: Dict[str, int] = {}
+        self._by_template: Dict[str, Set[int]] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self._path):
+            return
+        with open(self._path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self._index(record["question"], record["sql"])
+        print(f"Loaded {len(self)} verified SQL examples from {self._path}.")
+
+    def _index(self, question: str, sql: str) -> None:
+        key = normalize_question(question)
+        if key in self._by_question: # a newer verification of the same question replaces the old SQL
+            self._unindex(self._by_question[key])
+        template, parameters = extract_parameters(question)
+        example = Example(question, sql, template, parameters, Counter(tokenize(question)))
+        example_id = len(self._examples)
+        self._examples.append(example)
+        self._by_question[key] = example_id
+        self._by_template.setdefault(template, set()).add(example_id)
+        for token in example.tokens:
+            self._postings.setdefault(token, set()).add(example_id)
+
+    def _unindex(self, example_id: int) -> None:
+        example = self._examples[example_id]
+        self._examples[example_id] = None
+        self._by_template[example.template].discard(example_id)
+        for token in example.tokens:
+            self._postings[token].discard(example_id)
+
+    def __len__(self) -> int:
+        return len(self._by_question)
+
+    def add(self, question: str, sql: str) -> None:
+        """Indexes a verified pair and appends it to the on-disk file."""
+        record = {"question": question.strip(), "sql": sql.strip(), "added_at": datetime.now().isoformat(timespec="seconds")}
+        with self._lock:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self._path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._index(record["question"], record["sql"])
+
+    def match(self, question: str, chat_history: str = "") -> Optional[Tuple[str, str]]:
+        """
+        Returns (sql, 'exact' | 'parameterized') when a verified example can be reused as is.
+        Questions relative to today ("last week", "this month") are never reused; the LLM resolves their dates.
+        Neither are questions with chat history, which may be follow-ups ("and for Dairy?") to an earlier turn.
+        """
+        if not self._reuse_enabled or chat_history.strip() or _RELATIVE_TIME_RE.search(question):
+            return None
+        template, parameters = extract_parameters(question)
+        key = normalize_question(question)
+        with self._lock:
+            candidates = [self._examples[i] for i in self._by_template.get(template, ())]
+        for example in candidates:
+            if normalize_question(example.question) == key:
+                return example.sql, "exact"
+        for example in candidates:
+            sql = substitute_parameters(example.sql, example.parameters, parameters)
+            if sql is not None:
+                return sql, "parameterized"
+        return None
+
+    def search(self, question: str, k: Optional[int] = None) -> List[Tuple[str, str]]:
+        """Returns up to `k` (question, sql) pairs most similar to `question`, best first."""
+        tokens = Counter(tokenize(question))
+        with self._lock:
+            n = len(self)
+            idf = {t: math.log(1 + n / len(self._postings[t])) for t in tokens if self._postings.get(t)}
+            candidates = set().union(*(self._postings[t] for t in idf)) if idf else set()
+            scored = []
+            query_norm = math.sqrt(sum((tf * idf.get(t, math.log(1 + n))) ** 2 for t, tf in tokens.items())) # unseen words are rarest
+            for example_id in candidates:
+                example = self._examples[example_id]
+                dot = sum(tf * idf[t] * example.tokens[t] * idf[t] for t, tf in tokens.items() if t in idf and t in example.tokens)
+                norm = math.sqrt(sum((tf * math.log(1 + n / len(self._postings[t]))) ** 2 for t, tf in example.tokens.items()))
+                similarity = dot / (query_norm * norm) if query_norm and norm else 0.0
+                if similarity >= self._min_similarity:
+                    scored.append((similarity, example_id))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [(self._examples[i].question, self._examples[i].sql) for _, i in scored[:k or self._top_k]]
+
+    @staticmethod
+    def render(examples: List[Tuple[str, str]]) -> str:
+        """Formats examples for the SQL prompt; empty when there are none."""
+        if not examples:
+            return ""
+        blocks = "\n\n".join(f"Question: {question}\nSQL: {sql}" for question, sql in examples)
+        return f"Verified examples of similar questions (adapt them to the current question, do not copy blindly):\n{blocks}\n\n"
+
+    def status(self) -> dict:
+        return {"examples": len(self), "path": self._path, "reuse_enabled": self._reuse_enabled}
+
+
+# Singleton instance
+example_store: Optional[ExampleStore] = None
+if settings.FEW_SHOT_ENABLED:
+    try:
+        example_store = ExampleStore(
+            settings.FEW_SHOT_EXAMPLES_PATH,
+            top_k=settings.FEW_SHOT_TOP_K,
+            min_similarity=settings.FEW_SHOT_MIN_SIMILARITY,
+            reuse_enabled=settings.FEW_SHOT_REUSE_ENABLED
+        )
+    except Exception as e:
+        print(f"CRITICAL ERROR loading verified SQL examples: {e}")
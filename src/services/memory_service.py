@@ -0,0 +1,104 @@
+from langchain_core.runnables import Runnable
+from typing import List, Optional, Tuple
+
+from src.core.config import settings
+from src.services.metrics import llm_config
+from src.core.llm_config import history_summary_chain
+from src.db.redis_client import SessionStore, session_store
+
+ROLE_LABELS = {"human": "Human", "ai": "AI"}
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap, provider-independent token estimate (~4 characters per token)."""
+    return (len(text) + 3) // 4
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    max_chars = max(max_tokens, 0) * 4
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + " ..."
+
+
+def _render_turns(turns: List[Tuple[str, str]]) -> str:
+    return "\n".join(f"{ROLE_LABELS.get(role, role)}: {content}" for role, content in turns)
+
+
+class ConversationMemory:
+    """
+    Builds the chat-history block for the SQL prompt from a rolling summary of older turns, the last
+    K turns verbatim and the previous turn's SQL, all under a hard token budget. Older turns are folded
+    into the summary in the background, after the response has been sent.
+    """
+
+    def __init__(self, store: SessionStore, summary_chain: Optional[Runnable], recent_turns: int,
+                 token_budget: int, summarize_after_turns: int):
+        self._store = store
+        self._summary_chain = summary_chain
+        self._recent_messages = recent_turns * 2
+        self._token_budget = token_budget
+        self._summarize_after_messages = max(summarize_after_turns, recent_turns) * 2
+
+    async def load_history(self, session_id: str) -> str:
+        messages, summary, last_sql, _ = await self._store.load_context(session_id, self._recent_messages)
+        return self.render(messages, summary, last_sql)
+
+    def render(self, messages: List[Tuple[str, str]], summary: str, last_sql: str) -> str:
+        budget = self._token_budget
+        sql_block = ""
+        if last_sql:
+            sql_block = f"Previous SQL Query:\n{_truncate_to_tokens(last_sql, budget // 3)}"
+            budget -= estimate_tokens(sql_block)
+
+        kept: List[str] = [] # newest turns win when the budget is tight
+        for role, content in reversed(messages):
+            line = f"{ROLE_LABELS.get(role, role)}: {content}"
+            if estimate_tokens(line) > budget:
+                break
+            kept.insert(0, line)
+            budget -= estimate_tokens(line)
+
+        blocks = []
+        if summary and budget > 0:
+            blocks.append(f"Conversation Summary:\n{_truncate_to_tokens(summary, budget)}")
+        if kept:
+            blocks.append("Recent Turns:\n" + "\n".join(kept))
+        if sql_block:
+            blocks.append(sql_block)
+        return "\n\n".join(blocks)
+
+    async def compact(self, session_id: str) -> None:
+        """Folds turns older than the verbatim window into the summary. Safe to call after every request."""
+        if not self._summary_chain:
+            return
+        try:
+            message_count = await self._store.message_count(session_id)
+            if message_count <= self._summarize_after_messages:
+                return
+            lock_token = await self._store.acquire_lock(session_id, ttl_seconds=60)
+            if lock_token is None:
+                return # another worker is already compacting this session
+
+            try:
+                summary = await self._store.load_summary(session_id)
+                fold_count = message_count - self._recent_messages
+                old_turns = await self._store.load_oldest(session_id, fold_count)
+                new_summary = await self._summary_chain.ainvoke({
+                    "summary": summary or "(none)",
+                    "new_turns": _render_turns(old_turns),
+                    "max_words": settings.MEMORY_SUMMARY_MAX_WORDS
+                }, config=llm_config("history_summary"))
+                await self._store.replace_oldest_with_summary(session_id, fold_count, new_summary.strip())
+            finally:
+                await self._store.release_lock(session_id, lock_token)
+        except Exception as e:
+            print(f"Warning: Could not compact conversation memory for session {session_id}: {e}")
+
+
+# Singleton instance
+conversation_memory = ConversationMemory(
+    session_store,
+    history_summary_chain,
+    recent_turns=settings.MEMORY_RECENT_TURNS,
+    token_budget=settings.MEMORY_TOKEN_BUDGET,
+    summarize_after_turns=settings.MEMORY_SUMMARIZE_AFTER_TURNS
+)
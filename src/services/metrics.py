@@ -0,0 +1,207 @@
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from src.core.config import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    """Monotonic counter with optional labels, rendered in the Prometheus text format."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels, rendered in the Prometheus text format."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {} # labels -> (bucket counts, [sum, count])
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            counts, totals = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0, 0]))
+            counts[bisect_left(self.buckets, value)] += 1
+            totals[0] += value
+            totals[1] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, (total, count)) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Holds the process-wide metrics and renders them for the /metrics endpoint.
+    Kept in-house so exposing metrics does not add a dependency; the output follows the
+    Prometheus text exposition format (version 0.0.4).
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+metrics = MetricsRegistry()
+REQUEST_SECONDS = metrics.histogram("chipchip_request_duration_seconds", "Time to produce an HTTP response (until headers for streams).", ("route", "method", "status"))
+STAGE_SECONDS = metrics.histogram("chipchip_stage_duration_seconds", "Time spent in each stage of answering a question.", ("stage",))
+LLM_CALLS = metrics.counter("chipchip_llm_calls_total", "LLM calls made, by chain.", ("chain",))
+LLM_QUEUE_SECONDS = metrics.histogram("chipchip_llm_queue_wait_seconds", "Time LLM calls waited for a concurrency slot and rate limit token, by model.", ("model",))
+LLM_SHED = metrics.counter("chipchip_llm_shed_total", "LLM calls refused because the model was overloaded, by model and reason (queue_full, queue_timeout, rate_limited).", ("model", "reason"))
+LLM_RETRIES = metrics.counter("chipchip_llm_retries_total", "LLM calls retried after a rate limit, overload or timeout error, by model.", ("model",))
+LLM_TOKENS = metrics.counter("chipchip_llm_tokens_total", "LLM tokens used, by chain and direction (input/output).", ("chain", "direction"))
+ROLLUP_QUERIES = metrics.counter("chipchip_rollup_queries_total", "Generated queries that read a pre-aggregated rollup, by rollup table.", ("rollup",))
+QUERY_GUARD_DECISIONS = metrics.counter("chipchip_query_guard_decisions_total", "Query cost checks, by outcome (ok, limited, rewritten, rejected).", ("decision",))
+ANSWERS = metrics.counter("chipchip_answers_total", "Answers produced, by source (template for trivial results, llm otherwise).", ("source",))
+CLICKHOUSE_QUERIES = metrics.counter("chipchip_clickhouse_queries_total", "Queries executed on ClickHouse (result cache hits excluded).")
+CLICKHOUSE_READ_ROWS = metrics.counter("chipchip_clickhouse_read_rows_total", "Rows read by ClickHouse, from the query summary.")
+CLICKHOUSE_READ_BYTES = metrics.counter("chipchip_clickhouse_read_bytes_total", "Bytes read by ClickHouse, from the query summary.")
+
+
+# --- Optional OpenTelemetry tracing ---
+tracer = None
+if settings.TRACING_ENABLED:
+    try:
+        from opentelemetry import trace
+        if settings.TRACING_OTLP_ENDPOINT:
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            provider = TracerProvider(resource=Resource.create({"service.name": settings.APP_NAME}))
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT)))
+            trace.set_tracer_provider(provider)
+        tracer = trace.get_tracer("chipchip")
+        print("OpenTelemetry tracing enabled.")
+    except ImportError as e:
+        print(f"Warning: TRACING_ENABLED is set but OpenTelemetry is not installed ({e}). Tracing is disabled.")
+
+
+def record_stage(timings_ms: Optional[Dict[str, float]], stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    if timings_ms is not None:
+        timings_ms[stage] = round(timings_ms.get(stage, 0.0) + seconds * 1000, 1)
+
+
+@contextmanager
+def track_stage(timings_ms: Optional[Dict[str, float]], stage: str) -> Iterator[None]:
+    """
+    Times a pipeline stage: adds its duration to `timings_ms` (the request's debug breakdown),
+    observes the stage histogram and, when tracing is enabled, wraps it in a span.
+    """
+    span = tracer.start_as_current_span(f"chipchip.{stage}") if tracer else nullcontext()
+    started_at = time.perf_counter()
+    with span:
+        try:
+            yield
+        finally:
+            record_stage(timings_ms, stage, time.perf_counter() - started_at)
+
+
+class TokenUsageHandler(BaseCallbackHandler):
+    """Counts the tokens an LLM call reports in its usage metadata, per chain."""
+
+    run_inline = True # cheap bookkeeping; no need for a thread hop under async calls
+
+    def __init__(self, chain: str, usage: Optional[Dict[str, Dict[str, int]]] = None):
+        self.chain = chain
+        self.usage = usage
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        LLM_CALLS.inc(chain=self.chain)
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage_metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                input_tokens += usage_metadata.get("input_tokens", 0)
+                output_tokens += usage_metadata.get("output_tokens", 0)
+        LLM_TOKENS.inc(input_tokens, chain=self.chain, direction="input")
+        LLM_TOKENS.inc(output_tokens, chain=self.chain, direction="output")
+        if self.usage is not None:
+            chain_usage = self.usage.setdefault(self.chain, {"input": 0, "output": 0})
+            chain_usage["input"] += input_tokens
+            chain_usage["output"] += output_tokens
+
+
+def llm_config(chain: str, usage: Optional[Dict[str, Dict[str, int]]] = None) -> dict:
+    """Runnable config that records token usage for `chain`."""
+    return {"callbacks": [TokenUsageHandler(chain, usage)], "run_name": chain}
+
+
+def record_query_stats(read_rows: int, read_bytes: int) -> None:
+    CLICKHOUSE_QUERIES.inc()
+    CLICKHOUSE_READ_ROWS.inc(read_rows)
+    CLICKHOUSE_READ_BYTES.inc(read_bytes)
@@ -0,0 +1,160 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import re
+import threading
+import time
+
+from src.core.config import settings
+from src.db.clickhouse_client import ClickHouseExecutor, clickhouse_executor
+
+# Plan steps that need the whole input before returning a row; without them the LIMIT ends the scan early
+BLOCKING_STEPS = re.compile(r"\b(Aggregating|MergingAggregated|Sorting|Join|Distinct|Window|CreatingSets?|Filling|TotalsHaving)\b")
+READ_STEP = re.compile(r"ReadFromMergeTree \((?:`?\w+`?\.)?`?(\w+)`?\)")
+CROSS_JOIN = re.compile(r"Type:\s*cross\b", re.IGNORECASE)
+
+
+class QueryBudgetExceeded(ValueError):
+    """Raised when generated SQL is estimated to read more than the configured budgets allow."""
+
+
+@dataclass
+class QueryEstimate:
+    rows: int = 0
+    marks: int = 0
+    parts: int = 0
+    bytes: int = 0 # uncompressed bytes of the columns read, an upper bound
+    cross_join_rows: int = 0 # rows a CROSS JOIN would produce, 0 when there is none
+    streaming: bool = False # no blocking step, so the row limit stops the read early
+    tables: Dict[str, Dict[str, int]] = field(default_factory=dict)
+
+
+class QueryGuard:
+    """
+    Estimates what a query will read before it runs, with EXPLAIN ESTIMATE (parts, rows and marks
+    selected per table after primary key, partition and skip index pruning) and EXPLAIN PLAN (which
+    columns are read, whether there is a cross join, whether anything blocks the LIMIT). Bytes come
+    from the per-column sizes in system.columns, refreshed every `stats_refresh_seconds`.
+    """
+
+    ESTIMATE_QUERY = "EXPLAIN ESTIMATE {sql}"
+    PLAN_QUERY = "EXPLAIN PLAN actions = 1 {sql}"
+    COLUMN_BYTES_QUERY = (
+        "SELECT c.table, c.name, c.data_uncompressed_bytes, p.bytes, p.rows "
+        "FROM system.columns AS c INNER JOIN ("
+        "SELECT table, sum(data_uncompressed_bytes) AS bytes, sum(rows) AS rows FROM system.parts "
+        "WHERE database = currentDatabase() AND active GROUP BY table"
+        ") AS p ON c.table = p.table "
+        "WHERE c.database = currentDatabase() AND p.rows > 0"
+    )
+
+    def __init__(self, executor: ClickHouseExecutor, max_rows: int, max_marks: int, max_bytes: int,
+                 max_cross_join_rows: int, stats_refresh_seconds: int):
+        self._executor = executor
+        self.max_rows = max_rows
+        self.max_marks = max_marks
+        self.max_bytes = max_bytes
+        self.max_cross_join_rows = max_cross_join_rows
+        self._stats_refresh_seconds = stats_refresh_seconds
+        self._lock = threading.Lock()
+        self._column_bytes: Dict[str, Dict[str, float]] = {}
+        self._stats_loaded_at: Optional[float] = None
+
+    def _bytes_per_row(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            now = time.monotonic()
+            if self._stats_loaded_at is None or now - self._stats_loaded_at >= self._stats_refresh_seconds:
+                self._stats_loaded_at = now
+                try:
+                    sizes = self._executor.query_df(self.COLUMN_BYTES_QUERY)
+                    column_bytes: Dict[str, Dict[str, float]] = {}
+                    for table, columns in sizes.groupby(sizes.columns[0]):
+                        names, column_sizes = columns.iloc[:, 1], columns.iloc[:, 2].astype(float)
+                        table_bytes, table_rows = float(columns.iloc[0, 3]), float(columns.iloc[0, 4])
+                        if not column_sizes.sum(): # compact parts store all columns in one file, so split the row evenly
+                            column_sizes = column_sizes * 0 + table_bytes / len(columns)
+                        column_bytes[str(table)] = dict(zip(names.astype(str), column_sizes / table_rows))
+                    self._column_bytes = column_bytes
+                except Exception as e:
+                    print(f"Warning: Could not read column sizes for query estimates: {e}")
+            return self._column_bytes
+
+    @staticmethod
+    def _columns_read(plan: str) -> Dict[str, List[str]]:
+        """Columns each ReadFromMergeTree step outputs, when the server prints them."""
+        columns: Dict[str, List[str]] = {}
+        lines = plan.splitlines()
+        for i, line in enumerate(lines):
+            match = READ_STEP.search(line)
+            if not match:
+                continue
+            for detail in lines[i + 1:]:
+                if READ_STEP.search(detail) or re.search(r"[└├]──", detail):
+                    break # next step
+                output = re.search(r"(?:Output|Header):\s*(.+)", detail)
+                if output:
+                    names = [c.strip().split(" ")[0] for c in output.group(1).split(",")]
+                    columns.setdefault(match.group(1), []).extend(n.split(".")[-1] for n in names if n)
+                    break
+        return columns
+
+    def estimate(self, sql: str) -> Optional[QueryEstimate]:
+        """Estimate for `sql`, or None when ClickHouse cannot explain it (it will fail at execution instead). Blocking."""
+        try:
+            per_table = self._executor.query_df(self.ESTIMATE_QUERY.format(sql=sql))
+            plan = "\n".join(self._executor.query_df(self.PLAN_QUERY.format(sql=sql)).iloc[:, 0].astype(str))
+        except Exception as e:
+            print(f"Warning: Could not estimate query cost: {e}")
+            return None
+
+        recognized = bool(READ_STEP.search(plan))
+        if len(per_table) and not recognized: # never let an unfamiliar plan format pass as a query the LIMIT stops early
+            print("Warning: EXPLAIN PLAN output has no ReadFromMergeTree step; treating the query as blocking.")
+        estimate = QueryEstimate(streaming=recognized and not BLOCKING_STEPS.search(plan))
+        columns_read = self._columns_read(plan)
+        bytes_per_row = self._bytes_per_row()
+        for row in per_table.itertuples(index=False):
+            table, rows, marks, parts = str(row.table), int(row.rows), int(row.marks), int(row.parts)
+            table_estimate = estimate.tables.setdefault(table, {"rows": 0, "marks": 0, "parts": 0})
+            table_estimate["rows"] += rows
+            table_estimate["marks"] += marks
+            table_estimate["parts"] += parts
+            estimate.rows += rows
+            estimate.marks += marks
+            estimate.parts += parts
+            widths = bytes_per_row.get(table, {})
+            read = [c for c in columns_read.get(table, []) if c in widths] or list(widths)
+            estimate.bytes += int(rows * sum(widths[c] for c in read))
+        if CROSS_JOIN.search(plan):
+            estimate.cross_join_rows = 1
+            for table_estimate in estimate.tables.values():
+                estimate.cross_join_rows *= max(table_estimate["rows"], 1)
+        return estimate
+
+    def violations(self, estimate: QueryEstimate) -> List[str]:
+        """The budgets `estimate` exceeds, as readable sentences (empty when it fits)."""
+        checks = [
+            ("rows to read", estimate.rows, self.max_rows),
+            ("marks (granules) to read", estimate.marks, self.max_marks),
+            ("bytes to read", estimate.bytes, self.max_bytes),
+            ("rows produced by the CROSS JOIN", estimate.cross_join_rows, self.max_cross_join_rows),
+        ]
+        return [f"estimated {what}: {value:,} (budget {budget:,})" for what, value, budget in checks if value > budget]
+
+    @staticmethod
+    def render_feedback(estimate: QueryEstimate, violations: List[str]) -> str:
+        """Describes an over-budget estimate for the SQL rewrite prompt."""
+        tables = ", ".join(f"{t}: {e['rows']:,} rows in {e['marks']:,} marks" for t, e in estimate.tables.items())
+        return f"{'; '.join(violations)}. Per table: {tables}."
+
+
+# Singleton instance
+query_guard: Optional[QueryGuard] = None
+if settings.QUERY_GUARD_ENABLED and clickhouse_executor:
+    query_guard = QueryGuard(
+        clickhouse_executor,
+        max_rows=settings.QUERY_GUARD_MAX_ROWS,
+        max_marks=settings.QUERY_GUARD_MAX_MARKS,
+        max_bytes=settings.QUERY_GUARD_MAX_BYTES,
+        max_cross_join_rows=settings.QUERY_GUARD_MAX_CROSS_JOIN_ROWS,
+        stats_refresh_seconds=settings.QUERY_GUARD_STATS_REFRESH_SECONDS
+    )
@@ -0,0 +1,133 @@
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Optional, Tuple
+import pandas as pd
+import asyncio
+import re
+import threading
+import time
+
+from src.core.config import settings
+from src.db.clickhouse_client import ClickHouseExecutor, QueryStats, clickhouse_executor
+
+# Quoted literals are matched first so that `--` or `/*` inside them is left alone
+_COMMENT_RE = re.compile(r"(?P<quoted>'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`)|--[^\n]*|/\*.*?\*/", re.DOTALL)
+_TOKEN_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`|\s+|[^'\"`\s]+")
+# Functions whose result changes without any new data parts: the clock and random values
+_NON_DETERMINISTIC_RE = re.compile(
+    r"\b(?:now|now64|nowInBlock|today|yesterday|rand\w*|generateUUIDv\d|generateULID|generateSnowflakeID)\s*\(", re.IGNORECASE
+)
+
+
+def canonicalize_sql(sql: str) -> str:
+    """Strips comments, trailing semicolons and redundant whitespace outside of quoted literals."""
+    sql = _COMMENT_RE.sub(lambda m: m.group("quoted") or " ", sql)
+    tokens = [" " if token.isspace() else token for token in _TOKEN_RE.findall(sql)]
+    return "".join(tokens).strip().rstrip(";").strip()
+
+
+def is_deterministic(sql: str) -> bool:
+    """Whether the result can only change when the data does: no `now()`, `today()` or `rand()` outside of literals."""
+    code = " ".join(token for token in _TOKEN_RE.findall(canonicalize_sql(sql)) if token[0] not in "'\"`")
+    return not _NON_DETERMINISTIC_RE.search(code)
+
+
+def referenced_tables(sql: str) -> FrozenSet[str]:
+    """Returns the PoC and rollup tables a query reads from."""
+    return frozenset(t for t in settings.POC_TABLE_NAMES + settings.ROLLUP_TABLE_NAMES if re.search(rf"\b{re.escape(t)}\b", sql))
+
+
+class QueryResultCache:
+    """
+    In-process LRU cache of query result frames keyed by canonicalized SQL.
+    Each entry remembers the part-level version of every table it read from, and is discarded
+    as soon as ClickHouse reports new parts or mutations for any of them. Total size is bounded
+    by `max_bytes` of DataFrame memory.
+    """
+
+    def __init__(self, executor: ClickHouseExecutor, max_bytes: int, freshness_check_seconds: float):
+        self._executor = executor
+        self._max_bytes = max_bytes
+        self._freshness_check_seconds = freshness_check_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[pd.DataFrame, Dict[str, str], int]]" = OrderedDict()
+        self._size_bytes = 0
+        self._versions: Dict[str, str] = {}
+        self._versions_checked_at: Dict[str, float] = {}
+
+    def _current_versions(self, tables: FrozenSet[str]) -> Dict[str, str]:
+        now = time.monotonic()
+        stale = [t for t in tables if now - self._versions_checked_at.get(t, 0.0) >= self._freshness_check_seconds]
+        if stale:
+            fresh = self._executor.table_versions(stale)
+            with self._lock:
+                for table in stale:
+                    self._versions[table] = fresh.get(table, "") # tables without parts are empty
+                    self._versions_checked_at[table] = now
+        return {t: self._versions[t] for t in tables}
+
+    def _evict(self) -> None:
+        while self._size_bytes > self._max_bytes and self._entries:
+            _, (_, _, size) = self._entries.popitem(last=False)
+            self._size_bytes -= size
+
+    def _lookup(self, key: str, versions: Dict[str, str]) -> Optional[pd.DataFrame]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] == versions:
+                self._entries.move_to_end(key)
+                return entry[0].copy(deep=False)
+            del self._entries[key]
+            self._size_bytes -= entry[2]
+            return None
+
+    def _store(self, key: str, df: pd.DataFrame, versions: Dict[str, str]) -> None:
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self._max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size_bytes -= self._entries.pop(key)[2]
+            self._entries[key] = (df, versions, size)
+            self._size_bytes += size
+            self._evict()
+
+    async def get_or_execute(self, sql: str) -> Tuple[pd.DataFrame, bool, Optional[QueryStats]]:
+        """
+        Returns (result, cache_hit, stats); stats is None on a hit.
+        Queries that touch no PoC table, or that read the clock or random values, are never cached.
+        """
+        tables = referenced_tables(sql)
+        if not tables or not is_deterministic(sql):
+            df, stats = await self._executor.execute(sql)
+            return df, False, stats
+
+        key = canonicalize_sql(sql)
+        loop = asyncio.get_running_loop()
+        versions = await loop.run_in_executor(None, self._current_versions, tables)
+        cached = self._lookup(key, versions)
+        if cached is not None:
+            return cached, True, None
+
+        df, stats = await self._executor.execute(sql)
+        self._store(key, df, versions)
+        return df.copy(deep=False), False, stats
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size_bytes = 0
+
+    def status(self) -> dict:
+        return {"entries": len(self._entries), "size_bytes": self._size_bytes, "max_bytes": self._max_bytes}
+
+
+# Singleton instance
+query_result_cache: Optional[QueryResultCache] = None
+if settings.RESULT_CACHE_ENABLED and clickhouse_executor:
+    query_result_cache = QueryResultCache(
+        clickhouse_executor,
+        max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+        freshness_check_seconds=settings.RESULT_CACHE_FRESHNESS_CHECK_SECONDS
+    )
@@ -0,0 +1,138 @@
+import redis.asyncio as redis
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+import asyncio
+import json
+import re
+import uuid
+
+from src.core.config import settings
+from src.db.redis_client import redis_client
+from src.services.result_cache import canonicalize_sql
+from src.services.serialization import json_safe_rows
+
+
+# Quoted literals and identifiers, parentheses and commas, and everything else up to whitespace
+_SQL_TOKEN_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`|[(),]|[^'\"`\s(),]+")
+# The final LIMIT of a single SELECT: `LIMIT n`, `LIMIT n OFFSET m` or `LIMIT m, n`, optionally WITH TIES
+_FINAL_LIMIT_RE = re.compile(
+    r"\bLIMIT\s+(?:(?P<offset>\d+)\s*,\s*)?(?P<count>\d+)(?P<rest>(?:\s+OFFSET\s+\d+)?)(?:\s+WITH\s+TIES)?$", re.IGNORECASE
+)
+
+
+def _top_level_tokens(sql: str) -> List[Tuple[int, str]]:
+    """(offset, upper-cased token) for every token outside parentheses."""
+    tokens, depth = [], 0
+    for match in _SQL_TOKEN_RE.finditer(sql):
+        token = match.group()
+        if token == ")":
+            depth -= 1
+        elif depth == 0:
+            tokens.append((match.start(), token.upper()))
+        if token == "(":
+            depth += 1
+    return tokens
+
+
+def apply_row_limit(sql: str, max_rows: int) -> str:
+    """
+    Caps generated SQL so ClickHouse never returns more than `max_rows` rows, whatever the LLM wrote.
+    A single SELECT gets a top-level LIMIT (an existing one is lowered to `max_rows` if larger), so its
+    ORDER BY still decides which rows are kept; WITH TIES is dropped, since it can return any number of rows.
+    Set operations (UNION, INTERSECT, EXCEPT), parenthesized queries and OFFSET/FETCH clauses are wrapped
+    in `SELECT * FROM (...) LIMIT n` instead. Trailing SETTINGS are kept; a FORMAT clause is dropped,
+    since the client picks the wire format.
+    """
+    max_rows = int(max_rows)
+    sql = canonicalize_sql(sql)
+    tokens = _top_level_tokens(sql)
+    clause_starts = [i for i, (_, token) in enumerate(tokens) if token in ("SETTINGS", "FORMAT")]
+    body, settings_clause = sql, ""
+    if clause_starts:
+        body = sql[:tokens[clause_starts[0]][0]].strip()
+        for n, i in enumerate(clause_starts):
+            end = tokens[clause_starts[n + 1]][0] if n + 1 < len(clause_starts) else len(sql)
+            if tokens[i][1] == "SETTINGS":
+                settings_clause = " " + sql[tokens[i][0]:end].strip()
+        tokens = tokens[:clause_starts[0]]
+
+    words = [token for _, token in tokens]
+    set_operation = any(
+        word in ("UNION", "INTERSECT")
+        or (word == "EXCEPT" and words[i - 1:i] != ["*"] and words[i + 1:i + 2] in (["SELECT"], ["ALL"], ["DISTINCT"], ["("])) # not `* EXCEPT (col)`
+        for i, word in enumerate(words)
+    )
+    limit = _FINAL_LIMIT_RE.search(body)
+    if set_operation or words[:1] == ["("] or "FETCH" in words or (not limit and "OFFSET" in words[-2:]):
+        return f"SELECT * FROM (\n{body}\n) LIMIT {max_rows}{settings_clause}"
+    if limit:
+        count = min(int(limit.group("count")), max_rows)
+        offset = f"{limit.group('offset')}, " if limit.group("offset") else ""
+        return f"{body[:limit.start()]}LIMIT {offset}{count}{limit.group('rest')}{settings_clause}"
+    return f"{body}\nLIMIT {max_rows}{settings_clause}"
+
+
+class ResultStore:
+    """
+    Parks full query results in Redis under a result id so they can be paged through by any worker
+    while responses only carry the first rows. Rows are stored as JSON chunks in a list, so a page
+    read only touches the chunks it needs.
+    """
+
+    KEY_PREFIX = "result:"
+    CHUNK_ROWS = 1000
+
+    def __init__(self, client: redis.Redis, ttl_seconds: int):
+        self._client = client
+        self._ttl_seconds = ttl_seconds
+
+    def _serialize(self, df: pd.DataFrame, truncated: bool) -> tuple:
+        meta = json.dumps({"columns": [str(c) for c in df.columns], "row_count": len(df), "truncated": truncated})
+        rows = json_safe_rows(df)
+        chunks = [json.dumps(rows[i:i + self.CHUNK_ROWS], default=str) for i in range(0, len(rows), self.CHUNK_ROWS)]
+        return meta, chunks
+
+    async def park(self, df: pd.DataFrame, truncated: bool) -> str:
+        """Stores the result and returns its id."""
+        loop = asyncio.get_running_loop()
+        meta, chunks = await loop.run_in_executor(None, self._serialize, df, truncated) # keep JSON encoding off the event loop
+
+        result_id = uuid.uuid4().hex
+        meta_key, chunks_key = f"{self.KEY_PREFIX}{result_id}:meta", f"{self.KEY_PREFIX}{result_id}:chunks"
+        async with self._client.pipeline(transaction=False) as pipe:
+            pipe.set(meta_key, meta, ex=self._ttl_seconds)
+            if chunks:
+                pipe.rpush(chunks_key, *chunks)
+                pipe.expire(chunks_key, self._ttl_seconds)
+            await pipe.execute()
+        return result_id
+
+    async def get_page(self, result_id: str, offset: int, limit: int) -> Optional[Dict[str, Any]]:
+        """Returns one page of a parked result, or None if it expired or never existed."""
+        meta_raw = await self._client.get(f"{self.KEY_PREFIX}{result_id}:meta")
+        if meta_raw is None:
+            return None
+        meta = json.loads(meta_raw)
+
+        rows: List[list] = []
+        end = min(offset + limit, meta["row_count"])
+        if offset < end:
+            first_chunk, last_chunk = offset // self.CHUNK_ROWS, (end - 1) // self.CHUNK_ROWS
+            raw_chunks = await self._client.lrange(f"{self.KEY_PREFIX}{result_id}:chunks", first_chunk, last_chunk)
+            chunk_rows = [row for raw in raw_chunks for row in json.loads(raw)]
+            start = offset - first_chunk * self.CHUNK_ROWS
+            rows = chunk_rows[start:start + (end - offset)]
+
+        return {
+            "result_id": result_id,
+            "offset": offset,
+            "limit": limit,
+            "row_count": meta["row_count"],
+            "truncated": meta["truncated"],
+            "columns": meta["columns"],
+            "rows": [dict(zip(meta["columns"], row)) for row in rows]
+        }
+
+
+# Singleton instance
+result_store = ResultStore(redis_client, ttl_seconds=settings.RESULT_STORE_TTL_SECONDS)
@@ -0,0 +1,98 @@
+from typing import List
+import numpy as np
+import pandas as pd
+
+from src.services.chart_rules import has_unhashable_values, is_numeric_column, is_time_column
+from src.services.memory_service import estimate_tokens
+
+NO_DATA = "Query returned no data."
+
+
+def _number(value: float) -> str:
+    if pd.isna(value):
+        return "null"
+    return f"{value:,.0f}" if float(value).is_integer() else f"{value:,.2f}"
+
+
+def _csv(df: pd.DataFrame) -> str:
+    return df.to_csv(index=False, float_format="%.6g").strip()
+
+
+def _as_text(value) -> str:
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    return str(value)
+
+
+def _sample_positions(row_count: int, size: int) -> np.ndarray:
+    """Evenly spaced row positions, always including the first and last row, so trends and the tail show up."""
+    return np.unique(np.linspace(0, row_count - 1, num=min(size, row_count)).round().astype(int))
+
+
+def _column_lines(df: pd.DataFrame, top_k: int) -> List[str]:
+    """One line per column: its kind and statistics over every row."""
+    numeric = [c for c in df.columns if is_numeric_column(df[c]) and not is_time_column(df[c], str(c))]
+    stats = pd.DataFrame()
+    if numeric: # one vectorized pass over all numeric columns; Decimal columns arrive as object dtype
+        stats = df[numeric].astype("float64").agg(["sum", "min", "max", "mean"])
+    null_counts = df.isna().sum()
+
+    lines = []
+    for name in df.columns:
+        series = df[name]
+        if has_unhashable_values(series): # Array/Map cells: count them by their text so nunique/value_counts work
+            series = series.map(_as_text, na_action="ignore")
+        nulls = f", {int(null_counts[name]):,} nulls" if null_counts[name] else ""
+        if name in numeric:
+            s = stats[name]
+            lines.append(f"- {name} (number): sum {_number(s['sum'])}, min {_number(s['min'])}, "
+                         f"max {_number(s['max'])}, mean {_number(s['mean'])}{nulls}")
+        elif is_time_column(series, str(name)):
+            present = series.dropna()
+            span = f"{present.min()} to {present.max()}" if not present.empty else "no values"
+            lines.append(f"- {name} (time): {span}, {series.nunique():,} distinct{nulls}")
+        else:
+            distinct = series.nunique()
+            line = f"- {name} (text): {distinct:,} distinct{nulls}"
+            if distinct < len(series): # repeated labels: say which dominate
+                counts = series.value_counts().head(top_k)
+                line += "; most frequent: " + ", ".join(f"{value} ({count:,})" for value, count in counts.items())
+            lines.append(line)
+    return lines
+
+
+def summarize_result(df: pd.DataFrame, token_budget: int, sample_rows: int, top_k: int, truncated: bool = False) -> str:
+    """
+    Compact description of a query result for the answer and chart prompts, within `token_budget`
+    (estimated) tokens. Results of up to `sample_rows` rows are passed whole as CSV; larger ones are
+    described by their columns, with totals, ranges and most frequent values computed over all rows,
+    plus an evenly spaced sample of rows.
+    """
+    if df.empty:
+        return NO_DATA
+    row_count = f"{len(df):,} rows" + (" (cut off at the row limit; statistics cover these rows only)" if truncated else "")
+    if len(df) <= sample_rows:
+        full = f"{row_count}:\n{_csv(df)}"
+        if estimate_tokens(full) <= token_budget:
+            return full
+
+    header = f"{row_count}, {len(df.columns)} columns. Statistics over all rows:"
+    budget = token_budget - estimate_tokens(header)
+    kept_lines = []
+    column_lines = _column_lines(df, top_k)
+    for i, line in enumerate(column_lines):
+        if estimate_tokens(line) > budget:
+            kept_lines.append(f"- ... {len(column_lines) - i} more columns")
+            break
+        kept_lines.append(line)
+        budget -= estimate_tokens(line)
+    summary = "\n".join([header, *kept_lines])
+
+    size = sample_rows
+    while size > 0: # shrink the sample until it fits in what is left of the budget
+        positions = _sample_positions(len(df), size)
+        sample = f"Sample of {len(positions)} rows spread across the result:\n{_csv(df.iloc[positions])}"
+        if estimate_tokens(sample) <= budget:
+            return f"{summary}\n{sample}"
+        size //= 2
+    return summary
@@ -0,0 +1,120 @@
+from typing import FrozenSet, List, NamedTuple, Optional
+import threading
+import time
+
+from src.core.config import settings
+from src.db.clickhouse_client import ClickHouseExecutor, clickhouse_executor
+from src.services.table_selector import tokenize
+
+
+class Rollup(NamedTuple):
+    table: str
+    grain: str
+    measures: str
+    example: str
+    measure_terms: FrozenSet[str] # the question must mention one of these ...
+    grain_terms: FrozenSet[str] # ... and one of these (after `tokenize`)
+
+
+# Mirrors data/create_rollups_poc.sql.
+ROLLUPS: List[Rollup] = [
+    Rollup(
+        table="sales_by_category_month_rollup",
+        grain="one row per (month, category_name, product_id, product_name); month is the first day of the order month",
+        measures="units, revenue (quantity * price_per_unit) and order_items are summed with sum(); distinct orders with uniqExactMerge(orders)",
+        example="SELECT month, category_name, sum(revenue) AS revenue FROM sales_by_category_month_rollup GROUP BY month, category_name ORDER BY month, revenue DESC",
+        measure_terms=frozenset(tokenize("sales revenue sold selling units quantity spend orders")),
+        grain_terms=frozenset(tokenize("category categories product products item items month monthly")),
+    ),
+    Rollup(
+        table="orders_by_channel_day_rollup",
+        grain="one row per (day, acquisition_channel, payment_method, order_status)",
+        measures="orders, revenue and units are summed with sum(); distinct ordering users with uniqExactMerge(customers)",
+        example="SELECT acquisition_channel, sum(orders) AS orders, sum(revenue) AS revenue FROM orders_by_channel_day_rollup GROUP BY acquisition_channel ORDER BY orders DESC",
+        measure_terms=frozenset(tokenize("orders sales revenue customers aov average spend purchases")),
+        grain_terms=frozenset(tokenize("channel channels acquisition campaign payment method status daily day days week weekly")),
+    ),
+    Rollup(
+        table="group_deal_conversion_rollup",
+        grain="one row per (month, group_deal_id, product_id, group_status); month is the first day of the month the group was started",
+        measures="groups (groups started), members (members who joined) and converted_members (members whose participation led to an order) are summed with sum()",
+        example="SELECT group_status, sum(groups) AS groups, sum(converted_members) / sum(members) AS conversion_rate FROM group_deal_conversion_rollup GROUP BY group_status",
+        measure_terms=frozenset(tokenize("conversion converted convert rate members participants groups completed failed success")),
+        grain_terms=frozenset(tokenize("group deal deals buy buys")),
+    ),
+    Rollup(
+        table="user_retention_rollup",
+        grain="one row per (cohort_month, activity_month, registration_channel, customer_segment); cohort_month is the registration month, activity_month the order month",
+        measures="distinct ordering users with uniqExactMerge(active_users); orders with sum()",
+        example="SELECT cohort_month, activity_month, uniqExactMerge(active_users) AS active_users FROM user_retention_rollup GROUP BY cohort_month, activity_month ORDER BY cohort_month, activity_month",
+        measure_terms=frozenset(tokenize("retention retained retain returning repeat churn cohort cohorts active")),
+        grain_terms=frozenset(tokenize("users customers registered registration signup cohort cohorts month monthly new")),
+    ),
+]
+
+
+class RollupRouter:
+    """
+    Points the SQL generator at the pre-aggregated rollups from data/create_rollups_poc.sql.
+
+    A rollup is offered when the question mentions one of its measures and one of its grouping
+    dimensions, and only if its table exists (checked against system.tables, like the schema cache).
+    The prompt block explains the grain and how to read each measure so the LLM only uses a rollup
+    when the question's filters and groupings are available at that grain.
+    """
+
+    EXISTING_QUERY = "SELECT name FROM system.tables WHERE database = currentDatabase() AND name IN ({table_names})"
+
+    def __init__(self, executor: ClickHouseExecutor, rollups: List[Rollup], max_hints: int, check_interval_seconds: int):
+        self._executor = executor
+        self._rollups = rollups
+        self._max_hints = max_hints
+        self._check_interval_seconds = check_interval_seconds
+        self._lock = threading.Lock()
+        self._available: FrozenSet[str] = frozenset()
+        self._checked_at: Optional[float] = None
+
+    def _available_tables(self) -> FrozenSet[str]:
+        with self._lock:
+            now = time.monotonic()
+            if self._checked_at is None or now - self._checked_at >= self._check_interval_seconds:
+                self._checked_at = now
+                table_names = ", ".join(f"'{r.table}'" for r in self._rollups)
+                try:
+                    self._available = frozenset(self._executor.query_df(self.EXISTING_QUERY.format(table_names=table_names))["name"])
+                except Exception as e:
+                    print(f"Warning: Could not check which rollup tables exist: {e}")
+            return self._available
+
+    def route(self, question: str) -> List[Rollup]:
+        """Rollups whose measures and grain the question mentions, at most `max_hints`. Blocking."""
+        terms = set(tokenize(question))
+        matches = [r for r in self._rollups if terms & r.measure_terms and terms & r.grain_terms]
+        if not matches:
+            return []
+        available = self._available_tables()
+        return [r for r in matches if r.table in available][:self._max_hints]
+
+    @staticmethod
+    def render(rollups: List[Rollup]) -> str:
+        """Formats rollups for the SQL prompt; empty when there are none."""
+        if not rollups:
+            return ""
+        blocks = "\n".join(f"- {r.table}: {r.grain}. Measures: {r.measures}.\n  Example: {r.example}" for r in rollups)
+        return (
+            "Pre-aggregated rollup tables you may also use (they answer in milliseconds instead of joining the base tables):\n"
+            f"{blocks}\n"
+            "Use a rollup only when every filter and grouping the question needs exists at its grain; otherwise query the base tables. "
+            "Rollup rows are merged in the background, so always aggregate them (sum(), or uniqExactMerge() for distinct counts) with GROUP BY.\n\n"
+        )
+
+
+# Singleton instance
+rollup_router: Optional[RollupRouter] = None
+if settings.ROLLUPS_ENABLED and clickhouse_executor:
+    rollup_router = RollupRouter(
+        clickhouse_executor,
+        ROLLUPS,
+        max_hints=settings.ROLLUP_MAX_HINTS,
+        check_interval_seconds=settings.SCHEMA_CHANGE_CHECK_INTERVAL_SECONDS
+    )
@@ -0,0 +1,43 @@
+from decimal import Decimal
+from typing import Any, Dict, List
+import numpy as np
+import pandas as pd
+
+
+def _is_decimal_column(series: pd.Series) -> bool:
+    first_valid = series.first_valid_index()
+    return first_valid is not None and isinstance(series[first_valid], Decimal)
+
+
+def json_safe_values(series: pd.Series) -> list:
+    """
+    Converts a typed result column (Decimal, DateTime, nullable) into JSON-friendly values.
+    Each column is converted with one vectorized NumPy pass instead of inspecting every cell.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        if getattr(series.dt, "tz", None) is not None:
+            series = series.dt.tz_localize(None)
+        values = np.datetime_as_string(series.to_numpy(dtype="datetime64[us]"), unit="s").astype(object)
+        values[series.isna().to_numpy()] = None
+        return values.tolist()
+
+    if pd.api.types.is_bool_dtype(series.dtype) or not (pd.api.types.is_numeric_dtype(series.dtype) or _is_decimal_column(series)):
+        return series.astype(object).where(series.notna(), None).tolist()
+
+    if pd.api.types.is_integer_dtype(series.dtype) and not series.hasnans:
+        return series.to_numpy().tolist()
+    values = pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64", na_value=np.nan) # Decimal -> float once per column
+    result = values.astype(object)
+    result[np.isnan(values)] = None
+    return result.tolist()
+
+
+def json_safe_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Converts a frame to JSON-friendly records, converting each column once rather than each cell."""
+    columns = {str(col): json_safe_values(df[col]) for col in df.columns}
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+
+def json_safe_rows(df: pd.DataFrame) -> List[list]:
+    """Like `json_safe_records` but returns positional rows, which are more compact for storage."""
+    return [list(row) for row in zip(*(json_safe_values(df[col]) for col in df.columns))]
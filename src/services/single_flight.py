@@ -0,0 +1,127 @@
+import redis.asyncio as redis
+from typing import Awaitable, Callable, Dict, Generic, Optional, Tuple, TypeVar
+import asyncio
+import uuid
+
+from src.core.config import settings
+from src.db.redis_client import redis_client, release_lock
+from src.services.sql_cache import SQLGenerationCache
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """
+    Collapses concurrent executions of the same unit of work into one.
+
+    Within a worker, callers with the same key await a single shared task. Across workers, the
+    task first takes a Redis lock for the key: the worker holding it runs the work and publishes the
+    encoded result under a short-lived key, the others poll for that result instead of running the
+    work themselves. A failed leader publishes nothing, so one of the waiting workers takes the lock
+    and retries. When Redis is unavailable, every worker runs its own work.
+    """
+
+    LOCK_PREFIX = "singleflight:lock:"
+    RESULT_PREFIX = "singleflight:result:"
+
+    def __init__(self, client: Optional[redis.Redis], lock_ttl_seconds: int, result_ttl_seconds: int,
+                 wait_seconds: float, poll_interval_seconds: float):
+        self._client = client
+        self._lock_ttl_seconds = lock_ttl_seconds
+        self._result_ttl_seconds = result_ttl_seconds
+        self._wait_seconds = wait_seconds
+        self._poll_interval_seconds = poll_interval_seconds
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+
+    make_key = staticmethod(SQLGenerationCache.make_key) # same question, schema, day and chat history
+
+    async def do(self, key: str, work: Callable[[], Awaitable[T]], encode: Callable[[T], str],
+                 decode: Callable[[str], T]) -> Tuple[T, Optional[str]]:
+        """
+        Returns (value, coalesced): `coalesced` is None for the caller whose work ran, 'local' when
+        the value came from another request in this worker and 'remote' when it came from another worker.
+        The shared work is only cancelled once every caller waiting on it has been cancelled.
+        """
+        task = self._inflight.get(key)
+        leader = task is None
+        if leader:
+            task = asyncio.create_task(self._execute(key, work, encode, decode))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            value, coalesced = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters.get(key) == 1 and not task.done():
+                task.cancel() # nobody is left to receive the result
+            raise
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+        return value, coalesced if leader else "local"
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    async def _execute(self, key: str, work: Callable[[], Awaitable[T]], encode: Callable[[T], str],
+                       decode: Callable[[str], T]) -> Tuple[T, Optional[str]]:
+        if self._client is None:
+            return await work(), None
+        lock_key, result_key = f"{self.LOCK_PREFIX}{key}", f"{self.RESULT_PREFIX}{key}"
+        token = uuid.uuid4().hex
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._wait_seconds
+        waited = False
+        while True:
+            try:
+                if await self._client.set(lock_key, token, nx=True, ex=self._lock_ttl_seconds):
+                    # a leader may have published and released between our polls; results of work that
+                    # finished before we arrived are never reused
+                    encoded = await self._client.get(result_key) if waited else None
+                    if encoded is None:
+                        await self._client.delete(result_key) # waiters must not pick up an earlier run's answer
+                        break
+                    await self._release(lock_key, token)
+                    return decode(encoded), "remote"
+                encoded = await self._client.get(result_key)
+            except redis.RedisError as e:
+                print(f"Warning: Single-flight lock unavailable, running without cross-worker coalescing: {e}")
+                return await work(), None
+            if encoded is not None:
+                return decode(encoded), "remote"
+            if loop.time() >= deadline:
+                print(f"Warning: Gave up waiting for another worker to answer single-flight key {key[:12]}.")
+                return await work(), None
+            waited = True
+            await asyncio.sleep(self._poll_interval_seconds)
+
+        try:
+            value = await work()
+            try:
+                await self._client.set(result_key, encode(value), ex=self._result_ttl_seconds)
+            except redis.RedisError as e:
+                print(f"Warning: Could not publish single-flight result: {e}")
+            return value, None
+        finally:
+            await self._release(lock_key, token)
+
+    async def _release(self, lock_key: str, token: str) -> None:
+        try:
+            await release_lock(self._client, lock_key, token) # the lock may have expired and been taken over
+        except redis.RedisError as e:
+            print(f"Warning: Could not release single-flight lock: {e}")
+
+
+# Singleton instance
+question_single_flight: Optional[SingleFlight] = None
+if settings.SINGLE_FLIGHT_ENABLED:
+    question_single_flight = SingleFlight(
+        redis_client if settings.SINGLE_FLIGHT_CROSS_WORKER else None,
+        lock_ttl_seconds=settings.SINGLE_FLIGHT_LOCK_TTL_SECONDS,
+        result_ttl_seconds=settings.SINGLE_FLIGHT_RESULT_TTL_SECONDS,
+        wait_seconds=settings.SINGLE_FLIGHT_WAIT_SECONDS,
+        poll_interval_seconds=settings.SINGLE_FLIGHT_POLL_SECONDS
+    )
@@ -0,0 +1,78 @@
+import redis.asyncio as redis
+from datetime import datetime
+from typing import Optional
+import hashlib
+import re
+import time
+import unicodedata
+
+from src.core.config import settings
+from src.db.redis_client import redis_client
+
+
+def normalize_question(question: str) -> str:
+    """Lowercases, collapses whitespace and strips trailing punctuation so trivial rephrasings share a key."""
+    text = unicodedata.normalize("NFKC", question).casefold()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(" ?!.")
+
+
+class SQLGenerationCache:
+    """
+    Redis-backed question -> SQL cache shared by all workers.
+    Entries expire after a TTL, and a sorted set of last-access times is used to evict the
+    least recently used entries once the cache grows past `max_entries`.
+    """
+
+    ENTRY_PREFIX = "sqlcache:entry:"
+    LRU_KEY = "sqlcache:lru"
+
+    def __init__(self, client: redis.Redis, ttl_seconds: int, max_entries: int):
+        self._client = client
+        self._ttl_seconds = ttl_seconds
+        self._max_entries = max_entries
+
+    @staticmethod
+    def make_key(question: str, schema_hash: str, chat_history: str = "") -> str:
+        parts = [normalize_question(question), schema_hash, datetime.now().strftime('%Y-%m-%d')]
+        if chat_history.strip():
+            parts.append(hashlib.sha256(chat_history.encode("utf-8")).hexdigest())
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            async with self._client.pipeline(transaction=False) as pipe:
+                pipe.get(f"{self.ENTRY_PREFIX}{key}")
+                pipe.zadd(self.LRU_KEY, {key: time.time()}, xx=True)
+                cached_sql, _ = await pipe.execute()
+            return cached_sql
+        except Exception as e:
+            print(f"Warning: SQL cache lookup failed: {e}")
+            return None
+
+    async def set(self, key: str, sql: str) -> None:
+        try:
+            now = time.time()
+            async with self._client.pipeline(transaction=False) as pipe:
+                pipe.set(f"{self.ENTRY_PREFIX}{key}", sql, ex=self._ttl_seconds)
+                pipe.zadd(self.LRU_KEY, {key: now})
+                pipe.zremrangebyscore(self.LRU_KEY, "-inf", now - self._ttl_seconds) # already expired entries
+                pipe.zcard(self.LRU_KEY)
+                *_, size = await pipe.execute()
+
+            if size > self._max_entries:
+                evicted = await self._client.zpopmin(self.LRU_KEY, size - self._max_entries)
+                if evicted:
+                    await self._client.delete(*(f"{self.ENTRY_PREFIX}{member}" for member, _ in evicted))
+        except Exception as e:
+            print(f"Warning: SQL cache store failed: {e}")
+
+
+# Singleton instance
+sql_generation_cache: Optional[SQLGenerationCache] = None
+if settings.SQL_CACHE_ENABLED:
+    sql_generation_cache = SQLGenerationCache(
+        redis_client,
+        ttl_seconds=settings.SQL_CACHE_TTL_SECONDS,
+        max_entries=settings.SQL_CACHE_MAX_ENTRIES
+    )
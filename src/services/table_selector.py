@@ -0,0 +1,169 @@
+from collections import Counter, deque
+from typing import Dict, List, Optional, Set, Tuple
+import math
+import re
+import threading
+
+from src.core.config import settings
+from src.core.llm_config import SchemaCache, schema_cache
+from src.services.result_cache import referenced_tables
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Business vocabulary that does not appear in the column names of each table.
+ALIASES: Dict[str, List[str]] = {
+    "users_poc": ["user", "customer", "client", "buyer", "member", "signup", "registered", "registration", "segment", "leader", "channel", "people", "who"],
+    "categories_poc": ["category", "categories", "type", "kind"],
+    "products_poc": ["product", "item", "sku", "catalog", "price", "category", "vegetable", "fruit", "dairy", "selling", "sold"],
+    "orders_poc": ["order", "purchase", "sale", "revenue", "sales", "spend", "spent", "payment", "paid", "amount", "total", "acquisition", "transaction", "bought", "aov"],
+    "order_items_poc": ["item", "quantity", "units", "unit", "basket", "line", "sold", "selling", "bought"],
+    "group_deals_poc": ["deal", "group", "discount", "offer", "promotion", "campaign", "effective", "expired"],
+    "groups_poc": ["group", "buy", "leader", "initiated", "completed", "failed", "started"],
+    "group_members_poc": ["member", "participant", "participation", "joined", "join", "group"],
+}
+
+# Join edges from the DDL in data/create_tables_poc.sql. products_poc joins categories_poc
+# through the denormalized category_name column.
+FOREIGN_KEYS: List[Tuple[str, str]] = [
+    ("orders_poc", "users_poc"),
+    ("order_items_poc", "orders_poc"),
+    ("order_items_poc", "products_poc"),
+    ("group_deals_poc", "products_poc"),
+    ("groups_poc", "group_deals_poc"),
+    ("groups_poc", "users_poc"),
+    ("group_members_poc", "groups_poc"),
+    ("group_members_poc", "users_poc"),
+    ("group_members_poc", "orders_poc"),
+    ("products_poc", "categories_poc"),
+]
+
+_STOP_WORDS = frozenset(
+    "a an and are as at be by did do does for from how in is it its last many me much of on or per show "
+    "than that the their this to top was were what when which with poc id".split()
+)
+
+
+def _stem(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercases, splits snake_case and drops stop words and plural endings."""
+    return [_stem(w) for w in _WORD_RE.findall(text.lower().replace("_", " ")) if w not in _STOP_WORDS]
+
+
+class TableSelector:
+    """
+    Picks the tables relevant to a question so the SQL prompt only carries their schema.
+
+    Tables are ranked with BM25 over their names, column names, column comments and `ALIASES`.
+    The best matches (plus the tables the previous SQL in the chat history used) are then
+    connected through the shortest foreign-key paths so the generated SQL can still join them.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, cache: SchemaCache, max_tables: int, min_score_ratio: float):
+        self._cache = cache
+        self._max_tables = max_tables
+        self._min_score_ratio = min_score_ratio
+        self._lock = threading.Lock()
+        self._indexed_hash: Optional[str] = None
+        self._documents: Dict[str, Counter] = {}
+        self._idf: Dict[str, float] = {}
+        self._avg_length = 1.0
+        self._graph: Dict[str, Set[str]] = {}
+
+    def _build_index(self) -> None:
+        documents = {}
+        for table, columns in self._cache.table_columns.items():
+            words = tokenize(table) * 2 + tokenize(" ".join(ALIASES.get(table, [])))
+            for name, comment in columns:
+                if name.endswith("_id"):
+                    continue # key columns say how tables join, not what they are about; FOREIGN_KEYS covers that
+                words += tokenize(name) + tokenize(comment)
+            documents[table] = Counter(words)
+
+        document_frequency = Counter(term for doc in documents.values() for term in doc)
+        n = len(documents)
+        self._idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+        self._avg_length = sum(sum(doc.values()) for doc in documents.values()) / max(n, 1) or 1.0
+        self._documents = documents
+        self._graph = {table: set() for table in documents}
+        for left, right in FOREIGN_KEYS:
+            if left in self._graph and right in self._graph:
+                self._graph[left].add(right)
+                self._graph[right].add(left)
+
+    def _ensure_index(self) -> None:
+        with self._lock:
+            if self._indexed_hash != self._cache.schema_hash:
+                self._build_index()
+                self._indexed_hash = self._cache.schema_hash
+
+    def score(self, question: str) -> Dict[str, float]:
+        """BM25 score of every table for `question`."""
+        self._ensure_index()
+        terms = set(tokenize(question))
+        scores = {}
+        for table, doc in self._documents.items():
+            length = sum(doc.values())
+            total = 0.0
+            for term in terms:
+                tf = doc.get(term, 0)
+                if tf:
+                    total += self._idf[term] * tf * (self.K1 + 1) / (tf + self.K1 * (1 - self.B + self.B * length / self._avg_length))
+            scores[table] = total
+        return scores
+
+    def _shortest_path(self, start: Set[str], target: str, scores: Dict[str, float]) -> List[str]:
+        """Tables to add to connect `target` to `start`; among equally short paths, the one through the best-scoring tables wins."""
+        previous: Dict[str, Optional[str]] = {table: None for table in start}
+        queue = deque(start)
+        while queue:
+            table = queue.popleft()
+            if table == target:
+                path = []
+                while table not in start:
+                    path.append(table)
+                    table = previous[table]
+                return path
+            for neighbour in sorted(self._graph.get(table, ()), key=lambda t: (-scores.get(t, 0.0), t)):
+                if neighbour not in previous:
+                    previous[neighbour] = table
+                    queue.append(neighbour)
+        return [target]
+
+    def select(self, question: str, chat_history: str = "") -> List[str]:
+        """
+        Returns the tables to include in the SQL prompt, in schema order.
+        Falls back to every table when neither the question nor the chat history matches any.
+        """
+        scores = self.score(question)
+        best = max(scores.values(), default=0.0)
+        ranked = sorted((t for t, s in scores.items() if s > 0 and s >= best * self._min_score_ratio), key=lambda t: -scores[t])
+        seeds = ranked[:self._max_tables]
+        seeds += sorted(t for t in referenced_tables(chat_history) if t in self._documents and t not in seeds)
+        if not seeds:
+            return list(self._documents)
+
+        selected = {seeds[0]}
+        for table in seeds[1:]:
+            if table not in selected:
+                selected.update(self._shortest_path(selected, table, scores))
+        return [t for t in self._documents if t in selected]
+
+
+# Singleton instance
+table_selector: Optional[TableSelector] = None
+if settings.SCHEMA_PRUNING_ENABLED and schema_cache:
+    table_selector = TableSelector(
+        schema_cache,
+        max_tables=settings.SCHEMA_PRUNING_MAX_TABLES,
+        min_score_ratio=settings.SCHEMA_PRUNING_MIN_SCORE_RATIO
+    )
@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+from src.core.llm_dispatcher import LLMOverloaded
+from src.services.agent_service import AgentService
+
+
+class FakeMemory:
+    async def load_history(self, session_id):
+        return ""
+
+
+def test_batch_is_shed_when_the_llm_is_overloaded():
+    service = AgentService.__new__(AgentService) # the real constructor needs ClickHouse and the LLM
+    service.memory = FakeMemory()
+    service._format_sql_input = lambda question, history: question
+    still_running = []
+
+    async def generate_sql(question, history, sql_input, debug_info, semaphore):
+        if question == "slow":
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                still_running.append(question)
+                raise
+        raise LLMOverloaded("gemini", retry_after=3)
+
+    service._generate_sql = generate_sql
+
+    async def run():
+        with pytest.raises(LLMOverloaded) as excinfo:
+            await service.process_batch([("slow", "s1"), ("fast", "s1")])
+        await asyncio.sleep(0)
+        return excinfo.value
+
+    error = asyncio.run(run())
+    assert error.retry_after == 3
+    assert still_running == ["slow"] # the rest of the batch is cancelled, not left calling the LLM
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.services.answer_templates import format_value, render_answer
+
+
+def test_how_many_answer_reuses_question_wording():
+    df = pd.DataFrame({"count()": [42]})
+    assert render_answer("How many orders were placed in August?", df) == "42 orders were placed in August."
+
+
+@pytest.mark.parametrize("question", [
+    "How many orders were placed in May, and how many in June?",
+    "How many orders were placed in May and June?",
+    "How many orders were placed via Facebook or Referral?",
+    "How many orders were placed in May vs June?",
+    "How many orders were placed in May compared to April?",
+    "How many orders were placed in May? What about June?",
+    "What was the total revenue in May and June?",
+])
+def test_multi_part_question_goes_to_llm(question):
+    assert render_answer(question, pd.DataFrame({"count()": [42]})) is None
+
+
+def test_numpy_bool_is_not_a_scalar_answer():
+    df = pd.DataFrame({"reached": np.array([True])})
+    assert render_answer("Did any group deal reach its target?", df) is None
+    assert format_value(np.bool_(False)) == "no"
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.services.chart_data import OTHER_LABEL, build_chart_payload, lttb_indices, min_max_indices
+
+
+@pytest.mark.parametrize("select", [lttb_indices, min_max_indices])
+def test_series_within_the_threshold_is_kept_whole(select):
+    x = np.arange(5, dtype="float64")
+    assert select(x, x * 2, 5).tolist() == [0, 1, 2, 3, 4]
+    assert select(x, x * 2, 50).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_lttb_keeps_end_points_and_peak():
+    x = np.arange(100, dtype="float64")
+    y = np.zeros(100)
+    y[37] = 50.0
+    picked = lttb_indices(x, y, 10)
+    assert len(picked) == 10 and picked[0] == 0 and picked[-1] == 99 and 37 in picked
+
+
+@pytest.mark.parametrize("threshold", [0, 1, 2])
+def test_lttb_below_three_points_keeps_only_the_end_points(threshold):
+    x = np.arange(10, dtype="float64")
+    assert lttb_indices(x, x, threshold).tolist() == [0, 9]
+
+
+@pytest.mark.parametrize("threshold", [0, 1, 2])
+def test_min_max_below_two_buckets_keeps_the_extremes(threshold):
+    y = np.array([3.0, 9.0, -4.0, 1.0])
+    assert min_max_indices(np.arange(4, dtype="float64"), y, threshold).tolist() == [1, 2]
+
+
+@pytest.mark.parametrize("select", [lttb_indices, min_max_indices])
+def test_missing_values_are_skipped_not_drawn_as_zero(select):
+    x = np.arange(20, dtype="float64")
+    y = np.full(20, 10.0)
+    y[[3, 8, 15]] = np.nan
+    y[12] = 30.0
+    picked = select(x, y, 6)
+    assert not set(picked.tolist()) & {3, 8, 15}
+    assert 12 in picked
+    assert select(x, np.full(20, np.nan), 6).tolist() == []
+
+
+def test_top_n_folds_the_rest_into_other_and_breaks_ties_by_row_order(monkeypatch):
+    df = pd.DataFrame({"channel": ["a", "b", "c", "d", "e"], "orders": [5, 7, 5, 5, np.nan]})
+    payload, downsampling = build_chart_payload("bar", "channel", ["orders"], df.head(4))
+    assert downsampling is None and payload["labels"] == ["a", "b", "c", "d"]
+
+    from src.core.config import settings
+    monkeypatch.setattr(settings, "CHART_MAX_BAR_CATEGORIES", 3)
+    payload, downsampling = build_chart_payload("bar", "channel", ["orders"], df)
+    assert downsampling == "top_n_other"
+    assert payload["labels"] == ["b", "a", OTHER_LABEL] # "a", "c" and "d" tie at 5: the first row wins
+    assert payload["datasets"][0]["data"] == [7, 5, 10.0] # NaN counts as nothing in "Other"
@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+
+from src.services.chart_rules import suggest_chart
+
+
+def test_bar_for_category_by_metric():
+    df = pd.DataFrame({"channel": ["Organic", "Facebook", "Referral"], "orders": [10, 20, 5]})
+    suggestion = suggest_chart("orders by channel", df)
+    assert suggestion["chart_type"] == "bar"
+    assert suggestion["x_axis_column"] == "channel"
+
+
+def test_array_label_column_falls_back_to_llm():
+    df = pd.DataFrame({"products": [np.array(["Teff", "Onion"]), ["Tomato"]], "orders": [3, 4]})
+    assert suggest_chart("orders by product set", df) is None
+
+
+def test_category_limits_come_from_settings(monkeypatch):
+    from src.core.config import settings
+    df = pd.DataFrame({"category": [f"c{i}" for i in range(5)], "units": [5, 4, 3, 2, 1]})
+    monkeypatch.setattr(settings, "CHART_MAX_PIE_SLICES", 4)
+    assert suggest_chart("share of units by category", df)["chart_type"] == "bar"
+    monkeypatch.setattr(settings, "CHART_MAX_BAR_CATEGORIES", 4)
+    assert suggest_chart("units by category", df) is None
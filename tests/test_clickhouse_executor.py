@@ -0,0 +1,43 @@
+from decimal import Decimal
+
+import numpy as np
+from clickhouse_connect.driver.query import QueryResult
+
+from src.db.clickhouse_client import ClickHouseExecutor, QueryStats
+
+
+class FakeClient:
+    def __init__(self, result: QueryResult):
+        self.result = result
+        self.calls = []
+
+    def query(self, sql, settings=None, use_numpy=None):
+        self.calls.append((sql, settings))
+        return self.result
+
+
+def make_executor(result: QueryResult) -> ClickHouseExecutor:
+    return ClickHouseExecutor(FakeClient(result), max_workers=1, query_settings={"max_execution_time": 5})
+
+
+def test_query_df_builds_frame_and_reads_summary():
+    blocks = iter([ # column-oriented blocks, as the numpy query path streams them
+        [np.array(["2024-05-01"], dtype="datetime64[s]"), [Decimal("1.50")], np.array([3])],
+        [np.array(["2024-05-02"], dtype="datetime64[s]"), [Decimal("2.25")], np.array([4])],
+    ])
+    result = QueryResult(block_gen=blocks, column_names=("day", "revenue", "revenue"), column_oriented=True,
+                         summary={"read_rows": "120", "read_bytes": "4096"})
+    executor = make_executor(result)
+    stats = QueryStats(query_id="q1")
+    df = executor.query_df("SELECT 1", query_id="q1", stats=stats)
+    assert list(df.columns) == ["day", "revenue", "revenue"]
+    assert str(df.dtypes.iloc[0]).startswith("datetime64")
+    assert df.iloc[:, 1].tolist() == [Decimal("1.50"), Decimal("2.25")]
+    assert (stats.read_rows, stats.read_bytes) == (120, 4096)
+    assert executor._client.calls[0][1] == {"max_execution_time": 5, "query_id": "q1"}
+
+
+def test_query_df_keeps_columns_of_empty_results():
+    executor = make_executor(QueryResult(block_gen=iter([]), column_names=("a", "b"), column_oriented=True, summary={}))
+    df = executor.query_df("SELECT a, b FROM t WHERE 0")
+    assert df.empty and list(df.columns) == ["a", "b"]
@@ -0,0 +1,36 @@
+import pytest
+
+from src.services.example_store import ExampleStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ExampleStore(str(tmp_path / "examples.jsonl"), top_k=3, min_similarity=0.1, reuse_enabled=True)
+
+
+def test_exact_and_parameterized_reuse(store):
+    store.add("How many orders were placed in 2024-05?", "SELECT count() FROM orders_poc WHERE toYYYYMM(order_date) = 202405")
+    store.add("Top 3 products in Vegetables", "SELECT product_name FROM products_poc WHERE category_name = 'Vegetables' LIMIT 3")
+    assert store.match("how many orders were placed in 2024-05") == (
+        "SELECT count() FROM orders_poc WHERE toYYYYMM(order_date) = 202405", "exact")
+    assert store.match("Top 5 products in Dairy") == (
+        "SELECT product_name FROM products_poc WHERE category_name = 'Dairy' LIMIT 5", "parameterized")
+
+
+@pytest.mark.parametrize("question", ["Orders last week", "Revenue this month", "orders placed 3 days ago", "Sales today"])
+def test_relative_time_questions_are_not_reused(store, question):
+    store.add(question, "SELECT count() FROM orders_poc WHERE order_date >= '2024-05-06'")
+    assert store.match(question) is None
+
+
+def test_parameter_that_also_appears_elsewhere_in_the_sql_is_not_substituted(store):
+    store.add("Top 2 categories by revenue",
+              "SELECT category_name, round(sum(revenue), 2) AS revenue FROM sales_rollup GROUP BY category_name ORDER BY revenue DESC LIMIT 2")
+    assert store.match("Top 5 categories by revenue") is None
+
+
+def test_follow_up_with_chat_history_is_not_reused(store):
+    store.add("Top 3 products in Vegetables", "SELECT product_name FROM products_poc WHERE category_name = 'Vegetables' LIMIT 3")
+    history = "Human: Top 3 products in Vegetables by revenue in 2024\nAI: Onion, Tomato, Potato"
+    assert store.match("Top 3 products in Vegetables", history) is None
+    assert store.match("Top 3 products in Vegetables", "") is not None
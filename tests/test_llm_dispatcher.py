@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+from google.api_core.exceptions import ResourceExhausted
+
+from src.core import llm_dispatcher
+from src.core.llm_dispatcher import LLMDispatcher, LLMOverloaded, TokenBucket
+from src.services.metrics import LLM_SHED
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_dispatcher.time, "monotonic", clock)
+    return clock
+
+
+def make_dispatcher(**overrides) -> LLMDispatcher:
+    options = dict(max_concurrency=1, requests_per_minute=0, burst=1, max_queue=1, queue_timeout_seconds=5,
+                   max_retries=2, retry_base_seconds=0.001, retry_max_seconds=0.01)
+    return LLMDispatcher(**{**options, **overrides})
+
+
+def test_token_bucket_bursts_then_refills_at_its_rate(clock):
+    bucket = TokenBucket(rate_per_second=2, burst=2)
+    assert [bucket.reserve(), bucket.reserve()] == [0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(0.5) # one token short at 2/s
+    assert bucket.reserve() == pytest.approx(1.0) # waiters queue behind it
+    clock.now += 1.0 # two tokens back: the balance returns to zero
+    assert bucket.reserve() == pytest.approx(0.5)
+    bucket.refund()
+    clock.now += 10.0
+    assert [bucket.reserve(), bucket.reserve(), bucket.reserve()] == [0.0, 0.0, pytest.approx(0.5)] # capped at the burst
+
+
+def test_zero_rate_is_unlimited(clock):
+    bucket = TokenBucket(rate_per_second=0, burst=1)
+    assert all(bucket.reserve() == 0.0 for _ in range(100))
+
+
+def test_calls_beyond_the_queue_are_shed_with_retry_after():
+    dispatcher = make_dispatcher(requests_per_minute=30, burst=10) # 0.5 calls per second
+    shed_before = LLM_SHED.value(model="m", reason="queue_full")
+
+    async def run():
+        release = asyncio.Event()
+
+        async def slow_call():
+            await release.wait()
+            return "ok"
+
+        running = asyncio.create_task(dispatcher.call("m", slow_call))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(dispatcher.call("m", slow_call)) # waits for the only slot
+        await asyncio.sleep(0)
+        assert dispatcher.overloaded()
+        with pytest.raises(LLMOverloaded) as excinfo:
+            await dispatcher.call("m", slow_call)
+        release.set()
+        assert await asyncio.gather(running, queued) == ["ok", "ok"]
+        assert not dispatcher.overloaded()
+        return excinfo.value
+
+    error = asyncio.run(run())
+    assert error.retry_after == 2 # one caller ahead at 0.5 per second
+    assert LLM_SHED.value(model="m", reason="queue_full") == shed_before + 1
+
+
+def test_call_that_would_wait_past_the_timeout_for_a_token_is_shed():
+    dispatcher = make_dispatcher(max_concurrency=4, requests_per_minute=60, burst=1, max_queue=4, queue_timeout_seconds=0.5)
+
+    async def call():
+        return "ok"
+
+    async def run():
+        assert await dispatcher.call("m", call) == "ok"
+        with pytest.raises(LLMOverloaded):
+            await dispatcher.call("m", call) # next token in about 1s
+    asyncio.run(run())
+
+
+def test_retryable_errors_are_retried_then_raised():
+    dispatcher = make_dispatcher(max_retries=2)
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ResourceExhausted("quota")
+        return "ok"
+
+    async def always_failing():
+        raise ResourceExhausted("quota")
+
+    assert asyncio.run(dispatcher.call("m", flaky)) == "ok"
+    with pytest.raises(ResourceExhausted):
+        asyncio.run(dispatcher.call("m", always_failing))
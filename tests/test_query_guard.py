@@ -0,0 +1,72 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from src.services.query_guard import QueryGuard
+
+# EXPLAIN ESTIMATE (TSVWithNames) and EXPLAIN PLAN actions = 1 output from ClickHouse 25 for, by fixture name:
+#   join_aggregate:  SELECT u.registration_channel, count() FROM orders_poc AS o INNER JOIN users_poc AS u
+#                    ON o.user_id = u.user_id WHERE o.order_date >= '2024-03-01' GROUP BY u.registration_channel
+#   streaming_limit: SELECT order_id, status FROM orders_poc WHERE order_date >= '2024-02-01' LIMIT 101
+#   cross_join:      SELECT count() FROM orders_poc, users_poc
+FIXTURES = Path(__file__).parent / "fixtures" / "explain"
+
+COLUMN_BYTES = pd.DataFrame(
+    [("orders_poc", "order_id", 16_000, 0, 1_000), ("orders_poc", "status", 2_000, 0, 1_000),
+     ("orders_poc", "user_id", 16_000, 0, 1_000), ("orders_poc", "total_amount", 8_000, 0, 1_000),
+     ("users_poc", "user_id", 16_000, 0, 1_000), ("users_poc", "registration_channel", 1_000, 0, 1_000),
+     ("users_poc", "is_group_leader", 1_000, 0, 1_000)],
+    columns=["table", "name", "data_uncompressed_bytes", "bytes", "rows"]
+)
+
+
+class FakeExecutor:
+    def __init__(self, estimate: pd.DataFrame, plan: str):
+        self.estimate, self.plan = estimate, plan
+
+    def query_df(self, sql):
+        if sql.startswith("EXPLAIN ESTIMATE"):
+            return self.estimate
+        if sql.startswith("EXPLAIN PLAN"):
+            return pd.DataFrame({"explain": self.plan.splitlines()})
+        return COLUMN_BYTES
+
+
+def make_guard(name: str, plan: str = None) -> QueryGuard:
+    estimate = pd.read_csv(FIXTURES / f"{name}.estimate.tsv", sep="\t")
+    plan = plan if plan is not None else (FIXTURES / f"{name}.plan.txt").read_text()
+    return QueryGuard(FakeExecutor(estimate, plan), max_rows=10_000, max_marks=1_000, max_bytes=10**9,
+                      max_cross_join_rows=1_000_000, stats_refresh_seconds=60)
+
+
+def test_join_with_aggregation_is_blocking_and_sums_every_table():
+    estimate = make_guard("join_aggregate").estimate("...")
+    assert estimate.tables == {"users_poc": {"rows": 3000, "marks": 1, "parts": 1},
+                               "orders_poc": {"rows": 18560, "marks": 26, "parts": 26}}
+    assert (estimate.rows, estimate.marks, estimate.parts) == (21560, 27, 27)
+    assert not estimate.streaming and estimate.cross_join_rows == 0
+    # only the columns each read step outputs: orders user_id (16 B/row), users user_id + registration_channel (17 B/row)
+    assert estimate.bytes == 18560 * 16 + 3000 * 17
+
+
+def test_plain_limit_streams():
+    guard = make_guard("streaming_limit")
+    estimate = guard.estimate("...")
+    assert estimate.streaming
+    assert estimate.bytes == 19256 * (16 + 2) # order_id and status
+    assert guard.violations(estimate) == ["estimated rows to read: 19,256 (budget 10,000)"]
+
+
+def test_cross_join_rows_are_the_product_of_its_inputs():
+    guard = make_guard("cross_join")
+    estimate = guard.estimate("...")
+    assert estimate.cross_join_rows == 20000 * 3000
+    assert "estimated rows produced by the CROSS JOIN: 60,000,000 (budget 1,000,000)" in guard.violations(estimate)
+
+
+@pytest.mark.parametrize("plan", ["", "Expression\n  Limit\n    ReadFromStorage (orders_poc)"])
+def test_unrecognized_plan_format_is_not_treated_as_streaming(plan):
+    estimate = make_guard("streaming_limit", plan=plan).estimate("...")
+    assert not estimate.streaming
+    assert estimate.bytes == 19256 * (16 + 2 + 16 + 8) # every column, since none could be attributed
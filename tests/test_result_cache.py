@@ -0,0 +1,76 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+from src.db.clickhouse_client import QueryStats
+from src.services.result_cache import QueryResultCache, canonicalize_sql, is_deterministic
+
+
+class FakeExecutor:
+    """Counts executions; table versions are whatever the test sets, as if read from system.parts."""
+
+    def __init__(self):
+        self.executed = []
+        self.versions = {"orders_poc": "v1"}
+
+    async def execute(self, sql):
+        self.executed.append(sql)
+        return pd.DataFrame({"orders": [len(self.executed)]}), QueryStats(query_id="q")
+
+    def table_versions(self, tables):
+        return {t: self.versions[t] for t in tables if t in self.versions}
+
+
+@pytest.fixture
+def executor():
+    return FakeExecutor()
+
+
+@pytest.fixture
+def cache(executor):
+    return QueryResultCache(executor, max_bytes=1 << 20, freshness_check_seconds=0)
+
+
+def test_canonicalization_ignores_comments_whitespace_and_semicolons_but_not_literals():
+    assert canonicalize_sql("SELECT count()\n  FROM orders_poc -- all\nWHERE status = 'a  b';") == (
+        "SELECT count() FROM orders_poc WHERE status = 'a  b'")
+    assert canonicalize_sql("SELECT '--x' /* c */ FROM t") == "SELECT '--x' FROM t"
+
+
+def test_equivalent_sql_hits_the_cache(cache, executor):
+    async def run():
+        first = await cache.get_or_execute("SELECT count() FROM orders_poc;")
+        second = await cache.get_or_execute("SELECT count()\n FROM orders_poc -- same query")
+        return first, second
+    (df1, hit1, stats1), (df2, hit2, stats2) = asyncio.run(run())
+    assert (hit1, hit2) == (False, True)
+    assert stats2 is None and df2.equals(df1)
+    assert len(executor.executed) == 1
+
+
+def test_new_parts_invalidate_the_entry(cache, executor):
+    async def run():
+        await cache.get_or_execute("SELECT count() FROM orders_poc")
+        executor.versions["orders_poc"] = "v2" # an insert or mutation replaced parts
+        return await cache.get_or_execute("SELECT count() FROM orders_poc")
+    df, hit, _ = asyncio.run(run())
+    assert not hit and df["orders"][0] == 2
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT count() FROM orders_poc WHERE order_date >= today() - 7",
+    "SELECT count() FROM orders_poc WHERE order_date > now64() - INTERVAL 1 DAY",
+    "SELECT * FROM orders_poc ORDER BY rand() LIMIT 5",
+])
+def test_non_deterministic_sql_is_never_cached(cache, executor, sql):
+    assert not is_deterministic(sql)
+    async def run():
+        await cache.get_or_execute(sql)
+        return await cache.get_or_execute(sql)
+    assert asyncio.run(run())[1] is False
+    assert len(executor.executed) == 2
+
+
+def test_function_names_inside_literals_do_not_block_caching():
+    assert is_deterministic("SELECT count() FROM orders_poc WHERE status = 'now()'")
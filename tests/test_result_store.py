@@ -0,0 +1,39 @@
+import pytest
+
+from src.services.result_store import apply_row_limit
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT a FROM t ORDER BY a DESC", "SELECT a FROM t ORDER BY a DESC\nLIMIT 100"),
+    ("SELECT a FROM t ORDER BY a DESC LIMIT 500;", "SELECT a FROM t ORDER BY a DESC LIMIT 100"),
+    ("SELECT a FROM t ORDER BY a LIMIT 10", "SELECT a FROM t ORDER BY a LIMIT 10"),
+    ("SELECT a FROM t ORDER BY a LIMIT 200 OFFSET 20", "SELECT a FROM t ORDER BY a LIMIT 100 OFFSET 20"),
+    ("SELECT a FROM t ORDER BY a LIMIT 20, 200", "SELECT a FROM t ORDER BY a LIMIT 20, 100"),
+    ("SELECT a FROM t ORDER BY a LIMIT 3 WITH TIES", "SELECT a FROM t ORDER BY a LIMIT 3"),
+    ("SELECT b, a FROM t ORDER BY a LIMIT 2 BY b", "SELECT b, a FROM t ORDER BY a LIMIT 2 BY b\nLIMIT 100"),
+    ("SELECT * EXCEPT (b) FROM t", "SELECT * EXCEPT (b) FROM t\nLIMIT 100"),
+    ("WITH x AS (SELECT a FROM t LIMIT 500) SELECT a FROM x", "WITH x AS (SELECT a FROM t LIMIT 500) SELECT a FROM x\nLIMIT 100"),
+])
+def test_single_select_gets_a_top_level_limit(sql, expected):
+    assert apply_row_limit(sql, 100) == expected
+
+
+def test_settings_are_kept_and_format_is_dropped():
+    assert apply_row_limit("SELECT a FROM t ORDER BY a LIMIT 500 SETTINGS max_threads = 1 FORMAT JSON", 100) == (
+        "SELECT a FROM t ORDER BY a LIMIT 100 SETTINGS max_threads = 1")
+    assert apply_row_limit("SELECT a FROM t FORMAT JSONEachRow", 100) == "SELECT a FROM t\nLIMIT 100"
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT a FROM t UNION ALL SELECT a FROM u",
+    "SELECT a FROM t EXCEPT SELECT a FROM u",
+    "(SELECT a FROM t ORDER BY a)",
+    "SELECT a FROM t ORDER BY a OFFSET 5 ROWS FETCH FIRST 3 ROWS ONLY",
+])
+def test_queries_that_cannot_take_a_limit_are_wrapped(sql):
+    assert apply_row_limit(sql, 100) == f"SELECT * FROM (\n{sql}\n) LIMIT 100"
+
+
+def test_keywords_in_literals_and_comments_are_ignored():
+    sql = "SELECT 'x -- LIMIT 9', \"UNION\" FROM t -- FORMAT JSON\n/* SETTINGS */ ORDER BY a"
+    assert apply_row_limit(sql, 100) == "SELECT 'x -- LIMIT 9', \"UNION\" FROM t ORDER BY a\nLIMIT 100"
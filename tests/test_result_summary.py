@@ -0,0 +1,14 @@
+import numpy as np
+import pandas as pd
+
+from src.services.result_summary import summarize_result
+
+
+def test_list_valued_column_is_summarized_past_the_sample():
+    df = pd.DataFrame({
+        "products": [np.array(["Teff", "Onion"]), ["Tomato"]] * 30,
+        "orders": range(60),
+    })
+    summary = summarize_result(df, token_budget=2000, sample_rows=10, top_k=2)
+    assert "- products (text): 2 distinct; most frequent: ['Teff', 'Onion'] (30), ['Tomato'] (30)" in summary
+    assert "- orders (number): sum 1,770" in summary
@@ -0,0 +1,24 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from src.db.redis_client import SessionStore
+
+
+@pytest.fixture
+def store():
+    return SessionStore(fakeredis.FakeAsyncRedis(decode_responses=True), ttl_seconds=60)
+
+
+def test_release_keeps_a_lock_taken_over_after_expiry(store):
+    async def run():
+        token = await store.acquire_lock("s1", ttl_seconds=60)
+        assert token and await store.acquire_lock("s1", ttl_seconds=60) is None
+        await store._client.delete(f"{SessionStore.LOCK_PREFIX}s1") # the first holder's lock expires...
+        other = await store.acquire_lock("s1", ttl_seconds=60) # ...and another worker takes it
+        await store.release_lock("s1", token)
+        assert await store._client.get(f"{SessionStore.LOCK_PREFIX}s1") == other
+        await store.release_lock("s1", other)
+        assert await store._client.get(f"{SessionStore.LOCK_PREFIX}s1") is None
+    asyncio.run(run())
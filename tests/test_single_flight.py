@@ -0,0 +1,35 @@
+import asyncio
+
+import fakeredis
+
+from src.db.redis_client import RELEASE_LOCK_SCRIPT
+from src.services.single_flight import SingleFlight
+
+
+class ScriptedRedis(fakeredis.FakeAsyncRedis):
+    """Runs the release script's compare-and-delete in Python, as Redis would atomically."""
+
+    async def eval(self, script, numkeys, *args):
+        self.scripts.append(script)
+        lock_key, token = args
+        if await self.get(lock_key) == token:
+            return await self.delete(lock_key)
+        return 0
+
+
+def test_leader_does_not_release_a_lock_taken_over_after_expiry():
+    client = ScriptedRedis(decode_responses=True)
+    client.scripts = []
+    flight = SingleFlight(client, lock_ttl_seconds=60, result_ttl_seconds=60, wait_seconds=1, poll_interval_seconds=0.01)
+    lock_key = f"{SingleFlight.LOCK_PREFIX}k"
+
+    async def work():
+        await client.set(lock_key, "other-worker") # our lock expired mid-run and another worker took it
+        return "42"
+
+    async def run():
+        value, coalesced = await flight.do("k", work, encode=str, decode=str)
+        assert (value, coalesced) == ("42", None)
+        assert await client.get(lock_key) == "other-worker"
+    asyncio.run(run())
+    assert client.scripts == [RELEASE_LOCK_SCRIPT]
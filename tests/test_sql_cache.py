@@ -0,0 +1,60 @@
+import asyncio
+from datetime import datetime
+import itertools
+
+import fakeredis
+import pytest
+
+from src.services import sql_cache
+from src.services.sql_cache import SQLGenerationCache, normalize_question
+
+
+def test_trivial_rephrasings_share_a_key():
+    assert normalize_question("  How many  ORDERS in May?? ") == "how many orders in may"
+    assert SQLGenerationCache.make_key("How many orders in May?", "s1") == SQLGenerationCache.make_key("how many orders  in may", "s1")
+
+
+def test_schema_history_and_day_are_part_of_the_key(monkeypatch):
+    key = SQLGenerationCache.make_key("orders in may", "s1")
+    assert SQLGenerationCache.make_key("orders in may", "s2") != key
+    assert SQLGenerationCache.make_key("orders in may", "s1", "Human: revenue by channel") != key
+    assert SQLGenerationCache.make_key("orders in may", "s1", "  ") == key # no history is no history
+
+    class Tomorrow(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2100, 1, 2)
+    monkeypatch.setattr(sql_cache, "datetime", Tomorrow)
+    assert SQLGenerationCache.make_key("orders in may", "s1") != key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    ticks = itertools.count(1_000_000)
+    monkeypatch.setattr(sql_cache.time, "time", lambda: float(next(ticks)))
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = SQLGenerationCache(fakeredis.FakeAsyncRedis(decode_responses=True), ttl_seconds=3600, max_entries=2)
+
+    async def run():
+        await cache.set("a", "SELECT 1")
+        await cache.set("b", "SELECT 2")
+        assert await cache.get("a") == "SELECT 1" # "a" is now more recent than "b"
+        await cache.set("c", "SELECT 3")
+        return [await cache.get(k) for k in ("a", "b", "c")]
+
+    assert asyncio.run(run()) == ["SELECT 1", None, "SELECT 3"]
+
+
+def test_redis_errors_are_cache_misses():
+    class BrokenRedis(fakeredis.FakeAsyncRedis):
+        def pipeline(self, *args, **kwargs):
+            raise ConnectionError("redis is down")
+
+    cache = SQLGenerationCache(BrokenRedis(decode_responses=True), ttl_seconds=60, max_entries=10)
+
+    async def run():
+        await cache.set("a", "SELECT 1")
+        return await cache.get("a")
+    assert asyncio.run(run()) is None
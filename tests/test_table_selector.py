@@ -0,0 +1,52 @@
+from src.services.table_selector import TableSelector
+
+# Columns (name, comment) as SchemaCache reads them from data/create_tables_poc.sql
+TABLE_COLUMNS = {
+    "users_poc": [("user_id", ""), ("name", ""), ("registration_date", ""), ("user_status", ""), ("is_group_leader", ""),
+                  ("registration_channel", ""), ("customer_segment", "")],
+    "categories_poc": [("category_id", ""), ("category_name", "")],
+    "products_poc": [("product_id", ""), ("product_name", ""), ("category_name", ""), ("status", ""), ("original_price", "")],
+    "orders_poc": [("order_id", ""), ("user_id", ""), ("status", ""), ("total_amount", ""), ("order_date", ""),
+                   ("payment_method", ""), ("acquisition_channel", "")],
+    "order_items_poc": [("order_item_id", ""), ("order_id", ""), ("product_id", ""), ("quantity", ""), ("price_per_unit", "")],
+    "group_deals_poc": [("group_deal_id", ""), ("product_id", ""), ("group_price", ""), ("max_group_member", ""),
+                        ("effective_from", ""), ("effective_to", ""), ("status", "")],
+    "groups_poc": [("group_id", ""), ("group_deal_id", ""), ("group_leader_id", ""), ("status", ""), ("created_at", "")],
+    "group_members_poc": [("group_member_id", ""), ("group_id", ""), ("user_id", ""), ("joined_at", ""), ("linked_order_id", "")],
+}
+
+
+class FakeSchemaCache:
+    table_columns = TABLE_COLUMNS
+    schema_hash = "v1"
+
+
+def make_selector(max_tables=2):
+    return TableSelector(FakeSchemaCache(), max_tables=max_tables, min_score_ratio=0.3)
+
+
+def test_foreign_keys_pull_in_the_join_tables():
+    selector = make_selector()
+    selected = selector.select("Which customer segment brings the most revenue for each product name?")
+    assert {"users_poc", "products_poc"} <= set(selected)
+    assert {"orders_poc", "order_items_poc"} <= set(selected) # users -> orders -> order_items -> products
+    assert "group_members_poc" not in selected
+
+
+def test_tables_of_the_previous_sql_are_kept_for_follow_ups():
+    selector = make_selector()
+    history = "Previous SQL Query:\nSELECT count() FROM group_members_poc"
+    assert "group_members_poc" in selector.select("and by registration channel?", history)
+
+
+def test_no_matching_word_falls_back_to_every_table():
+    selector = make_selector()
+    assert selector.score("hello there") == dict.fromkeys(TABLE_COLUMNS, 0.0)
+    assert selector.select("hello there") == list(TABLE_COLUMNS)
+
+
+def test_equally_short_join_paths_go_through_the_tables_the_question_mentions():
+    selector = make_selector()
+    selected = selector.select("Which customer segment started the most group deals per product name?")
+    assert {"groups_poc", "group_deals_poc"} <= set(selected) # users -> groups -> group_deals -> products
+    assert "order_items_poc" not in selected